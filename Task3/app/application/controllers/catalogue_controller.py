@@ -0,0 +1,117 @@
+from fastapi import APIRouter, Depends, HTTPException, Path, status
+from typing import Annotated, List
+from ..dto.catalogue_dto import CategoryGoodsResponse, CategoryResponse, GoodRootCategoryResponse
+from ..services.catalogue_service import CatalogueService
+from ...domain.repositories.order_repository import OrderRepository
+from ...infrastructure.cache.catalogue_cache import catalogue_cache
+from ...infrastructure.repositories.order_repository_impl import OrderRepositoryImpl
+
+
+def get_order_repository() -> OrderRepository:
+    """Dependency для получения репозитория заказов"""
+    return OrderRepositoryImpl()
+
+
+def get_catalogue_service(
+    order_repository: Annotated[OrderRepository, Depends(get_order_repository)]
+) -> CatalogueService:
+    """Dependency для получения сервиса каталога"""
+    return CatalogueService(order_repository, catalogue_cache)
+
+
+router = APIRouter(prefix="/catalogue", tags=["catalogue"])
+
+CATEGORY_NOT_FOUND = "Категория не найдена"
+
+
+@router.get(
+    "/{category_id}/children",
+    response_model=List[CategoryResponse],
+    summary="Дочерние категории",
+    description="Дочерние категории 1-го уровня вложенности с количеством их собственных детей."
+)
+async def get_children(
+    category_id: Annotated[int, Path(gt=0, description="ID категории")],
+    catalogue_service: Annotated[CatalogueService, Depends(get_catalogue_service)]
+) -> List[CategoryResponse]:
+    """
+    Дочерние категории
+    
+    Ответ строится по дереву каталога в памяти воркера, без запроса
+    к Catalogue с соединением по path.
+    """
+    children = await catalogue_service.get_children(category_id)
+    if children is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=CATEGORY_NOT_FOUND)
+    return children
+
+
+@router.get(
+    "/{category_id}/descendants",
+    response_model=List[CategoryResponse],
+    summary="Поддерево категории",
+    description="Все потомки категории в порядке обхода в глубину."
+)
+async def get_descendants(
+    category_id: Annotated[int, Path(gt=0, description="ID категории")],
+    catalogue_service: Annotated[CatalogueService, Depends(get_catalogue_service)]
+) -> List[CategoryResponse]:
+    """Все потомки категории (без самой категории)"""
+    descendants = await catalogue_service.get_descendants(category_id)
+    if descendants is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=CATEGORY_NOT_FOUND)
+    return descendants
+
+
+@router.get(
+    "/{category_id}/goods",
+    response_model=CategoryGoodsResponse,
+    summary="Товары поддерева категории",
+    description="Товары категории и всех её потомков."
+)
+async def get_subtree_goods(
+    category_id: Annotated[int, Path(gt=0, description="ID категории")],
+    catalogue_service: Annotated[CatalogueService, Depends(get_catalogue_service)]
+) -> CategoryGoodsResponse:
+    """
+    Товары поддерева категории
+    
+    ID категорий поддерева берутся из дерева в памяти, а товары
+    выбираются одним запросом catalogue_id = ANY(...).
+    """
+    try:
+        goods = await catalogue_service.get_subtree_goods(category_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Внутренняя ошибка сервера: {str(e)}"
+        )
+    
+    if goods is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=CATEGORY_NOT_FOUND)
+    return goods
+
+
+@router.get(
+    "/goods/{good_id}/root",
+    response_model=GoodRootCategoryResponse,
+    summary="Корневая категория товара",
+    description="Категория товара и категория 1-го уровня, к которой она относится."
+)
+async def get_good_root_category(
+    good_id: Annotated[int, Path(gt=0, description="ID товара")],
+    catalogue_service: Annotated[CatalogueService, Depends(get_catalogue_service)]
+) -> GoodRootCategoryResponse:
+    """
+    Корневая категория товара
+    
+    Товар берётся из кэша товаров, корень - подъёмом по дереву каталога
+    в памяти за O(глубины).
+    """
+    response = await catalogue_service.get_good_root_category(good_id)
+    if response is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Товар или его категория не найдены"
+        )
+    return response
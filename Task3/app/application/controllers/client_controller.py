@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends, HTTPException, Path, status
+from typing import Annotated
+from ..dto.client_dto import ClientTotalsResponse
+from ..services.client_service import ClientService
+from ...domain.repositories.client_repository import ClientRepository
+from ...infrastructure.repositories.client_repository_impl import ClientRepositoryImpl
+
+
+def get_client_repository() -> ClientRepository:
+    """Dependency для получения репозитория клиентов"""
+    return ClientRepositoryImpl()
+
+
+def get_client_service(
+    client_repository: Annotated[ClientRepository, Depends(get_client_repository)]
+) -> ClientService:
+    """Dependency для получения сервиса клиентов"""
+    return ClientService(client_repository)
+
+
+router = APIRouter(prefix="/clients", tags=["clients"])
+
+
+@router.get(
+    "/{client_id}/totals",
+    response_model=ClientTotalsResponse,
+    summary="Итоги клиента",
+    description="Суммарное количество и стоимость товаров во всех заказах клиента."
+)
+async def get_client_totals(
+    client_id: Annotated[int, Path(gt=0, description="ID клиента")],
+    client_service: Annotated[ClientService, Depends(get_client_service)]
+) -> ClientTotalsResponse:
+    """
+    Итоги клиента
+    
+    Итоги поддерживаются триггерами в той же транзакции, что и изменения
+    строк заказов, поэтому ответ не требует агрегирования заказов клиента.
+    Стоимость считается по текущим ценам товаров.
+    """
+    try:
+        totals = await client_service.get_client_totals(client_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Внутренняя ошибка сервера: {str(e)}"
+        )
+    
+    if totals is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Клиент не найден"
+        )
+    return totals
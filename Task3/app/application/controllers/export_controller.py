@@ -0,0 +1,91 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from typing import Annotated, Optional
+from ..services.export_service import ExportService
+from ...infrastructure.database.order_export import ExportTimeout, ExportUnavailable, order_exporter
+
+
+def get_export_service() -> ExportService:
+    """Dependency для получения сервиса выгрузок"""
+    return ExportService(order_exporter)
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """Проверить, принимает ли клиент gzip (Accept-Encoding, RFC 9110)"""
+    if not accept_encoding:
+        return False
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() not in ("gzip", "x-gzip", "*"):
+            continue
+        quality = params.strip().lower().removeprefix("q=")
+        try:
+            return not params or float(quality) > 0
+        except ValueError:
+            return False
+    return False
+
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+
+@router.get(
+    "/orders",
+    summary="Выгрузка заказов",
+    description="Потоковая выгрузка заказов со строками в NDJSON (сжатие gzip по Accept-Encoding).",
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {"application/x-ndjson": {}}},
+        503: {"description": "Выгрузки отключены или все соединения выгрузок заняты"},
+        504: {"description": "Запрос выгрузки превысил тайм-аут БД (DB_COMMAND_TIMEOUT)"}
+    }
+)
+async def export_orders(
+    export_service: Annotated[ExportService, Depends(get_export_service)],
+    client_id: Annotated[Optional[int], Query(gt=0, description="Только заказы клиента")] = None,
+    id_from: Annotated[Optional[int], Query(gt=0, description="Минимальный ID заказа")] = None,
+    id_to: Annotated[Optional[int], Query(gt=0, description="Максимальный ID заказа")] = None,
+    accept_encoding: Annotated[Optional[str], Header()] = None
+) -> StreamingResponse:
+    """
+    Выгрузить заказы в NDJSON
+    
+    Каждая строка ответа - заказ: `{"id", "client_id", "version", "lines":
+    [{"good_id", "amount", "price"}]}`, заказы идут по возрастанию ID.
+    Фильтры по клиенту и диапазону ID (включительно) можно сочетать.
+    
+    Заказы читаются серверным курсором порциями и передаются по мере чтения,
+    поэтому объём выгрузки не ограничен памятью воркера. Выгрузка видит снимок
+    БД на момент начала. Если клиент принимает gzip, ответ сжимается
+    (`Content-Encoding: gzip`).
+    
+    Выгрузки используют отдельный малый пул соединений и не занимают
+    соединения запросов API; когда он занят, возвращается `503` с Retry-After.
+    Если запрос к БД не уложился в `DB_COMMAND_TIMEOUT` до начала ответа,
+    возвращается `504`.
+    Прерванную выгрузку можно продолжить с `id_from` = последний ID + 1.
+    """
+    compress = accepts_gzip(accept_encoding)
+    try:
+        export = await export_service.export_orders(client_id, id_from, id_to, compress)
+    except ExportUnavailable as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "5"}
+        )
+    except ExportTimeout as e:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Внутренняя ошибка сервера: {str(e)}"
+        )
+    
+    headers = {"Vary": "Accept-Encoding", "Cache-Control": "no-store"}
+    if export.compressed:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(export, media_type="application/x-ndjson", headers=headers)
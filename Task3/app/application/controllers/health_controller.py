@@ -0,0 +1,43 @@
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+from ...infrastructure.monitoring.health import health_checker
+
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+
+@router.get(
+    "/live",
+    summary="Проба живости",
+    description="Процесс запущен и обрабатывает запросы. Не обращается к БД."
+)
+async def live() -> dict:
+    """
+    Проба живости
+    
+    Отвечает 200, пока цикл событий воркера обрабатывает запросы. Состояние
+    БД не учитывается: недоступная БД - повод снять воркер с балансировки,
+    а не перезапускать его.
+    """
+    return {"status": "alive"}
+
+
+@router.get(
+    "/ready",
+    summary="Проба готовности",
+    description="Результат последней фоновой проверки БД и заполненность пула. 503, если воркер не готов."
+)
+async def ready() -> JSONResponse:
+    """
+    Проба готовности
+    
+    Отдаёт сохранённый результат фоновой проверки БД и счётчики пула
+    соединений, не обращаясь к БД и не занимая соединение. В reasons
+    перечислены причины неготовности: БД недоступна, проверка устарела,
+    очередь за соединениями пула слишком длинная.
+    """
+    readiness = health_checker.readiness()
+    return JSONResponse(
+        readiness,
+        status_code=status.HTTP_200_OK if readiness["ready"] else status.HTTP_503_SERVICE_UNAVAILABLE
+    )
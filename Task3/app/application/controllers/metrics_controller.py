@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Response
+from ...infrastructure.monitoring.metrics import CONTENT_TYPE_LATEST, render_latest
+
+
+router = APIRouter(tags=["monitoring"])
+
+
+@router.get(
+    "/metrics",
+    summary="Метрики Prometheus",
+    description="Метрики HTTP-запросов, методов репозитория и пула соединений в формате Prometheus."
+)
+async def get_metrics() -> Response:
+    """Метрики Prometheus (агрегируются по всем воркерам при PROMETHEUS_MULTIPROC_DIR)"""
+    return Response(content=render_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -1,13 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import Annotated
-from ..dto.order_dto import AddOrderedGoodRequest, AddOrderedGoodResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Response, status
+from typing import Annotated, Optional
+from uuid import UUID
+from ..dto.order_dto import (
+    AddOrderedGoodRequest,
+    AddOrderedGoodResponse,
+    AddGoodTicketResponse,
+    AddOrderedGoodsRequest,
+    AddOrderedGoodsResponse,
+    OrderDetailsResponse
+)
 from ..services.order_service import OrderService
+from .responses import ModelResponse
 from ...domain.repositories.order_repository import OrderRepository
 from ...infrastructure.repositories.order_repository_impl import OrderRepositoryImpl
+from ...infrastructure.repositories.coalescing_order_repository import (
+    CoalescingOrderRepository,
+    add_good_coalescer
+)
+from ...infrastructure.repositories.write_behind import add_good_write_behind
 
 
 def get_order_repository() -> OrderRepository:
     """Dependency для получения репозитория заказов"""
+    if add_good_coalescer.enabled:
+        return CoalescingOrderRepository(add_good_coalescer)
     return OrderRepositoryImpl()
 
 
@@ -15,7 +31,41 @@ def get_order_service(
     order_repository: Annotated[OrderRepository, Depends(get_order_repository)]
 ) -> OrderService:
     """Dependency для получения сервиса заказов"""
-    return OrderService(order_repository)
+    return OrderService(order_repository, add_good_write_behind)
+
+
+def prefers_respond_async(prefer: Optional[str]) -> bool:
+    """Проверить предпочтение respond-async в заголовке Prefer (RFC 7240)"""
+    if not prefer:
+        return False
+    return any(
+        preference.split(";")[0].strip().lower() == "respond-async"
+        for preference in prefer.split(",")
+    )
+
+
+def raise_for_failed_add(response: AddOrderedGoodResponse) -> None:
+    """Преобразовать неуспешный результат добавления товара в HTTP-ошибку"""
+    if "Ключ идемпотентности" in response.message:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=response.message
+        )
+    elif "не найден" in response.message:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=response.message
+        )
+    elif "Недостаточно товара" in response.message:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=response.message
+        )
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=response.message
+        )
 
 
 router = APIRouter(prefix="/orders", tags=["orders"])
@@ -30,14 +80,19 @@ router = APIRouter(prefix="/orders", tags=["orders"])
 )
 async def add_good_to_order(
     request: AddOrderedGoodRequest,
-    order_service: Annotated[OrderService, Depends(get_order_service)]
-) -> AddOrderedGoodResponse:
+    order_service: Annotated[OrderService, Depends(get_order_service)],
+    idempotency_key: Annotated[Optional[str], Header(min_length=1, max_length=255)] = None,
+    prefer: Annotated[Optional[str], Header()] = None
+) -> Response:
     """
     Добавить товар в заказ
     
     - **order_id**: ID существующего заказа
     - **good_id**: ID товара для добавления
     - **amount**: Количество товара (должно быть больше 0)
+    - **Idempotency-Key** (заголовок, необязательный): повтор запроса с тем же ключом
+      возвращает сохранённый ответ без повторного списания; тот же ключ с другими
+      параметрами запроса возвращает 422
     
     **Побочные эффекты:**
     - Уменьшает количество товара на складе на указанное количество
@@ -45,28 +100,23 @@ async def add_good_to_order(
     - Если товара нет в наличии, возвращает ошибку 400
     
     Возвращает результат операции с информацией об остатке на складе.
+    
+    **Отложенный режим:** с заголовком `Prefer: respond-async` (без Idempotency-Key)
+    запрос после проверки товара ставится в очередь и сразу получает `202` с тикетом;
+    заказ и остаток проверяются при пакетном применении, результат - по
+    `GET /orders/tickets/{ticket_id}` (заголовок Location). При заполненной очереди
+    возвращается `503` с Retry-After.
     """
     try:
-        response = await order_service.add_ordered_good(request)
+        if prefers_respond_async(prefer) and idempotency_key is None and add_good_write_behind.enabled:
+            return await submit_good_to_order(request, order_service)
+        
+        response = await order_service.add_ordered_good(request, idempotency_key)
         
         if not response.success:
-            if "не найден" in response.message:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=response.message
-                )
-            elif "Недостаточно товара" in response.message:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=response.message
-                )
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=response.message
-                )
+            raise_for_failed_add(response)
         
-        return response
+        return ModelResponse(response, status_code=status.HTTP_201_CREATED)
         
     except HTTPException:
         raise
@@ -75,3 +125,142 @@ async def add_good_to_order(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Внутренняя ошибка сервера: {str(e)}"
         )
+
+
+async def submit_good_to_order(request: AddOrderedGoodRequest, order_service: OrderService) -> Response:
+    """Принять добавление товара в отложенном режиме: 202 с тикетом"""
+    response = await order_service.submit_ordered_good(request)
+    
+    if response is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Очередь отложенных добавлений заполнена, повторите запрос позже",
+            headers={"Retry-After": str(add_good_write_behind.retry_after())}
+        )
+    if isinstance(response, AddOrderedGoodResponse):
+        raise_for_failed_add(response)
+    
+    return ModelResponse(
+        response,
+        status_code=status.HTTP_202_ACCEPTED,
+        headers={
+            "Location": f"{router.prefix}/tickets/{response.ticket_id}",
+            "Preference-Applied": "respond-async"
+        }
+    )
+
+
+@router.post(
+    "/add-goods",
+    response_model=AddOrderedGoodsResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="Добавить пакет товаров в заказы",
+    description="Добавляет несколько товаров в заказы одной транзакцией. Возвращает результат по каждой строке."
+)
+async def add_goods_to_orders(
+    request: AddOrderedGoodsRequest,
+    order_service: Annotated[OrderService, Depends(get_order_service)]
+) -> Response:
+    """
+    Добавить пакет товаров в заказы
+    
+    - **lines**: строки пакета в формате запроса `/orders/add-good`
+    - **atomic**: `true` - всё или ничего, `false` - применяются все корректные строки
+    
+    Строки обрабатываются в порядке запроса: если несколько строк списывают один товар,
+    остаток проверяется с учётом предыдущих строк пакета.
+    
+    Если не применена ни одна строка, возвращается 400 с результатами по строкам.
+    """
+    try:
+        response = await order_service.add_ordered_goods(request)
+        
+        if not response.success:
+            return ModelResponse(response, status_code=status.HTTP_400_BAD_REQUEST)
+        
+        return ModelResponse(response, status_code=status.HTTP_201_CREATED)
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Внутренняя ошибка сервера: {str(e)}"
+        )
+
+
+@router.get(
+    "/tickets/{ticket_id}",
+    response_model=AddGoodTicketResponse,
+    summary="Состояние отложенного добавления",
+    description="Состояние тикета, выданного POST /orders/add-good с Prefer: respond-async."
+)
+async def get_ticket(
+    ticket_id: Annotated[UUID, Path(description="ID тикета")],
+    order_service: Annotated[OrderService, Depends(get_order_service)]
+) -> Response:
+    """
+    Состояние отложенного добавления товара
+    
+    - **pending** - тикет ждёт в очереди воркера, принявшего запрос
+    - **completed** - строка обработана; результат в success, result_status и message
+    - **failed** - пакет не применён из-за ошибки БД, товар не списан
+    
+    Ожидающий тикет виден только на принявшем его воркере, обработанный -
+    с любого воркера до истечения срока хранения тикетов. Для неизвестного
+    тикета возвращается 404.
+    """
+    try:
+        response = await order_service.get_ticket(str(ticket_id))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Внутренняя ошибка сервера: {str(e)}"
+        )
+    
+    if response is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Тикет не найден"
+        )
+    
+    return ModelResponse(response, headers={"Cache-Control": "no-cache"})
+
+
+@router.get(
+    "/{order_id}",
+    response_model=OrderDetailsResponse,
+    summary="Получить заказ",
+    description="Возвращает заказ, его строки и цены товаров. Поддерживает условные запросы через ETag/If-None-Match.",
+    responses={304: {"description": "Заказ не изменился с версии из If-None-Match"}}
+)
+async def get_order(
+    order_id: Annotated[int, Path(gt=0, description="ID заказа")],
+    order_service: Annotated[OrderService, Depends(get_order_service)],
+    if_none_match: Annotated[Optional[str], Header()] = None
+):
+    """
+    Получить заказ со строками
+    
+    Ответ содержит заголовок **ETag**, привязанный к версии заказа. Запрос с
+    **If-None-Match**, совпадающим с текущим ETag, получает `304 Not Modified`
+    без тела; если заказ есть в кэше, обращения к БД при этом не происходит.
+    """
+    try:
+        found = await order_service.get_order(order_id, if_none_match)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Внутренняя ошибка сервера: {str(e)}"
+        )
+    
+    if found is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Заказ не найден"
+        )
+    
+    order, etag = found
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if order is None:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    return ModelResponse(order, headers=headers)
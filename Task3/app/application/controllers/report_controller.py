@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Annotated
+from ..dto.report_dto import TopGoodsReportResponse
+from ..services.report_service import ReportService
+from ...infrastructure.cache.top_goods_report import top_goods_report
+
+
+def get_report_service() -> ReportService:
+    """Dependency для получения сервиса отчётов"""
+    return ReportService(top_goods_report)
+
+
+router = APIRouter(prefix="/reports", tags=["reports"])
+
+
+@router.get(
+    "/top-goods",
+    response_model=TopGoodsReportResponse,
+    summary="Топ-5 товаров",
+    description="Последний снимок отчёта top5_monthly_purchased_goods и его возраст."
+)
+async def get_top_goods(
+    report_service: Annotated[ReportService, Depends(get_report_service)]
+) -> TopGoodsReportResponse:
+    """
+    Топ-5 товаров по количеству проданных штук
+    
+    Отчёт отдаётся из памяти воркера без обращения к БД. Он обновляется
+    в фоне по интервалу и по числу добавлений товара, поэтому age_seconds
+    показывает, насколько снимок может отставать от заказов.
+    """
+    report = report_service.get_top_goods()
+    if report is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Отчёт ещё не загружен"
+        )
+    return report
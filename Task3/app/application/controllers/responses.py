@@ -0,0 +1,28 @@
+from typing import Mapping, Optional
+from fastapi import Response
+from pydantic import BaseModel
+
+
+class ModelResponse(Response):
+    """JSON-ответ из готовой pydantic-модели
+    
+    Тело сериализуется скомпилированным сериализатором модели (pydantic-core)
+    прямо в байты. Если вернуть из маршрута саму модель, FastAPI повторно
+    валидирует её по response_model, переводит в dict и затем кодирует
+    через json.dumps; для моделей, которые собирает сервис, это лишняя работа.
+    response_model в декораторе маршрута остаётся для документации OpenAPI.
+    """
+    
+    media_type = "application/json"
+    
+    def __init__(
+        self,
+        model: BaseModel,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None
+    ):
+        super().__init__(
+            content=model.__pydantic_serializer__.to_json(model),
+            status_code=status_code,
+            headers=headers
+        )
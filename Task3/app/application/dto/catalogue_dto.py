@@ -0,0 +1,47 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+
+class CategoryResponse(BaseModel):
+    """DTO категории каталога"""
+    id: int = Field(..., description="ID категории")
+    name: str = Field(..., description="Наименование категории")
+    path: str = Field(..., description="Путь от корня каталога (ID категорий через точку)")
+    parent_id: Optional[int] = Field(None, description="ID родительской категории")
+    depth: int = Field(..., description="Уровень вложенности, 1 - корневая категория")
+    children_count: int = Field(..., description="Количество дочерних категорий 1-го уровня")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "id": 4,
+                "name": "Холодильники",
+                "path": "1.4",
+                "parent_id": 1,
+                "depth": 2,
+                "children_count": 2
+            }
+        }
+
+
+class GoodResponse(BaseModel):
+    """DTO товара"""
+    id: int = Field(..., description="ID товара")
+    name: str = Field(..., description="Наименование товара")
+    amount: int = Field(..., description="Остаток на складе")
+    price: float = Field(..., description="Цена за единицу")
+    catalogue_id: Optional[int] = Field(None, description="ID категории")
+
+
+class GoodRootCategoryResponse(BaseModel):
+    """DTO категории товара и её корневой категории"""
+    good_id: int = Field(..., description="ID товара")
+    category: CategoryResponse = Field(..., description="Категория товара")
+    root: CategoryResponse = Field(..., description="Категория 1-го уровня")
+
+
+class CategoryGoodsResponse(BaseModel):
+    """DTO товаров поддерева каталога"""
+    category_id: int = Field(..., description="ID категории")
+    category_ids: List[int] = Field(..., description="ID категорий поддерева, включая саму категорию")
+    goods: List[GoodResponse] = Field(..., description="Товары поддерева в порядке ID")
@@ -0,0 +1,19 @@
+from pydantic import BaseModel, Field
+
+
+class ClientTotalsResponse(BaseModel):
+    """DTO итогов клиента"""
+    client_id: int = Field(..., description="ID клиента")
+    name: str = Field(..., description="Имя клиента")
+    total_amount: int = Field(..., description="Суммарное количество заказанных товаров")
+    total_cost: float = Field(..., description="Суммарная стоимость заказанных товаров")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "client_id": 1,
+                "name": "Иванов Иван Иванович",
+                "total_amount": 17,
+                "total_cost": 830484.8
+            }
+        }
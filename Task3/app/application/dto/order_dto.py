@@ -1,5 +1,6 @@
+from datetime import datetime
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 
 
 class AddOrderedGoodRequest(BaseModel):
@@ -32,6 +33,112 @@ class AddOrderedGoodResponse(BaseModel):
         }
 
 
+class AddGoodTicketResponse(BaseModel):
+    """DTO тикета отложенного добавления товара в заказ"""
+    ticket_id: str = Field(..., description="ID тикета")
+    status: str = Field(..., description="pending - в очереди, completed - обработан, failed - не применён из-за ошибки БД")
+    order_id: int = Field(..., description="ID заказа")
+    good_id: int = Field(..., description="ID товара")
+    amount: int = Field(..., description="Запрошенное количество")
+    accepted_at: datetime = Field(..., description="Время приёма запроса")
+    completed_at: Optional[datetime] = Field(None, description="Время обработки")
+    success: Optional[bool] = Field(None, description="Добавлен ли товар в заказ")
+    result_status: Optional[str] = Field(None, description="Код результата, как в пакетном добавлении")
+    message: Optional[str] = Field(None, description="Сообщение о результате")
+    stock_left: Optional[int] = Field(None, description="Остаток на складе после строки")
+    ordered_amount: Optional[int] = Field(None, description="Количество товара в заказе после строки")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "ticket_id": "0b6f3f8e-5d0c-4d8e-9a55-2b8f0f6c1a9e",
+                "status": "completed",
+                "order_id": 1,
+                "good_id": 5,
+                "amount": 2,
+                "accepted_at": "2024-05-01T12:00:00.000000Z",
+                "completed_at": "2024-05-01T12:00:00.031000Z",
+                "success": True,
+                "result_status": "ok",
+                "message": "Товар успешно добавлен в заказ. Остаток на складе: 41",
+                "stock_left": 41,
+                "ordered_amount": 2
+            }
+        }
+
+
+class AddOrderedGoodsRequest(BaseModel):
+    """DTO для пакетного добавления товаров в заказы"""
+    lines: List[AddOrderedGoodRequest] = Field(
+        ..., min_length=1, max_length=1000, description="Строки пакета"
+    )
+    atomic: bool = Field(
+        True, description="Всё или ничего: при ошибке в любой строке пакет не применяется"
+    )
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "lines": [
+                    {"order_id": 1, "good_id": 5, "amount": 2},
+                    {"order_id": 2, "good_id": 1, "amount": 1}
+                ],
+                "atomic": True
+            }
+        }
+
+
+class AddOrderedGoodLineResult(BaseModel):
+    """DTO с результатом обработки одной строки пакета"""
+    order_id: int = Field(..., description="ID заказа")
+    good_id: int = Field(..., description="ID товара")
+    amount: int = Field(..., description="Запрошенное количество")
+    success: bool = Field(..., description="Применена ли строка")
+    status: str = Field(..., description="Код результата")
+    message: str = Field(..., description="Сообщение о результате")
+    stock_left: Optional[int] = Field(None, description="Остаток на складе после строки")
+    ordered_amount: Optional[int] = Field(None, description="Количество товара в заказе после строки")
+
+
+class AddOrderedGoodsResponse(BaseModel):
+    """DTO для ответа при пакетном добавлении товаров"""
+    success: bool = Field(..., description="Применена ли хотя бы одна строка")
+    message: str = Field(..., description="Сообщение о результате")
+    applied: int = Field(..., description="Количество применённых строк")
+    results: List[AddOrderedGoodLineResult] = Field(..., description="Результаты по строкам в порядке запроса")
+
+
+class OrderLineResponse(BaseModel):
+    """DTO строки заказа"""
+    good_id: int = Field(..., description="ID товара")
+    name: str = Field(..., description="Наименование товара")
+    amount: int = Field(..., description="Количество товара в заказе")
+    price: float = Field(..., description="Цена за единицу")
+    total: float = Field(..., description="Стоимость строки")
+
+
+class OrderDetailsResponse(BaseModel):
+    """DTO заказа со строками"""
+    id: int = Field(..., description="ID заказа")
+    client_id: int = Field(..., description="ID клиента")
+    version: int = Field(..., description="Версия заказа, увеличивается при изменении строк")
+    lines: List[OrderLineResponse] = Field(..., description="Строки заказа в порядке ID товара")
+    total: float = Field(..., description="Стоимость заказа")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "id": 1,
+                "client_id": 1,
+                "version": 3,
+                "lines": [
+                    {"good_id": 5, "name": "Телевизор Samsung", "amount": 2, "price": 49999.0, "total": 99998.0}
+                ],
+                "total": 99998.0
+            }
+        }
+
+
 class ErrorResponse(BaseModel):
     """DTO для ошибок"""
     success: bool = Field(False, description="Успешность операции")
@@ -0,0 +1,34 @@
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import List
+
+
+class TopGoodResponse(BaseModel):
+    """DTO строки отчёта топ-5 товаров"""
+    good_id: int = Field(..., description="ID товара")
+    name: str = Field(..., description="Наименование товара")
+    category: str = Field(..., description="Категория 1-го уровня")
+    total_sold: int = Field(..., description="Общее количество проданных штук")
+
+
+class TopGoodsReportResponse(BaseModel):
+    """DTO отчёта топ-5 товаров"""
+    refreshed_at: datetime = Field(..., description="Время последнего обновления отчёта")
+    age_seconds: float = Field(..., description="Сколько секунд прошло с обновления отчёта")
+    goods: List[TopGoodResponse] = Field(..., description="Товары по убыванию проданного количества")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "refreshed_at": "2024-01-01T12:00:00+00:00",
+                "age_seconds": 42.5,
+                "goods": [
+                    {
+                        "good_id": 13,
+                        "name": "Ноутбук Lenovo 17\"",
+                        "category": "Компьютеры",
+                        "total_sold": 16
+                    }
+                ]
+            }
+        }
@@ -0,0 +1,85 @@
+import json
+from ...infrastructure.database.admission import (
+    READ,
+    REPORT,
+    WRITE,
+    AdmissionController,
+    admission_controller
+)
+
+
+class AdmissionMiddleware:
+    """ASGI-middleware: ограничение одновременных запросов API с отказом 503
+    
+    Класс запроса определяется по методу и префиксу пути до маршрутизации:
+    отчёты и выгрузки, запись (не GET), чтение. Пробы, метрики и документация
+    не ограничиваются. Место освобождается с первой частью тела ответа:
+    у потоковой выгрузки дальнейшая передача идёт на соединении пула
+    выгрузок и не занимает место запросов API.
+    """
+    
+    def __init__(
+        self,
+        app,
+        controller: AdmissionController = admission_controller,
+        report_prefixes: tuple = ("/reports", "/export"),
+        excluded_prefixes: tuple = ("/health", "/metrics", "/docs", "/redoc", "/openapi.json")
+    ):
+        self.app = app
+        self.controller = controller
+        self.report_prefixes = report_prefixes
+        self.excluded_prefixes = excluded_prefixes
+    
+    def route_class(self, method: str, path: str) -> str:
+        if path.startswith(self.report_prefixes):
+            return REPORT
+        if method in ("GET", "HEAD"):
+            return READ
+        return WRITE
+    
+    async def __call__(self, scope, receive, send):
+        if (
+            not self.controller.enabled
+            or scope["type"] != "http"
+            or scope["path"] == "/"
+            or scope["path"].startswith(self.excluded_prefixes)
+        ):
+            await self.app(scope, receive, send)
+            return
+        
+        if not await self.controller.acquire(self.route_class(scope["method"], scope["path"])):
+            await self._reject(send)
+            return
+        
+        released = False
+        
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self.controller.release()
+        
+        async def send_wrapper(message):
+            if message["type"] == "http.response.body":
+                release()
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            release()
+    
+    async def _reject(self, send) -> None:
+        body = json.dumps(
+            {"detail": "Сервер перегружен, повторите запрос позже"}, ensure_ascii=False
+        ).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.controller.retry_after).encode())
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,38 @@
+import time
+from ...infrastructure.monitoring.metrics import HTTP_REQUEST_DURATION
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: гистограмма длительности запросов по маршруту и статусу
+    
+    Маршрут берётся из шаблона пути (/orders/{id}), а не из фактического URL,
+    чтобы число меток оставалось ограниченным.
+    """
+    
+    def __init__(self, app, excluded_paths: tuple = ("/metrics",)):
+        self.app = app
+        self.excluded_paths = excluded_paths
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+        
+        started = time.perf_counter()
+        status_code = 500
+        
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                method=scope["method"],
+                route=route.path if route is not None else "unmatched",
+                status=str(status_code)
+            ).observe(time.perf_counter() - started)
@@ -0,0 +1,36 @@
+from ...infrastructure.database.connection import db_connection
+from ...infrastructure.database.tracing import QueryTracer
+
+
+class SqlTracingMiddleware:
+    """ASGI-middleware: трассировка запросов к БД и заголовок Server-Timing
+    
+    Запросы к БД, выполненные до начала ответа, попадают в заголовок
+    Server-Timing этого ответа. У потоковых ответов запросы после отправки
+    заголовков учитываются только в журнале медленных запросов.
+    """
+    
+    def __init__(self, app, tracer: QueryTracer = db_connection.tracer, excluded_paths: tuple = ("/metrics",)):
+        self.app = app
+        self.tracer = tracer
+        self.excluded_paths = excluded_paths
+    
+    async def __call__(self, scope, receive, send):
+        if not self.tracer.enabled or scope["type"] != "http" or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+        
+        token = self.tracer.start_request(scope["path"])
+        trace = self.tracer.current()
+        
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.tracer.finish_request(token)
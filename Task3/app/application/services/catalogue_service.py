@@ -0,0 +1,84 @@
+from typing import List, Optional
+from ...domain.models.catalogue import Category, CatalogueTree
+from ...domain.models.order import Good
+from ...domain.repositories.order_repository import OrderRepository
+from ...infrastructure.cache.catalogue_cache import CatalogueCache
+from ..dto.catalogue_dto import (
+    CategoryGoodsResponse,
+    CategoryResponse,
+    GoodResponse,
+    GoodRootCategoryResponse
+)
+
+
+class CatalogueService:
+    """Сервис для работы с каталогом"""
+    
+    def __init__(self, order_repository: OrderRepository, catalogue_cache: CatalogueCache):
+        self.order_repository = order_repository
+        self.catalogue_cache = catalogue_cache
+    
+    async def get_children(self, category_id: int) -> Optional[List[CategoryResponse]]:
+        """Получить дочерние категории 1-го уровня вложенности"""
+        tree = await self.catalogue_cache.get()
+        if category_id not in tree:
+            return None
+        return [self._to_response(child) for child in tree.children(category_id)]
+    
+    async def get_descendants(self, category_id: int) -> Optional[List[CategoryResponse]]:
+        """Получить все категории поддерева (без самой категории)"""
+        tree = await self.catalogue_cache.get()
+        if category_id not in tree:
+            return None
+        return [self._to_response(category) for category in tree.descendants(category_id)]
+    
+    async def get_good_root_category(self, good_id: int) -> Optional[GoodRootCategoryResponse]:
+        """Получить категорию товара и её категорию 1-го уровня"""
+        good = await self.order_repository.get_good_by_id(good_id)
+        if not good or good.catalogue_id is None:
+            return None
+        
+        tree = await self.catalogue_cache.get()
+        if good.catalogue_id not in tree:
+            return None
+        
+        return GoodRootCategoryResponse(
+            good_id=good.id,
+            category=self._to_response(tree.get(good.catalogue_id)),
+            root=self._to_response(tree.root(good.catalogue_id))
+        )
+    
+    async def get_subtree_goods(self, category_id: int) -> Optional[CategoryGoodsResponse]:
+        """Получить товары категории и всех её потомков одним запросом"""
+        tree = await self.catalogue_cache.get()
+        if category_id not in tree:
+            return None
+        
+        category_ids = tree.subtree_ids(category_id)
+        goods = await self.order_repository.get_goods_by_catalogue_ids(category_ids)
+        return CategoryGoodsResponse(
+            category_id=category_id,
+            category_ids=category_ids,
+            goods=[self._good_to_response(good) for good in goods]
+        )
+    
+    @staticmethod
+    def _to_response(category: Category) -> CategoryResponse:
+        return CategoryResponse(
+            id=category.id,
+            name=category.name,
+            path=category.path,
+            parent_id=category.parent_id,
+            depth=category.depth,
+            children_count=len(category.children)
+        )
+    
+    @staticmethod
+    def _good_to_response(good: Good) -> GoodResponse:
+        return GoodResponse(
+            id=good.id,
+            name=good.name,
+            amount=good.amount,
+            price=good.price,
+            catalogue_id=good.catalogue_id
+        )
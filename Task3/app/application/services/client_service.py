@@ -0,0 +1,23 @@
+from typing import Optional
+from ...domain.repositories.client_repository import ClientRepository
+from ..dto.client_dto import ClientTotalsResponse
+
+
+class ClientService:
+    """Сервис для работы с клиентами"""
+    
+    def __init__(self, client_repository: ClientRepository):
+        self.client_repository = client_repository
+    
+    async def get_client_totals(self, client_id: int) -> Optional[ClientTotalsResponse]:
+        """Получить итоги клиента"""
+        totals = await self.client_repository.get_client_totals(client_id)
+        if totals is None:
+            return None
+        
+        return ClientTotalsResponse(
+            client_id=totals.client_id,
+            name=totals.name,
+            total_amount=totals.total_amount,
+            total_cost=totals.total_cost
+        )
@@ -0,0 +1,23 @@
+from typing import Optional
+from ...infrastructure.database.order_export import OrderExport, OrderExporter
+
+
+class ExportService:
+    """Сервис выгрузок"""
+    
+    def __init__(self, order_exporter: OrderExporter):
+        self.order_exporter = order_exporter
+    
+    async def export_orders(
+        self,
+        client_id: Optional[int] = None,
+        id_from: Optional[int] = None,
+        id_to: Optional[int] = None,
+        compress: bool = False
+    ) -> OrderExport:
+        """Открыть потоковую выгрузку заказов в NDJSON
+        
+        Если выгрузку начать нельзя, выбрасывается ExportUnavailable, если
+        первая порция не прочитана за тайм-аут БД - ExportTimeout.
+        """
+        return await self.order_exporter.open(client_id, id_from, id_to, compress)
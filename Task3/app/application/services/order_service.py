@@ -1,88 +1,244 @@
-from typing import Optional
-from ...domain.models.order import Order, OrderedGood, Good
+import hashlib
+from typing import Optional, Tuple, Union
+from ...domain.models.order import (
+    Order,
+    OrderedGood,
+    OrderDetails,
+    Good,
+    AddGoodResult,
+    AddGoodStatus,
+    AddGoodTicket,
+    TicketStatus
+)
 from ...domain.repositories.order_repository import OrderRepository
-from ..dto.order_dto import AddOrderedGoodRequest, AddOrderedGoodResponse, ErrorResponse
+from ...infrastructure.repositories.write_behind import AddGoodWriteBehind
+from ..dto.order_dto import (
+    AddOrderedGoodRequest,
+    AddOrderedGoodResponse,
+    AddGoodTicketResponse,
+    AddOrderedGoodsRequest,
+    AddOrderedGoodsResponse,
+    AddOrderedGoodLineResult,
+    OrderDetailsResponse,
+    OrderLineResponse,
+    ErrorResponse
+)
+
+
+def result_message(result: AddGoodResult, requested_amount: int) -> str:
+    """Сформировать сообщение о результате добавления товара в заказ"""
+    if result.status is AddGoodStatus.ORDER_NOT_FOUND:
+        return "Заказ не найден"
+    if result.status is AddGoodStatus.GOOD_NOT_FOUND:
+        return "Товар не найден"
+    if result.status is AddGoodStatus.INSUFFICIENT_STOCK:
+        return f"Недостаточно товара на складе. Доступно: {result.stock_left}, запрошено: {requested_amount}"
+    if result.status is AddGoodStatus.NOT_APPLIED:
+        return "Строка не применена из-за ошибок в других строках пакета"
+    if result.status is AddGoodStatus.KEY_REUSED:
+        return "Ключ идемпотентности уже использован с другими параметрами запроса"
+    if result.ordered_amount > requested_amount:
+        # Товар уже был в заказе, его количество увеличено
+        return f"Количество товара в заказе увеличено. Новое количество: {result.ordered_amount}. Остаток на складе: {result.stock_left}"
+    return f"Товар успешно добавлен в заказ. Остаток на складе: {result.stock_left}"
+
+
+def ticket_response(ticket: AddGoodTicket) -> AddGoodTicketResponse:
+    """Сформировать ответ по тикету отложенного добавления"""
+    result = ticket.result
+    if ticket.status is TicketStatus.FAILED:
+        message = f"Пакет не применён из-за ошибки БД, товар не списан: {ticket.error}"
+    elif result is not None:
+        message = result_message(result, ticket.line.amount)
+    else:
+        message = None
+    return AddGoodTicketResponse(
+        ticket_id=ticket.id,
+        status=ticket.status.value,
+        order_id=ticket.line.order_id,
+        good_id=ticket.line.good_id,
+        amount=ticket.line.amount,
+        accepted_at=ticket.accepted_at,
+        completed_at=ticket.completed_at,
+        success=result.success if result is not None else (False if ticket.status is TicketStatus.FAILED else None),
+        result_status=result.status.value if result is not None else None,
+        message=message,
+        stock_left=result.stock_left if result is not None else None,
+        ordered_amount=result.ordered_amount if result is not None else None
+    )
+
+
+def order_etag(details: OrderDetails) -> str:
+    """ETag заказа: версия строк заказа и отпечаток содержимого
+    
+    Версия меняется при изменении строк и клиента заказа, отпечаток - при
+    изменении наименований и цен товаров, которые версию не затрагивают.
+    """
+    digest = hashlib.blake2b(
+        repr((details.order.client_id, [
+            (line.good_id, line.name, line.amount, line.price) for line in details.lines
+        ])).encode(),
+        digest_size=8
+    ).hexdigest()
+    return f'"{details.order.id}-{details.version}-{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Проверить заголовок If-None-Match (слабое сравнение, RFC 9110)"""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in (candidate.removeprefix("W/") for candidate in candidates)
 
 
 class OrderService:
     """Сервис для работы с заказами"""
     
-    def __init__(self, order_repository: OrderRepository):
+    def __init__(self, order_repository: OrderRepository, write_behind: Optional[AddGoodWriteBehind] = None):
         self.order_repository = order_repository
+        self.write_behind = write_behind
     
-    async def add_ordered_good(self, request: AddOrderedGoodRequest) -> AddOrderedGoodResponse:
-        """Добавить товар в заказ"""
-        try:
-            # Проверяем существование заказа
-            order = await self.order_repository.get_order_by_id(request.order_id)
-            if not order:
-                return AddOrderedGoodResponse(
-                    success=False,
-                    message="Заказ не найден"
-                )
-            
-            # Проверяем существование товара
-            good = await self.order_repository.get_good_by_id(request.good_id)
-            if not good:
-                return AddOrderedGoodResponse(
-                    success=False,
-                    message="Товар не найден"
+    async def get_order(
+        self,
+        order_id: int,
+        if_none_match: Optional[str] = None
+    ) -> Optional[Tuple[Optional[OrderDetailsResponse], str]]:
+        """Получить заказ со строками и его ETag
+        
+        ETag сверяется с If-None-Match до сборки ответа: при совпадении
+        вместо ответа возвращается None, и тело не строится.
+        """
+        details = await self.order_repository.get_order_details(order_id)
+        if details is None:
+            return None
+        
+        etag = order_etag(details)
+        if etag_matches(if_none_match, etag):
+            return None, etag
+        
+        response = OrderDetailsResponse(
+            id=details.order.id,
+            client_id=details.order.client_id,
+            version=details.version,
+            lines=[
+                OrderLineResponse(
+                    good_id=line.good_id,
+                    name=line.name,
+                    amount=line.amount,
+                    price=line.price,
+                    total=line.total
                 )
-            
-            # Проверяем наличие товара на складе
-            if good.amount < request.amount:
-                return AddOrderedGoodResponse(
-                    success=False,
-                    message=f"Недостаточно товара на складе. Доступно: {good.amount}, запрошено: {request.amount}"
-                )
-            
-            # Проверяем, есть ли уже такой товар в заказе
-            existing_ordered_goods = await self.order_repository.get_ordered_goods_by_order_id(request.order_id)
-            existing_good = next((og for og in existing_ordered_goods if og.good_id == request.good_id), None)
-            
-            # Уменьшаем количество товара на складе
-            new_stock_amount = good.amount - request.amount
-            stock_updated = await self.order_repository.update_good_amount(request.good_id, new_stock_amount)
-            
-            if not stock_updated:
-                return AddOrderedGoodResponse(
-                    success=False,
-                    message="Ошибка при обновлении количества товара на складе"
-                )
-            
-            if existing_good:
-                # Если товар уже есть в заказе, увеличиваем количество
-                new_amount = existing_good.amount + request.amount
-                updated_ordered_good = OrderedGood(
-                    order_id=request.order_id,
-                    good_id=request.good_id,
-                    amount=new_amount
+                for line in details.lines
+            ],
+            total=details.total
+        )
+        return response, etag
+    
+    async def add_ordered_good(
+        self,
+        request: AddOrderedGoodRequest,
+        idempotency_key: Optional[str] = None
+    ) -> AddOrderedGoodResponse:
+        """Добавить товар в заказ
+        
+        С ключом идемпотентности повторный запрос возвращает сохранённый
+        результат первого, не списывая товар повторно.
+        """
+        try:
+            # Проверка заказа, товара, остатка, списание и upsert выполняются в БД одним вызовом
+            if idempotency_key is not None:
+                result = await self.order_repository.add_good_to_order_once(
+                    idempotency_key,
+                    request.order_id,
+                    request.good_id,
+                    request.amount
                 )
-                success = await self.order_repository.update_ordered_good(updated_ordered_good)
-                message = f"Количество товара в заказе увеличено. Новое количество: {new_amount}. Остаток на складе: {new_stock_amount}"
             else:
-                # Если товара нет в заказе, добавляем новый
-                ordered_good = OrderedGood(
-                    order_id=request.order_id,
-                    good_id=request.good_id,
-                    amount=request.amount
+                result = await self.order_repository.add_good_to_order(
+                    request.order_id,
+                    request.good_id,
+                    request.amount
                 )
-                success = await self.order_repository.add_ordered_good(ordered_good)
-                message = f"Товар успешно добавлен в заказ. Остаток на складе: {new_stock_amount}"
             
-            if success:
-                return AddOrderedGoodResponse(
-                    success=True,
-                    message=message
-                )
-            else:
-                return AddOrderedGoodResponse(
-                    success=False,
-                    message="Ошибка при добавлении товара в заказ"
-                )
-                
+            # Поля собраны здесь же и заведомо корректны, поэтому модель
+            # создаётся без повторной валидации
+            return AddOrderedGoodResponse.model_construct(
+                success=result.success,
+                message=result_message(result, request.amount)
+            )
+        
         except Exception as e:
             return AddOrderedGoodResponse(
                 success=False,
                 message=f"Внутренняя ошибка сервера: {str(e)}"
             )
+    
+    async def submit_ordered_good(
+        self,
+        request: AddOrderedGoodRequest
+    ) -> Union[AddGoodTicketResponse, AddOrderedGoodResponse, None]:
+        """Принять добавление товара в заказ на отложенную обработку
+        
+        Перед выдачей тикета проверяется только наличие товара (по кэшу
+        товаров); заказ и остаток проверяются при применении пакета.
+        Неизвестный товар возвращает ответ с ошибкой, как синхронное
+        добавление, а заполненная очередь - None.
+        """
+        good = await self.order_repository.get_good_by_id(request.good_id)
+        if good is None:
+            return AddOrderedGoodResponse(success=False, message="Товар не найден")
+        
+        ticket = self.write_behind.submit(request.order_id, request.good_id, request.amount)
+        if ticket is None:
+            return None
+        return ticket_response(ticket)
+    
+    async def get_ticket(self, ticket_id: str) -> Optional[AddGoodTicketResponse]:
+        """Получить тикет: из памяти воркера, иначе обработанный из БД"""
+        ticket = self.write_behind.get(ticket_id) if self.write_behind is not None else None
+        if ticket is None:
+            ticket = await self.order_repository.get_add_good_ticket(ticket_id)
+        if ticket is None:
+            return None
+        return ticket_response(ticket)
+    
+    async def add_ordered_goods(self, request: AddOrderedGoodsRequest) -> AddOrderedGoodsResponse:
+        """Добавить пакет товаров в заказы
+        
+        Ошибки БД не перехватываются: пакет целиком откатывается,
+        а контроллер возвращает 500.
+        """
+        lines = [
+            OrderedGood(order_id=line.order_id, good_id=line.good_id, amount=line.amount)
+            for line in request.lines
+        ]
+        results = await self.order_repository.add_goods_to_orders(lines, atomic=request.atomic)
+        
+        line_results = [
+            AddOrderedGoodLineResult(
+                order_id=line.order_id,
+                good_id=line.good_id,
+                amount=line.amount,
+                success=result.success,
+                status=result.status.value,
+                message=result_message(result, line.amount),
+                stock_left=result.stock_left,
+                ordered_amount=result.ordered_amount
+            )
+            for line, result in zip(request.lines, results)
+        ]
+        applied = sum(1 for result in results if result.success)
+        
+        if applied == len(results):
+            message = f"Все строки пакета применены: {applied}"
+        elif applied:
+            message = f"Пакет применён частично: {applied} из {len(results)}"
+        else:
+            message = "Ни одна строка пакета не применена"
+        
+        return AddOrderedGoodsResponse(
+            success=applied > 0,
+            message=message,
+            applied=applied,
+            results=line_results
+        )
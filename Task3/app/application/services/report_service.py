@@ -0,0 +1,30 @@
+from typing import Optional
+from ...infrastructure.cache.top_goods_report import TopGoodsReport
+from ..dto.report_dto import TopGoodResponse, TopGoodsReportResponse
+
+
+class ReportService:
+    """Сервис отчётов"""
+    
+    def __init__(self, top_goods_report: TopGoodsReport):
+        self.top_goods_report = top_goods_report
+    
+    def get_top_goods(self) -> Optional[TopGoodsReportResponse]:
+        """Получить последний снимок отчёта топ-5 товаров"""
+        snapshot = self.top_goods_report.snapshot
+        if snapshot is None:
+            return None
+        
+        return TopGoodsReportResponse(
+            refreshed_at=snapshot.refreshed_at,
+            age_seconds=round(self.top_goods_report.age_seconds(), 3),
+            goods=[
+                TopGoodResponse(
+                    good_id=good.good_id,
+                    name=good.name,
+                    category=good.category,
+                    total_sold=good.total_sold
+                )
+                for good in snapshot.goods
+            ]
+        )
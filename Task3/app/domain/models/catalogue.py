@@ -0,0 +1,140 @@
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+@dataclass
+class Category:
+    """Модель категории каталога"""
+    id: int
+    name: str
+    path: str
+    parent_id: Optional[int] = None
+    depth: int = 1
+    children: List[int] = field(default_factory=list)
+    
+    def __post_init__(self):
+        if self.id <= 0:
+            raise ValueError("Category ID must be positive")
+
+
+class CatalogueTree:
+    """Дерево каталога в памяти
+    
+    Строится из строк Catalogue: path - последовательность ID категорий от
+    корня (ltree), поэтому родитель - предпоследняя метка пути. Дочерние
+    категории и поддерево отдаются обходом списков детей, корень - подъёмом
+    по родителям за O(глубины), без запросов к БД.
+    
+    Пути не проверяются на согласованность между строками, поэтому ссылки на
+    родителей могут образовать цикл ('3.1' у категории 1 и '1.3' у 3). Цикл
+    разрывается при построении: категория, замыкающая его, становится
+    корневой, а разрыв выводится в лог.
+    """
+    
+    def __init__(self, rows: Iterable[Tuple[int, str, Optional[str]]]):
+        self._categories: Dict[int, Category] = {}
+        labels: Dict[int, List[str]] = {}
+        for category_id, name, path in rows:
+            path = path or str(category_id)
+            self._categories[category_id] = Category(id=category_id, name=name, path=path)
+            labels[category_id] = path.split(".")
+        
+        # Категория без родителя в каталоге считается корневой
+        for category in self._categories.values():
+            parent_label = labels[category.id][-2] if len(labels[category.id]) > 1 else None
+            parent_id = int(parent_label) if parent_label and parent_label.isdigit() else None
+            if parent_id in self._categories and parent_id != category.id:
+                category.parent_id = parent_id
+        self._break_cycles()
+        for category in self._categories.values():
+            if category.parent_id is not None:
+                self._categories[category.parent_id].children.append(category.id)
+        for category in self._categories.values():
+            category.children.sort()
+        
+        self._roots = sorted(c.id for c in self._categories.values() if c.parent_id is None)
+        # Глубина от корня; обход в ширину не зависит от порядка строк
+        level = self._roots
+        depth = 1
+        while level:
+            next_level = []
+            for category_id in level:
+                self._categories[category_id].depth = depth
+                next_level.extend(self._categories[category_id].children)
+            level = next_level
+            depth += 1
+    
+    def _break_cycles(self) -> None:
+        """Разорвать циклы в ссылках на родителей
+        
+        Подъём от каждой категории идёт до корня или до уже проверенной
+        категории; повтор категории в текущей цепочке означает цикл, и
+        ссылка последней категории цепочки на родителя удаляется.
+        """
+        checked: Set[int] = set()
+        for start_id in self._categories:
+            chain: List[int] = []
+            on_chain: Set[int] = set()
+            category_id = start_id
+            while category_id is not None and category_id not in checked:
+                if category_id in on_chain:
+                    cycle = chain[chain.index(category_id):]
+                    broken = self._categories[chain[-1]]
+                    print(
+                        f"Catalogue cycle {' -> '.join(map(str, cycle))} -> {category_id}: "
+                        f"category {broken.id} (path {broken.path}) treated as a root"
+                    )
+                    broken.parent_id = None
+                    break
+                chain.append(category_id)
+                on_chain.add(category_id)
+                category_id = self._categories[category_id].parent_id
+            checked.update(chain)
+    
+    def __len__(self) -> int:
+        return len(self._categories)
+    
+    def __contains__(self, category_id: int) -> bool:
+        return category_id in self._categories
+    
+    def get(self, category_id: int) -> Optional[Category]:
+        """Получить категорию по ID"""
+        return self._categories.get(category_id)
+    
+    def roots(self) -> List[Category]:
+        """Категории 1-го уровня"""
+        return [self._categories[category_id] for category_id in self._roots]
+    
+    def children(self, category_id: int) -> List[Category]:
+        """Дочерние категории 1-го уровня вложенности"""
+        category = self._categories[category_id]
+        return [self._categories[child_id] for child_id in category.children]
+    
+    def descendants(self, category_id: int) -> List[Category]:
+        """Все потомки категории в порядке обхода в глубину (без самой категории)"""
+        result: List[Category] = []
+        # Защита от зацикливания, если дерево всё же содержит цикл
+        seen = {category_id}
+        stack = list(reversed(self._categories[category_id].children))
+        while stack:
+            child_id = stack.pop()
+            if child_id in seen:
+                continue
+            seen.add(child_id)
+            category = self._categories[child_id]
+            result.append(category)
+            stack.extend(reversed(category.children))
+        return result
+    
+    def subtree_ids(self, category_id: int) -> List[int]:
+        """ID категории и всех её потомков"""
+        return [category_id] + [category.id for category in self.descendants(category_id)]
+    
+    def root(self, category_id: int) -> Category:
+        """Категория 1-го уровня, к которой относится категория"""
+        category = self._categories[category_id]
+        seen = {category.id}
+        while category.parent_id is not None and category.parent_id not in seen:
+            category = self._categories[category.parent_id]
+            seen.add(category.id)
+        return category
@@ -1,8 +1,16 @@
 from dataclasses import dataclass
-from typing import Optional
+from datetime import datetime
+from enum import Enum
+from typing import List, Mapping, Optional
 
 
-@dataclass
+# Модели, создаваемые на каждую строку БД, объявлены с __slots__: они
+# компактнее в кэшах и быстрее создаются. Конструктор проверяет данные,
+# а from_row создаёт модель из строки БД без проверок - их уже обеспечивают
+# ограничения таблиц (CHECK, NOT NULL, FOREIGN KEY).
+
+
+@dataclass(slots=True)
 class Order:
     """Модель заказа"""
     id: int
@@ -13,9 +21,17 @@ class Order:
             raise ValueError("Order ID must be positive")
         if self.client_id <= 0:
             raise ValueError("Client ID must be positive")
+    
+    @classmethod
+    def from_row(cls, row: Mapping) -> "Order":
+        """Создать заказ из строки БД без проверок"""
+        order = object.__new__(cls)
+        order.id = row['id']
+        order.client_id = row['client_id']
+        return order
 
 
-@dataclass
+@dataclass(slots=True)
 class OrderedGood:
     """Модель товара в заказе"""
     order_id: int
@@ -29,9 +45,18 @@ class OrderedGood:
             raise ValueError("Good ID must be positive")
         if self.amount <= 0:
             raise ValueError("Amount must be positive")
+    
+    @classmethod
+    def from_row(cls, row: Mapping) -> "OrderedGood":
+        """Создать товар в заказе из строки БД без проверок"""
+        ordered_good = object.__new__(cls)
+        ordered_good.order_id = row['order_id']
+        ordered_good.good_id = row['good_id']
+        ordered_good.amount = row['amount']
+        return ordered_good
 
 
-@dataclass
+@dataclass(slots=True)
 class Good:
     """Модель товара"""
     id: int
@@ -51,6 +76,55 @@ class Good:
             raise ValueError("Price cannot be negative")
         if self.catalogue_id is not None and self.catalogue_id <= 0:
             raise ValueError("Catalogue ID must be positive")
+    
+    @classmethod
+    def from_row(cls, row: Mapping) -> "Good":
+        """Создать товар из строки БД без проверок"""
+        good = object.__new__(cls)
+        good.id = row['id']
+        good.name = row['name']
+        good.amount = row['amount']
+        good.price = float(row['price'])
+        good.catalogue_id = row['catalogue_id']
+        return good
+    
+    def copy(self) -> "Good":
+        """Независимая копия товара без проверок"""
+        good = object.__new__(Good)
+        good.id = self.id
+        good.name = self.name
+        good.amount = self.amount
+        good.price = self.price
+        good.catalogue_id = self.catalogue_id
+        return good
+
+
+@dataclass(slots=True)
+class OrderLine:
+    """Модель строки заказа с данными товара"""
+    good_id: int
+    name: str
+    amount: int
+    price: float
+    
+    @property
+    def total(self) -> float:
+        return round(self.amount * self.price, 2)
+
+
+@dataclass
+class OrderDetails:
+    """Модель заказа со строками
+    
+    version увеличивается триггером при каждом изменении строк заказа.
+    """
+    order: Order
+    version: int
+    lines: List[OrderLine]
+    
+    @property
+    def total(self) -> float:
+        return round(sum(line.total for line in self.lines), 2)
 
 
 @dataclass
@@ -65,3 +139,86 @@ class Client:
             raise ValueError("Client ID must be positive")
         if not self.name or not self.name.strip():
             raise ValueError("Client name cannot be empty")
+
+
+@dataclass
+class ClientTotals:
+    """Модель итогов клиента: количество и стоимость заказанных товаров"""
+    client_id: int
+    name: str
+    total_amount: int
+    total_cost: float
+
+
+@dataclass
+class ClientTotalsDrift:
+    """Расхождение сохранённых итогов клиента с пересчитанными"""
+    client_id: int
+    stored_amount: int
+    actual_amount: int
+    stored_cost: float
+    actual_cost: float
+
+
+@dataclass
+class TopGood:
+    """Строка отчёта топ-5 продаваемых товаров"""
+    good_id: int
+    name: str
+    category: str
+    total_sold: int
+
+
+@dataclass
+class TopGoodsSnapshot:
+    """Снимок отчёта топ-5 товаров на момент последнего обновления"""
+    goods: List[TopGood]
+    refreshed_at: datetime
+
+
+class AddGoodStatus(str, Enum):
+    """Результат атомарного добавления товара в заказ"""
+    OK = "ok"
+    ORDER_NOT_FOUND = "order_not_found"
+    GOOD_NOT_FOUND = "good_not_found"
+    INSUFFICIENT_STOCK = "insufficient_stock"
+    NOT_APPLIED = "not_applied"
+    KEY_REUSED = "idempotency_key_reused"
+
+
+@dataclass
+class AddGoodResult:
+    """Модель результата добавления товара в заказ"""
+    status: AddGoodStatus
+    stock_left: Optional[int] = None
+    ordered_amount: Optional[int] = None
+    # Результат возвращён из ранее сохранённого по ключу идемпотентности
+    replayed: bool = False
+    
+    @property
+    def success(self) -> bool:
+        return self.status is AddGoodStatus.OK
+
+
+class TicketStatus(str, Enum):
+    """Состояние отложенного добавления товара в заказ"""
+    PENDING = "pending"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+@dataclass
+class AddGoodTicket:
+    """Тикет отложенного добавления товара в заказ
+    
+    Пока тикет ждёт в очереди, result не заполнен. COMPLETED означает, что
+    строка обработана (успешно или нет - по result), FAILED - что пакет
+    не удалось применить из-за ошибки БД и товар не списан.
+    """
+    id: str
+    line: OrderedGood
+    accepted_at: datetime
+    status: TicketStatus = TicketStatus.PENDING
+    result: Optional[AddGoodResult] = None
+    completed_at: Optional[datetime] = None
+    error: Optional[str] = None
@@ -0,0 +1,17 @@
+from abc import ABC, abstractmethod
+from typing import List, Optional
+from ..models.order import ClientTotals, ClientTotalsDrift
+
+
+class ClientRepository(ABC):
+    """Абстрактный репозиторий для работы с клиентами"""
+    
+    @abstractmethod
+    async def get_client_totals(self, client_id: int) -> Optional[ClientTotals]:
+        """Получить итоги клиента по ID"""
+        pass
+    
+    @abstractmethod
+    async def reconcile_client_totals(self, apply: bool = True) -> List[ClientTotalsDrift]:
+        """Пересчитать итоги клиентов с нуля и вернуть расхождения"""
+        pass
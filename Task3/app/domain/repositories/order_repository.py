@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 from typing import List, Optional
-from ..models.order import Order, OrderedGood, Good
+from ..models.order import Order, OrderedGood, OrderDetails, Good, AddGoodResult, AddGoodTicket
 
 
 class OrderRepository(ABC):
@@ -16,9 +16,23 @@ class OrderRepository(ABC):
         """Получить товары в заказе по ID заказа"""
         pass
     
+    @abstractmethod
+    async def get_order_details(self, order_id: int) -> Optional[OrderDetails]:
+        """Получить заказ со строками и ценами товаров"""
+        pass
+    
     @abstractmethod
     async def get_good_by_id(self, good_id: int) -> Optional[Good]:
-        """Получить товар по ID"""
+        """Получить товар по ID
+        
+        amount справочный и может отставать от БД; остаток для списания
+        проверяется в add_good_to_order и add_goods_to_orders.
+        """
+        pass
+    
+    @abstractmethod
+    async def get_goods_by_catalogue_ids(self, catalogue_ids: List[int]) -> List[Good]:
+        """Получить товары, относящиеся к любой из категорий"""
         pass
     
     @abstractmethod
@@ -40,3 +54,33 @@ class OrderRepository(ABC):
     async def update_good_amount(self, good_id: int, new_amount: int) -> bool:
         """Обновить количество товара на складе"""
         pass
+    
+    @abstractmethod
+    async def set_stock_shards(self, good_id: int, shards: int) -> bool:
+        """Переключить хранение остатка товара на шарды (shards > 0) или обратно (0)"""
+        pass
+    
+    @abstractmethod
+    async def add_good_to_order(self, order_id: int, good_id: int, amount: int) -> AddGoodResult:
+        """Атомарно списать товар со склада и добавить его в заказ"""
+        pass
+    
+    @abstractmethod
+    async def add_good_to_order_once(self, key: str, order_id: int, good_id: int, amount: int) -> AddGoodResult:
+        """Добавить товар в заказ не более одного раза для ключа идемпотентности"""
+        pass
+    
+    @abstractmethod
+    async def add_goods_to_orders(self, lines: List[OrderedGood], atomic: bool = True) -> List[AddGoodResult]:
+        """Добавить пакет товаров в заказы в одной транзакции"""
+        pass
+    
+    @abstractmethod
+    async def apply_add_good_tickets(self, tickets: List[AddGoodTicket], ttl_seconds: float) -> None:
+        """Применить тикеты отложенного добавления одной транзакцией и сохранить их результаты"""
+        pass
+    
+    @abstractmethod
+    async def get_add_good_ticket(self, ticket_id: str) -> Optional[AddGoodTicket]:
+        """Получить обработанный тикет отложенного добавления"""
+        pass
@@ -0,0 +1,87 @@
+import asyncio
+from typing import Optional
+from ...domain.models.catalogue import CatalogueTree
+from ..database import statements
+from ..database.connection import db_connection
+from ..database.notifications import NotificationListener, notification_listener
+
+
+class CatalogueCache:
+    """Процессное дерево каталога с инвалидацией через LISTEN/NOTIFY
+    
+    Каталог загружается целиком при запуске (start), как только установлена
+    подписка LISTEN, и сбрасывается по уведомлению catalogue_changed от
+    триггера на Catalogue или при переподключении слушателя; следующий
+    запрос перечитывает его. Пока соединение для LISTEN не установлено,
+    дерево читается из БД при каждом обращении и не сохраняется.
+    """
+    
+    CHANNEL = "catalogue_changed"
+    
+    def __init__(self, listener: NotificationListener = notification_listener, start_timeout: float = 5.0):
+        self.start_timeout = start_timeout
+        self.hits = 0
+        self.loads = 0
+        self.invalidations = 0
+        self._tree: Optional[CatalogueTree] = None
+        self._lock = asyncio.Lock()
+        self._listener = listener
+        listener.subscribe(self.CHANNEL, self._on_notify, self.invalidate)
+    
+    async def get(self) -> CatalogueTree:
+        """Получить дерево каталога, загрузив его при необходимости"""
+        tree = self._tree
+        if tree is not None and self._listener.listening:
+            self.hits += 1
+            return tree
+        
+        # Конкурентные запросы после сброса дожидаются одной загрузки
+        async with self._lock:
+            if self._tree is not None and self._listener.listening:
+                self.hits += 1
+                return self._tree
+            generation = self.invalidations
+            rows = await db_connection.execute_query(statements.GET_CATALOGUE)
+            tree = CatalogueTree((row['id'], row['name'], row['path']) for row in rows)
+            self.loads += 1
+            # Дерево, прочитанное до инвалидации, уже могло устареть
+            if self._listener.listening and generation == self.invalidations:
+                self._tree = tree
+            return tree
+    
+    async def start(self) -> None:
+        """Загрузить дерево при запуске приложения
+        
+        Дерево, прочитанное до подписки, сбросилось бы при её установке,
+        поэтому сначала ожидается подписка (не дольше start_timeout). Если
+        её нет или загрузка не удалась, дерево загрузит первый запрос.
+        """
+        if not await self._listener.wait_listening(self.start_timeout):
+            print(f"Catalogue preload skipped: not listening after {self.start_timeout:g} s")
+            return
+        try:
+            await self.get()
+        except Exception as e:
+            print(f"Catalogue preload error: {e}")
+    
+    def invalidate(self) -> None:
+        """Сбросить дерево каталога"""
+        self.invalidations += 1
+        self._tree = None
+    
+    def stats(self) -> dict:
+        """Счётчики кэша"""
+        return {
+            "size": len(self._tree) if self._tree is not None else 0,
+            "hits": self.hits,
+            "loads": self.loads,
+            "invalidations": self.invalidations,
+            "listening": self._listener.listening
+        }
+    
+    def _on_notify(self, payload: str) -> None:
+        self.invalidate()
+
+
+# Глобальный экземпляр дерева каталога
+catalogue_cache = CatalogueCache()
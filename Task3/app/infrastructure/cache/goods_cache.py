@@ -0,0 +1,103 @@
+import os
+from collections import OrderedDict
+from typing import Optional
+from ...domain.models.order import Good
+from ..database.notifications import NotificationListener, notification_listener
+
+
+class GoodsCache:
+    """Процессный LRU-кэш товаров с инвалидацией через LISTEN/NOTIFY
+    
+    Триггеры из init.sql публикуют ID изменённого товара в канал goods_changed,
+    поэтому при нескольких воркерах каждый процесс сбрасывает свою запись.
+    Пока соединение для LISTEN не установлено, кэш не используется: без него
+    уведомления могли бы потеряться.
+    
+    Кэшированный amount не авторитетен: он обновляется только списаниями
+    этого воркера (update_amount), а списания других воркеров и изменения
+    остатка в БД его не сбрасывают. Списание всегда проверяет остаток в БД.
+    
+    Кэш хранит собственные экземпляры Good и отдаёт вызывающим копии, чтобы
+    изменение полученного товара не меняло запись кэша и ответы другим
+    запросам.
+    """
+    
+    CHANNEL = "goods_changed"
+    
+    def __init__(self, max_size: Optional[int] = None, listener: NotificationListener = notification_listener):
+        self.max_size = max_size if max_size is not None else int(os.getenv("GOODS_CACHE_SIZE", "10000"))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._goods: "OrderedDict[int, Good]" = OrderedDict()
+        self._listener = listener
+        if self.max_size > 0:
+            listener.subscribe(self.CHANNEL, self._on_notify, self.invalidate)
+    
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self._listener.listening
+    
+    def get(self, good_id: int) -> Optional[Good]:
+        """Получить товар из кэша"""
+        if not self.enabled:
+            return None
+        good = self._goods.get(good_id)
+        if good is None:
+            self.misses += 1
+            return None
+        self._goods.move_to_end(good_id)
+        self.hits += 1
+        return good.copy()
+    
+    def generation(self) -> int:
+        """Номер поколения кэша: запоминается до чтения из БД и передаётся в put"""
+        return self.invalidations
+    
+    def put(self, good: Good, generation: int) -> None:
+        """Сохранить загруженный из БД товар
+        
+        Если за время чтения пришла инвалидация, запись не сохраняется:
+        прочитанные данные могли устареть.
+        """
+        if not self.enabled or generation != self.invalidations:
+            return
+        self._goods[good.id] = good.copy()
+        self._goods.move_to_end(good.id)
+        if len(self._goods) > self.max_size:
+            self._goods.popitem(last=False)
+            self.evictions += 1
+    
+    def update_amount(self, good_id: int, amount: int) -> None:
+        """Обновить остаток в записи после собственного списания (без гарантии актуальности)"""
+        good = self._goods.get(good_id)
+        if good is not None:
+            good.amount = amount
+    
+    def invalidate(self, good_id: Optional[int] = None) -> None:
+        """Сбросить запись товара или весь кэш"""
+        self.invalidations += 1
+        if good_id is None:
+            self._goods.clear()
+        else:
+            self._goods.pop(good_id, None)
+    
+    def stats(self) -> dict:
+        """Счётчики кэша"""
+        return {
+            "size": len(self._goods),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "listening": self._listener.listening
+        }
+    
+    def _on_notify(self, payload: str) -> None:
+        self.invalidate(None if payload == "*" else int(payload))
+
+
+# Глобальный экземпляр кэша товаров (GOODS_CACHE_SIZE=0 отключает кэш)
+goods_cache = GoodsCache()
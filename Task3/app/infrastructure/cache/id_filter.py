@@ -0,0 +1,225 @@
+import asyncio
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+from ..database.connection import db_connection
+from ..database.notifications import NotificationListener, notification_listener
+from ..monitoring import metrics
+
+
+# Диапазоны подряд идущих ID таблицы - в том же виде, в каком их публикуют
+# триггеры notify_ids_changed. Запрос выполняется только при загрузке фильтра,
+# поэтому не входит в реестр statements
+LOAD_ID_RANGES = """
+    SELECT min(id) AS lo, max(id) AS hi
+    FROM (SELECT id, id - row_number() OVER (ORDER BY id) AS grp FROM {table}) ids
+    GROUP BY grp
+"""
+
+
+class IdBitmap:
+    """Разреженная битовая карта целых ID
+    
+    ID хранятся блоками по 65536 значений (8 КБ на блок), блок создаётся при
+    первом ID из его диапазона. Последовательные ID из serial занимают
+    около бита на ID, а отдельные большие ID - один блок, а не всю карту
+    до них.
+    """
+    
+    BLOCK_BITS = 16
+    BLOCK_MASK = (1 << BLOCK_BITS) - 1
+    
+    def __init__(self):
+        self._blocks: Dict[int, bytearray] = {}
+    
+    def __contains__(self, value: int) -> bool:
+        block = self._blocks.get(value >> self.BLOCK_BITS)
+        offset = value & self.BLOCK_MASK
+        return block is not None and bool(block[offset >> 3] >> (offset & 7) & 1)
+    
+    @property
+    def size_bytes(self) -> int:
+        return len(self._blocks) << (self.BLOCK_BITS - 3)
+    
+    def add_range(self, lo: int, hi: int) -> None:
+        """Отметить ID от lo до hi включительно"""
+        self._fill(lo, hi, True)
+    
+    def discard_range(self, lo: int, hi: int) -> None:
+        """Снять отметку с ID от lo до hi включительно"""
+        self._fill(lo, hi, False)
+    
+    def _fill(self, lo: int, hi: int, value: bool) -> None:
+        while lo <= hi:
+            key = lo >> self.BLOCK_BITS
+            end = min(hi, ((key + 1) << self.BLOCK_BITS) - 1)
+            block = self._blocks.get(key)
+            if block is None:
+                if not value:
+                    lo = end + 1
+                    continue
+                block = self._blocks[key] = bytearray(1 << (self.BLOCK_BITS - 3))
+            self._fill_block(block, lo & self.BLOCK_MASK, end & self.BLOCK_MASK, value)
+            lo = end + 1
+    
+    @staticmethod
+    def _fill_block(block: bytearray, first: int, last: int, value: bool) -> None:
+        first_byte, last_byte = first >> 3, last >> 3
+        if first_byte == last_byte:
+            masks = [((1 << (last - first + 1)) - 1) << (first & 7)]
+        else:
+            masks = [(0xFF << (first & 7)) & 0xFF, (1 << ((last & 7) + 1)) - 1]
+            # Целые байты между краями заполняются срезом
+            block[first_byte + 1:last_byte] = (b"\xff" if value else b"\x00") * (last_byte - first_byte - 1)
+        for index, mask in zip((first_byte, last_byte), masks):
+            if value:
+                block[index] |= mask
+            else:
+                block[index] &= ~mask & 0xFF
+
+
+class IdFilter:
+    """Процессный фильтр заведомо несуществующих ID таблицы
+    
+    Все ID таблицы загружаются в битовую карту при подключении слушателя
+    уведомлений и поддерживаются триггерами, которые публикуют добавленные
+    и удалённые ID в канал таблицы. Уведомления, пришедшие во время загрузки,
+    применяются к загруженной карте по порядку, поэтому вставки после снимка
+    загрузки не теряются. Пока карта не загружена или соединение для LISTEN
+    не установлено, фильтр ничего не отклоняет.
+    
+    Уведомление приходит после COMMIT, поэтому ID, вставленный другим
+    процессом, может несколько миллисекунд считаться отсутствующим. Чтобы
+    это не задевало только что созданные заказы, ID выше наибольшего
+    известного (в пределах headroom) всегда проверяются в БД.
+    """
+    
+    def __init__(
+        self,
+        table: str,
+        channel: str,
+        headroom: Optional[int] = None,
+        listener: NotificationListener = notification_listener
+    ):
+        self.table = table
+        self.channel = channel
+        self.enabled = os.getenv("ID_FILTER_ENABLED", "true").lower() == "true"
+        self.headroom = headroom if headroom is not None else int(os.getenv("ID_FILTER_HEADROOM", "1000"))
+        self.rejected = 0
+        self.passed = 0
+        self.loads = 0
+        self.load_ms: Optional[float] = None
+        self._bitmap = IdBitmap()
+        self._high_water = 0
+        self._loaded = False
+        # Уведомления, пришедшие до окончания загрузки
+        self._pending: List[Tuple[bool, List[Tuple[int, int]]]] = []
+        self._generation = 0
+        self._load_task: Optional[asyncio.Task] = None
+        self._listener = listener
+        if self.enabled:
+            listener.subscribe(channel, self._on_notify, self._on_reset)
+    
+    @property
+    def ready(self) -> bool:
+        return self._loaded and self._listener.listening
+    
+    def absent(self, value: int) -> bool:
+        """True, если ID заведомо нет в таблице и обращаться к БД не нужно"""
+        if not self.ready:
+            return False
+        if value in self._bitmap or self._high_water < value <= self._high_water + self.headroom:
+            self.passed += 1
+            return False
+        self.rejected += 1
+        metrics.ID_FILTER_REJECTIONS.labels(table=self.table).inc()
+        return True
+    
+    async def stop(self) -> None:
+        """Прервать загрузку (вызывается при остановке приложения)"""
+        if self._load_task is not None:
+            self._load_task.cancel()
+            try:
+                await self._load_task
+            except asyncio.CancelledError:
+                pass
+            self._load_task = None
+    
+    def stats(self) -> dict:
+        """Счётчики фильтра"""
+        return {
+            "enabled": self.enabled,
+            "ready": self.ready,
+            "high_water": self._high_water,
+            "headroom": self.headroom,
+            "size_bytes": self._bitmap.size_bytes,
+            "rejected": self.rejected,
+            "passed": self.passed,
+            "loads": self.loads,
+            "load_ms": self.load_ms,
+            "listening": self._listener.listening
+        }
+    
+    def _on_reset(self) -> None:
+        # Слушатель подключился или отключился: уведомления могли потеряться
+        self._loaded = False
+        self._pending = []
+        self._generation += 1
+        if self._load_task is None or self._load_task.done():
+            self._load_task = asyncio.get_running_loop().create_task(self._load_forever())
+    
+    def _on_notify(self, payload: str) -> None:
+        if payload == "*":
+            self._on_reset()
+            return
+        change = (payload[0] == "+", self._parse_ranges(payload[1:]))
+        if self._loaded:
+            self._apply(self._bitmap, *change)
+        else:
+            self._pending.append(change)
+    
+    @staticmethod
+    def _parse_ranges(ranges: str) -> List[Tuple[int, int]]:
+        parsed = []
+        for item in ranges.split(","):
+            # Разделитель ищется со второго символа: граница может быть отрицательной
+            split = item.index("-", 1)
+            parsed.append((int(item[:split]), int(item[split + 1:])))
+        return parsed
+    
+    def _apply(self, bitmap: IdBitmap, added: bool, ranges: Iterable[Tuple[int, int]]) -> None:
+        for lo, hi in ranges:
+            if added:
+                bitmap.add_range(lo, hi)
+                self._high_water = max(self._high_water, hi)
+            else:
+                bitmap.discard_range(lo, hi)
+    
+    async def _load_forever(self) -> None:
+        # Слушатель отмечает подключение сразу после вызова сброса
+        await asyncio.sleep(0)
+        while not self._loaded and self._listener.listening:
+            generation = self._generation
+            started = asyncio.get_running_loop().time()
+            try:
+                rows = await db_connection.execute_query(LOAD_ID_RANGES.format(table=self.table))
+            except Exception as e:
+                print(f"ID filter {self.table} load error: {e}")
+                await asyncio.sleep(1)
+                continue
+            if generation != self._generation:
+                # Сброс во время загрузки: снимок мог пропустить уведомления
+                continue
+            bitmap = IdBitmap()
+            self._high_water = 0
+            self._apply(bitmap, True, ((row["lo"], row["hi"]) for row in rows))
+            for change in self._pending:
+                self._apply(bitmap, *change)
+            self._bitmap, self._pending, self._loaded = bitmap, [], True
+            self.loads += 1
+            self.load_ms = round((asyncio.get_running_loop().time() - started) * 1000, 3)
+
+
+# Глобальные фильтры ID заказов и товаров (ID_FILTER_ENABLED=false отключает).
+# Товары заводятся вне приложения и редко, поэтому запаса над наибольшим ID нет
+order_id_filter = IdFilter("orders", "order_ids_changed")
+good_id_filter = IdFilter("goods", "good_ids_changed", headroom=0)
@@ -0,0 +1,118 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from ...domain.models.order import AddGoodResult
+from ..database import statements
+from ..database.connection import db_connection
+
+
+class IdempotencyCache:
+    """Процессный LRU-кэш завершённых запросов с ключом идемпотентности
+    
+    Источник истины - таблица Idempotency_keys: ключ захватывается в БД в одной
+    транзакции со списанием, поэтому гарантия сохраняется между воркерами и
+    после перезапуска. В кэше лежат только сохранённые результаты, которые
+    больше не меняются, так что повтор в пределах воркера обходится без БД.
+    
+    Фоновая задача периодически удаляет из таблицы ключи с истёкшим TTL.
+    """
+    
+    def __init__(
+        self,
+        max_size: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        cleanup_interval: Optional[float] = None,
+        cleanup_batch: int = 1000
+    ):
+        self.max_size = max_size if max_size is not None else int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", "86400"))
+        self.cleanup_interval = cleanup_interval if cleanup_interval is not None else float(
+            os.getenv("IDEMPOTENCY_CLEANUP_INTERVAL_SECONDS", "300")
+        )
+        self.cleanup_batch = cleanup_batch
+        self.hits = 0
+        self.misses = 0
+        self.expired_deleted = 0
+        # key -> (expires_at (unix time), (order_id, good_id, amount), result)
+        self._entries: "OrderedDict[str, Tuple[float, Tuple[int, int, int], AddGoodResult]]" = OrderedDict()
+        self._cleanup_task: Optional[asyncio.Task] = None
+    
+    def get(self, key: str) -> Optional[Tuple[Tuple[int, int, int], AddGoodResult]]:
+        """Получить параметры запроса и сохранённый результат по ключу"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, request, result = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return request, result
+    
+    def put(self, key: str, request: Tuple[int, int, int], result: AddGoodResult, expires_at: float) -> None:
+        """Сохранить результат запроса"""
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (expires_at, request, result)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def stats(self) -> dict:
+        """Счётчики кэша"""
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired_deleted": self.expired_deleted
+        }
+    
+    async def delete_expired(self) -> int:
+        """Удалить истёкшие ключи из БД пакетами по cleanup_batch"""
+        deleted = 0
+        while True:
+            result = await db_connection.execute_command(
+                statements.DELETE_EXPIRED_IDEMPOTENCY_KEYS, self.cleanup_batch
+            )
+            count = int(result.split()[-1])
+            deleted += count
+            if count < self.cleanup_batch:
+                break
+        self.expired_deleted += deleted
+        return deleted
+    
+    async def start(self) -> None:
+        """Запустить фоновую очистку истёкших ключей"""
+        if self.cleanup_interval > 0 and self._cleanup_task is None:
+            self._cleanup_task = asyncio.create_task(self._cleanup_forever())
+    
+    async def stop(self) -> None:
+        """Остановить фоновую очистку"""
+        if self._cleanup_task is not None:
+            self._cleanup_task.cancel()
+            try:
+                await self._cleanup_task
+            except asyncio.CancelledError:
+                pass
+            self._cleanup_task = None
+    
+    async def _cleanup_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.cleanup_interval)
+            try:
+                await self.delete_expired()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Idempotency keys cleanup error: {e}")
+
+
+# Глобальный экземпляр кэша ключей идемпотентности (IDEMPOTENCY_CACHE_SIZE=0 отключает кэш)
+idempotency_cache = IdempotencyCache()
@@ -0,0 +1,91 @@
+import os
+from collections import OrderedDict
+from typing import Optional
+from ...domain.models.order import OrderDetails
+from ..database.notifications import NotificationListener, notification_listener
+
+
+class OrderCache:
+    """Процессный LRU-кэш заказов со строками для GET /orders/{id}
+    
+    Запись заказа сбрасывается при изменении его строк: сразу после записи
+    в этом воркере и через уведомление orders_changed (триггер на
+    Ordered_goods) в остальных. Изменение товара (goods_changed) сбрасывает
+    кэш целиком, так как в строках заказа есть наименования и цены.
+    Пока соединение для LISTEN не установлено, кэш не используется.
+    """
+    
+    ORDERS_CHANNEL = "orders_changed"
+    GOODS_CHANNEL = "goods_changed"
+    
+    def __init__(self, max_size: Optional[int] = None, listener: NotificationListener = notification_listener):
+        self.max_size = max_size if max_size is not None else int(os.getenv("ORDER_CACHE_SIZE", "10000"))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._orders: "OrderedDict[int, OrderDetails]" = OrderedDict()
+        self._listener = listener
+        if self.max_size > 0:
+            listener.subscribe(self.ORDERS_CHANNEL, self._on_order_notify, self.invalidate)
+            listener.subscribe(self.GOODS_CHANNEL, self._on_good_notify, self.invalidate)
+    
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self._listener.listening
+    
+    def get(self, order_id: int) -> Optional[OrderDetails]:
+        """Получить заказ из кэша"""
+        if not self.enabled:
+            return None
+        details = self._orders.get(order_id)
+        if details is None:
+            self.misses += 1
+            return None
+        self._orders.move_to_end(order_id)
+        self.hits += 1
+        return details
+    
+    def generation(self) -> int:
+        """Номер поколения кэша: запоминается до чтения из БД и передаётся в put"""
+        return self.invalidations
+    
+    def put(self, details: OrderDetails, generation: int) -> None:
+        """Сохранить загруженный из БД заказ, если за время чтения не было инвалидаций"""
+        if not self.enabled or generation != self.invalidations:
+            return
+        self._orders[details.order.id] = details
+        self._orders.move_to_end(details.order.id)
+        if len(self._orders) > self.max_size:
+            self._orders.popitem(last=False)
+            self.evictions += 1
+    
+    def invalidate(self, order_id: Optional[int] = None) -> None:
+        """Сбросить запись заказа или весь кэш"""
+        self.invalidations += 1
+        if order_id is None:
+            self._orders.clear()
+        else:
+            self._orders.pop(order_id, None)
+    
+    def stats(self) -> dict:
+        """Счётчики кэша"""
+        return {
+            "size": len(self._orders),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "listening": self._listener.listening
+        }
+    
+    def _on_order_notify(self, payload: str) -> None:
+        self.invalidate(None if payload == "*" else int(payload))
+    
+    def _on_good_notify(self, payload: str) -> None:
+        self.invalidate()
+
+
+# Глобальный экземпляр кэша заказов (ORDER_CACHE_SIZE=0 отключает кэш)
+order_cache = OrderCache()
@@ -0,0 +1,182 @@
+import asyncio
+import os
+import time
+from typing import Optional
+from ...domain.models.order import TopGood, TopGoodsSnapshot
+from ..database import statements
+from ..database.connection import db_connection
+from ..database.notifications import NotificationListener, notification_listener
+from ..monitoring import metrics
+
+
+class TopGoodsReport:
+    """Снимок отчёта top5_monthly_purchased_goods в памяти воркера и его обновление
+    
+    Фоновая задача выполняет REFRESH MATERIALIZED VIEW CONCURRENTLY, когда
+    с прошлого обновления прошло refresh_interval секунд или этот воркер
+    насчитал dirty_threshold успешных добавлений товара (но не чаще, чем
+    раз в min_refresh_interval секунд). Решение об обновлении принимает
+    функция БД под рекомендательной блокировкой, поэтому обновляет отчёт
+    только один воркер, а остальные перечитывают его по уведомлению
+    top_goods_refreshed. Чтение отчёта не обращается к БД.
+    """
+    
+    NAME = "top5_monthly_purchased_goods"
+    CHANNEL = "top_goods_refreshed"
+    
+    def __init__(
+        self,
+        refresh_interval: Optional[float] = None,
+        dirty_threshold: Optional[int] = None,
+        min_refresh_interval: Optional[float] = None,
+        listener: NotificationListener = notification_listener
+    ):
+        self.refresh_interval = refresh_interval if refresh_interval is not None else float(
+            os.getenv("TOP_GOODS_REFRESH_INTERVAL_SECONDS", "300")
+        )
+        self.dirty_threshold = dirty_threshold if dirty_threshold is not None else int(
+            os.getenv("TOP_GOODS_DIRTY_THRESHOLD", "1000")
+        )
+        self.min_refresh_interval = min_refresh_interval if min_refresh_interval is not None else float(
+            os.getenv("TOP_GOODS_MIN_REFRESH_INTERVAL_SECONDS", "10")
+        )
+        self.dirty = 0
+        self.refreshes = 0
+        self.loads = 0
+        self._snapshot: Optional[TopGoodsSnapshot] = None
+        # Возраст отчёта по часам БД при загрузке и момент загрузки по часам процесса
+        self._age_at_load = 0.0
+        self._loaded_at = 0.0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        listener.subscribe(self.CHANNEL, self._on_notify, self._wakeup.set)
+    
+    @property
+    def enabled(self) -> bool:
+        return self.refresh_interval > 0
+    
+    @property
+    def snapshot(self) -> Optional[TopGoodsSnapshot]:
+        """Последний загруженный снимок отчёта"""
+        return self._snapshot
+    
+    def age_seconds(self) -> Optional[float]:
+        """Возраст снимка: сколько секунд прошло с обновления MATERIALIZED VIEW"""
+        if self._snapshot is None:
+            return None
+        return self._age_at_load + (time.monotonic() - self._loaded_at)
+    
+    def mark_dirty(self, count: int = 1) -> None:
+        """Учесть успешные добавления товара в заказы"""
+        self.dirty += count
+        # Будим задачу только при пересечении порога, иначе каждая запись
+        # сверх порога вызывала бы проверку в БД
+        if self.enabled and self.dirty_threshold > 0 and self.dirty - count < self.dirty_threshold <= self.dirty:
+            self._wakeup.set()
+    
+    async def load(self) -> TopGoodsSnapshot:
+        """Перечитать отчёт из MATERIALIZED VIEW"""
+        rows = await db_connection.execute_query(statements.GET_TOP_GOODS)
+        if not rows:
+            raise RuntimeError(f"Report '{self.NAME}' is not registered in Report_refreshes")
+        
+        self._snapshot = TopGoodsSnapshot(
+            goods=[
+                TopGood(
+                    good_id=row['good_id'],
+                    name=row['name'],
+                    category=row['category'],
+                    total_sold=row['total_sold']
+                )
+                for row in rows if row['good_id'] is not None
+            ],
+            refreshed_at=rows[0]['refreshed_at']
+        )
+        self._age_at_load = max(rows[0]['age_seconds'], 0.0)
+        self._loaded_at = time.monotonic()
+        self.loads += 1
+        return self._snapshot
+    
+    async def refresh_if_due(self) -> bool:
+        """Обновить MATERIALIZED VIEW, если обновление назрело и не выполняется другим воркером"""
+        dirty = self.dirty_threshold > 0 and self.dirty >= self.dirty_threshold
+        refreshed_at = await db_connection.fetch_val(
+            statements.REFRESH_TOP_GOODS, self.refresh_interval, dirty, self.min_refresh_interval
+        )
+        if refreshed_at is None:
+            return False
+        self.dirty = 0
+        self.refreshes += 1
+        metrics.REPORT_REFRESHES.labels(report=self.NAME, trigger="dirty" if dirty else "interval").inc()
+        return True
+    
+    def stats(self) -> dict:
+        """Состояние отчёта"""
+        age = self.age_seconds()
+        return {
+            "refresh_interval": self.refresh_interval,
+            "dirty_threshold": self.dirty_threshold,
+            "dirty": self.dirty,
+            "refreshes": self.refreshes,
+            "loads": self.loads,
+            "age_seconds": round(age, 3) if age is not None else None
+        }
+    
+    async def start(self) -> None:
+        """Загрузить снимок и запустить фоновую задачу обновления"""
+        try:
+            await self.load()
+        except Exception as e:
+            print(f"Top goods report load error: {e}")
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_forever())
+    
+    async def stop(self) -> None:
+        """Остановить фоновую задачу"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def _on_notify(self, payload: str) -> None:
+        # Отчёт обновил другой воркер: его записи уже учтены
+        self.dirty = 0
+        self._wakeup.set()
+    
+    def _next_check_in(self) -> Optional[float]:
+        if not self.enabled:
+            return None
+        age = self.age_seconds()
+        if age is None:
+            due_in = self.min_refresh_interval
+        elif self.dirty_threshold > 0 and self.dirty >= self.dirty_threshold:
+            due_in = self.min_refresh_interval - age
+        else:
+            due_in = self.refresh_interval - age
+        # Не чаще раза в секунду, пока обновление выполняет другой воркер
+        return max(due_in, 1.0)
+    
+    async def _run_forever(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._next_check_in())
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                if self.enabled:
+                    await self.refresh_if_due()
+                # Перечитываем и без своего обновления: уведомление могло быть пропущено
+                await self.load()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Top goods report refresh error: {e}")
+                await asyncio.sleep(self.min_refresh_interval)
+
+
+# Глобальный экземпляр отчёта (TOP_GOODS_REFRESH_INTERVAL_SECONDS=0 отключает обновление)
+top_goods_report = TopGoodsReport()
@@ -0,0 +1,127 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+from .connection import DatabaseConnection, db_connection
+from ..monitoring import metrics
+
+
+# Классы запросов API в порядке приоритета
+WRITE = "write"
+READ = "read"
+REPORT = "report"
+PRIORITIES = {WRITE: 0, READ: 1, REPORT: 2}
+
+
+class AdmissionController:
+    """Ограничение числа одновременно обрабатываемых запросов API воркера
+    
+    Не больше limit запросов выполняются одновременно, остальные ждут места
+    в очереди не дольше max_wait секунд своего класса и получают отказ,
+    если место не освободилось. Освободившееся место отдаётся ожидающему
+    с высшим приоритетом: запись, затем чтение, затем отчёты и выгрузки;
+    внутри класса - по порядку поступления. Класс с нулевым max_wait
+    без свободного места отклоняется сразу.
+    
+    Отчёты и выгрузки дополнительно отклоняются сразу, пока запросы ждут
+    соединение из пула БД: при насыщенном пуле места остаются записи.
+    
+    Отказ означает, что запрос не начинал выполняться, поэтому клиент
+    может безопасно повторить его после Retry-After.
+    """
+    
+    def __init__(
+        self,
+        limit: Optional[int] = None,
+        max_wait: Optional[Dict[str, float]] = None,
+        retry_after: Optional[int] = None,
+        database: DatabaseConnection = db_connection
+    ):
+        # 0 - ограничение отключено
+        self.limit = limit if limit is not None else int(os.getenv("ADMISSION_MAX_CONCURRENCY", "0"))
+        self.max_wait = max_wait if max_wait is not None else {
+            WRITE: float(os.getenv("ADMISSION_MAX_WAIT_WRITE_MS", "1000")) / 1000,
+            READ: float(os.getenv("ADMISSION_MAX_WAIT_READ_MS", "500")) / 1000,
+            REPORT: float(os.getenv("ADMISSION_MAX_WAIT_REPORT_MS", "0")) / 1000
+        }
+        self.retry_after = retry_after if retry_after is not None else int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "1"))
+        self.active = 0
+        self.admitted = {route_class: 0 for route_class in PRIORITIES}
+        self.rejected = {route_class: 0 for route_class in PRIORITIES}
+        self._queue: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._database = database
+    
+    @property
+    def enabled(self) -> bool:
+        return self.limit > 0
+    
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, future in self._queue if not future.done())
+    
+    async def acquire(self, route_class: str) -> bool:
+        """Занять место для запроса класса; False - запрос нужно отклонить"""
+        if route_class == REPORT and self._database.pool_waiters > 0:
+            return self._reject(route_class)
+        if self.active < self.limit:
+            self.active += 1
+            return self._admit(route_class, 0.0)
+        
+        max_wait = self.max_wait[route_class]
+        if max_wait <= 0:
+            return self._reject(route_class)
+        
+        started = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (PRIORITIES[route_class], next(self._sequence), future))
+        try:
+            await asyncio.wait((future,), timeout=max_wait)
+        except asyncio.CancelledError:
+            # Клиент отключился: место, выданное за время ожидания, возвращается
+            if future.done() and not future.cancelled():
+                self.release()
+            future.cancel()
+            raise
+        if not future.done():
+            # Отменённые ожидания пропускаются при освобождении места
+            future.cancel()
+            return self._reject(route_class)
+        return self._admit(route_class, time.perf_counter() - started)
+    
+    def release(self) -> None:
+        """Освободить место: передать его следующему ожидающему или вернуть"""
+        while self._queue:
+            _, _, future = heapq.heappop(self._queue)
+            if not future.done():
+                future.set_result(True)
+                return
+        self.active -= 1
+    
+    def stats(self) -> dict:
+        """Счётчики ограничения"""
+        return {
+            "enabled": self.enabled,
+            "limit": self.limit,
+            "active": self.active,
+            "queued": self.queued,
+            "max_wait_ms": {route_class: wait * 1000 for route_class, wait in self.max_wait.items()},
+            "admitted": self.admitted,
+            "rejected": self.rejected
+        }
+    
+    def _admit(self, route_class: str, waited: float) -> bool:
+        self.admitted[route_class] += 1
+        metrics.ADMISSION_QUEUE_WAIT.labels(route_class=route_class).observe(waited)
+        return True
+    
+    def _reject(self, route_class: str) -> bool:
+        self.rejected[route_class] += 1
+        metrics.ADMISSION_REJECTIONS.labels(route_class=route_class).inc()
+        return False
+
+
+# Глобальный экземпляр ограничения (ADMISSION_MAX_CONCURRENCY=0 отключает)
+admission_controller = AdmissionController()
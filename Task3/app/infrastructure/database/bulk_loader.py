@@ -0,0 +1,440 @@
+import csv
+import io
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, List, Optional, Tuple
+from .connection import DatabaseConnection, db_connection
+
+
+# Запросы загрузчика работают с временными таблицами его соединения, поэтому
+# не входят в реестр statements, под который рассчитан кэш операторов пула
+
+
+# Границы типов столбцов: значение вне них не влезает в бинарный COPY
+# (OverflowError в asyncpg) и отклоняется при разборе строки
+INTEGER_MAX = 2 ** 31 - 1
+BIGINT_MAX = 2 ** 63 - 1
+
+
+def _positive_int(record: dict, name: str, maximum: int = INTEGER_MAX) -> int:
+    value = record.get(name)
+    if isinstance(value, bool) or isinstance(value, float) or value is None or value == "":
+        raise ValueError(f"{name}: ожидается целое число, получено {value!r}")
+    number = int(value)
+    if number <= 0:
+        raise ValueError(f"{name}: ожидается положительное число, получено {number}")
+    if number > maximum:
+        raise ValueError(f"{name}: число {number} больше допустимого {maximum}")
+    return number
+
+
+def _nonzero_int(record: dict, name: str) -> int:
+    value = record.get(name)
+    if isinstance(value, bool) or isinstance(value, float) or value is None or value == "":
+        raise ValueError(f"{name}: ожидается целое число, получено {value!r}")
+    number = int(value)
+    if number == 0:
+        raise ValueError(f"{name}: корректировка не может быть нулевой")
+    if not -INTEGER_MAX - 1 <= number <= INTEGER_MAX:
+        raise ValueError(f"{name}: число {number} вне диапазона INTEGER")
+    return number
+
+
+@dataclass(frozen=True)
+class BulkTarget:
+    """Описание загружаемой сущности
+    
+    Порция строк копируется (COPY, бинарный формат) во временную таблицу
+    staging с номером строки источника и пустым reason. Запросы validate
+    одним проходом по порции проставляют reason отклонённым строкам
+    (проверки внешних ключей - анти-соединением, а не по строке), запросы
+    apply переносят остальные строки в рабочие таблицы.
+    """
+    name: str
+    staging: str
+    columns: Tuple[str, ...]
+    column_types: Tuple[str, ...]
+    parse: Callable[[dict], tuple]
+    validate: Tuple[str, ...]
+    apply: Tuple[str, ...]
+    
+    @property
+    def staging_ddl(self) -> str:
+        columns = ", ".join(f"{name} {type_}" for name, type_ in zip(self.columns, self.column_types))
+        return (
+            f"CREATE TEMP TABLE IF NOT EXISTS {self.staging} "
+            f"(line BIGINT NOT NULL, {columns}, reason TEXT) ON COMMIT DELETE ROWS"
+        )
+
+
+ORDERS = BulkTarget(
+    name="orders",
+    staging="bulk_orders",
+    columns=("id", "client_id"),
+    column_types=("BIGINT", "INTEGER"),
+    parse=lambda record: (_positive_int(record, "id", BIGINT_MAX), _positive_int(record, "client_id")),
+    validate=(
+        """
+        UPDATE bulk_orders s SET reason = 'duplicate_order'
+        FROM (SELECT line, row_number() OVER (PARTITION BY id ORDER BY line) AS n FROM bulk_orders) d
+        WHERE s.line = d.line AND d.n > 1
+        """,
+        """
+        UPDATE bulk_orders s SET reason = 'order_exists'
+        WHERE s.reason IS NULL AND EXISTS (SELECT 1 FROM Orders o WHERE o.id = s.id)
+        """,
+        """
+        UPDATE bulk_orders s SET reason = 'client_not_found'
+        WHERE s.reason IS NULL AND NOT EXISTS (SELECT 1 FROM Clients c WHERE c.id = s.client_id)
+        """,
+    ),
+    apply=(
+        """
+        INSERT INTO Orders (id, client_id)
+        SELECT id, client_id FROM bulk_orders WHERE reason IS NULL
+        """,
+        # Последовательность ID заказов продолжается после загруженных
+        """
+        SELECT setval(pg_get_serial_sequence('orders', 'id'), m)
+        FROM (SELECT MAX(id) AS m FROM bulk_orders WHERE reason IS NULL) s
+        WHERE m > COALESCE(pg_sequence_last_value(pg_get_serial_sequence('orders', 'id')::regclass), 0)
+        """,
+    )
+)
+
+ORDERED_GOODS = BulkTarget(
+    name="lines",
+    staging="bulk_ordered_goods",
+    columns=("order_id", "good_id", "amount"),
+    column_types=("BIGINT", "INTEGER", "INTEGER"),
+    parse=lambda record: (
+        _positive_int(record, "order_id", BIGINT_MAX),
+        _positive_int(record, "good_id"),
+        _positive_int(record, "amount")
+    ),
+    validate=(
+        """
+        UPDATE bulk_ordered_goods s SET reason = 'order_not_found'
+        WHERE NOT EXISTS (SELECT 1 FROM Orders o WHERE o.id = s.order_id)
+        """,
+        """
+        UPDATE bulk_ordered_goods s SET reason = 'good_not_found'
+        WHERE s.reason IS NULL AND NOT EXISTS (SELECT 1 FROM Goods g WHERE g.id = s.good_id)
+        """,
+        # Сумма повторов пары вместе с уже заказанным количеством не должна
+        # выйти за INTEGER: иначе apply упал бы с ошибкой на всей порции
+        """
+        UPDATE bulk_ordered_goods s SET reason = 'out_of_range'
+        FROM (
+            SELECT b.order_id, b.good_id
+            FROM bulk_ordered_goods b
+            LEFT JOIN Ordered_goods og ON og.order_id = b.order_id AND og.good_id = b.good_id
+            WHERE b.reason IS NULL
+            GROUP BY b.order_id, b.good_id, og.amount
+            HAVING COALESCE(og.amount, 0) + SUM(b.amount::bigint) > 2147483647
+        ) o
+        WHERE s.order_id = o.order_id AND s.good_id = o.good_id AND s.reason IS NULL
+        """,
+    ),
+    apply=(
+        # Повтор пары (заказ, товар) увеличивает количество, как POST /orders/add-good
+        """
+        INSERT INTO Ordered_goods AS og (order_id, good_id, amount)
+        SELECT order_id, good_id, SUM(amount)
+        FROM bulk_ordered_goods
+        WHERE reason IS NULL
+        GROUP BY order_id, good_id
+        ORDER BY order_id, good_id
+        ON CONFLICT (order_id, good_id) DO UPDATE SET amount = og.amount + EXCLUDED.amount
+        """,
+    )
+)
+
+STOCK = BulkTarget(
+    name="stock",
+    staging="bulk_stock",
+    columns=("good_id", "delta"),
+    column_types=("INTEGER", "INTEGER"),
+    parse=lambda record: (_positive_int(record, "good_id"), _nonzero_int(record, "delta")),
+    validate=(
+        """
+        UPDATE bulk_stock s SET reason = 'good_not_found'
+        WHERE NOT EXISTS (SELECT 1 FROM Goods g WHERE g.id = s.good_id)
+        """,
+        # Сумма корректировок товара и остаток после неё должны уложиться в
+        # INTEGER; уход в минус отклоняется позже как insufficient_stock
+        """
+        UPDATE bulk_stock s SET reason = 'out_of_range'
+        FROM (
+            SELECT b.good_id
+            FROM bulk_stock b
+            JOIN Goods_stock gs ON gs.id = b.good_id
+            WHERE b.reason IS NULL
+            GROUP BY b.good_id, gs.amount
+            HAVING SUM(b.delta::bigint) < -2147483648
+                OR COALESCE(gs.amount, 0) + SUM(b.delta::bigint) > 2147483647
+        ) o
+        WHERE s.good_id = o.good_id AND s.reason IS NULL
+        """,
+    ),
+    apply=(
+        # Корректировки суммируются по товару; товар, чей остаток ушёл бы
+        # в минус, не изменяется, а его строки отклоняются
+        """
+        UPDATE bulk_stock s SET reason = 'insufficient_stock'
+        FROM adjust_goods_stock(
+            ARRAY(SELECT good_id FROM bulk_stock WHERE reason IS NULL GROUP BY good_id ORDER BY good_id),
+            ARRAY(SELECT SUM(delta)::integer FROM bulk_stock WHERE reason IS NULL GROUP BY good_id ORDER BY good_id)
+        ) r
+        WHERE s.good_id = r.rejected_id AND s.reason IS NULL
+        """,
+    )
+)
+
+TARGETS = {target.name: target for target in (ORDERS, ORDERED_GOODS, STOCK)}
+
+GET_CHECKPOINT = """
+    SELECT source_size, byte_offset, line, loaded, rejected, finished
+    FROM Bulk_load_checkpoints
+    WHERE job = $1
+"""
+
+SAVE_CHECKPOINT = """
+    INSERT INTO Bulk_load_checkpoints AS c (job, source_size, byte_offset, line, loaded, rejected, finished)
+    VALUES ($1, $2, $3, $4, $5, $6, $7)
+    ON CONFLICT (job) DO UPDATE
+        SET source_size = EXCLUDED.source_size, byte_offset = EXCLUDED.byte_offset, line = EXCLUDED.line,
+            loaded = EXCLUDED.loaded, rejected = EXCLUDED.rejected, finished = EXCLUDED.finished,
+            updated_at = now()
+"""
+
+DELETE_CHECKPOINT = "DELETE FROM Bulk_load_checkpoints WHERE job = $1"
+
+
+def detect_format(path: str) -> str:
+    """Формат файла по расширению: csv или jsonl"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    raise ValueError(f"Не удалось определить формат файла {path}: ожидается .csv или .jsonl")
+
+
+def read_records(
+    path: str,
+    format_: str,
+    offset: int = 0,
+    line: int = 0
+) -> Iterator[Tuple[int, int, Optional[dict], Optional[str]]]:
+    """Построчно читать записи файла, начиная с байтового смещения
+    
+    Возвращает (номер строки, смещение после неё, запись, ошибка разбора).
+    Файл читается потоково, в памяти одна строка. В CSV первая строка -
+    заголовок с именами полей; строки CSV не должны содержать переводов
+    строки внутри значений.
+    """
+    with open(path, "rb") as source:
+        header = None
+        if format_ == "csv":
+            raw_header = source.readline()
+            header = next(csv.reader([raw_header.decode("utf-8-sig")]), [])
+            header = [name.strip() for name in header]
+            if offset == 0:
+                offset = len(raw_header)
+                line = 1
+        source.seek(offset)
+        
+        for raw in source:
+            offset += len(raw)
+            line += 1
+            text = raw.decode("utf-8").strip()
+            if not text:
+                continue
+            try:
+                if format_ == "csv":
+                    values = next(csv.reader(io.StringIO(text)))
+                    if len(values) != len(header):
+                        raise ValueError(f"ожидается {len(header)} значений, получено {len(values)}")
+                    record = dict(zip(header, values))
+                else:
+                    record = json.loads(text)
+                    if not isinstance(record, dict):
+                        raise ValueError("ожидается JSON-объект")
+            except ValueError as e:
+                yield line, offset, None, f"invalid: {e}"
+                continue
+            yield line, offset, record, None
+
+
+@dataclass
+class LoadProgress:
+    """Состояние загрузки одного файла"""
+    job: str
+    target: str
+    source_size: int
+    byte_offset: int = 0
+    line: int = 0
+    loaded: int = 0
+    rejected: int = 0
+    finished: bool = False
+    resumed: bool = False
+    chunks: int = 0
+    started: float = field(default_factory=time.monotonic)
+    rows_this_run: int = 0
+    
+    @property
+    def percent(self) -> float:
+        return 100.0 * self.byte_offset / self.source_size if self.source_size else 100.0
+    
+    @property
+    def rows_per_second(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.rows_this_run / elapsed if elapsed > 0 else 0.0
+
+
+class BulkLoadError(Exception):
+    """Загрузка остановлена (отклонённые строки в строгом режиме, изменённый файл)"""
+
+
+class BulkLoader:
+    """Массовая загрузка заказов, строк заказов и корректировок остатков
+    
+    Файл читается потоково порциями по chunk_size строк; каждая порция -
+    одна транзакция: COPY во временную таблицу, проверка ссылок одним
+    запросом на порцию, перенос в рабочие таблицы и сохранение позиции
+    в файле (Bulk_load_checkpoints). Поэтому память не растёт с размером
+    файла, а повторный запуск продолжает загрузку после последней
+    сохранённой порции, не загружая строки дважды.
+    
+    Триггеры рабочих таблиц срабатывают как при обычной записи: итоги
+    клиентов, версии заказов и уведомления кэшей остаются согласованными.
+    """
+    
+    def __init__(
+        self,
+        chunk_size: int = 10000,
+        strict: bool = False,
+        database: DatabaseConnection = db_connection
+    ):
+        self.chunk_size = chunk_size
+        self.strict = strict
+        self._database = database
+    
+    async def load(
+        self,
+        target: BulkTarget,
+        path: str,
+        format_: Optional[str] = None,
+        job: Optional[str] = None,
+        restart: bool = False,
+        on_chunk: Optional[Callable[[LoadProgress, List[Tuple[int, str]]], None]] = None
+    ) -> LoadProgress:
+        """Загрузить файл; on_chunk вызывается после каждой сохранённой порции
+        
+        с прогрессом и отклонёнными строками порции (номер строки, причина).
+        """
+        format_ = format_ or detect_format(path)
+        job = job or f"{target.name}:{os.path.realpath(path)}"
+        progress = LoadProgress(job=job, target=target.name, source_size=os.path.getsize(path))
+        
+        if restart:
+            await self._database.execute_command(DELETE_CHECKPOINT, job)
+        row = await self._database.fetch_one(GET_CHECKPOINT, job)
+        if row is not None:
+            if row['byte_offset'] > progress.source_size or row['source_size'] > progress.source_size:
+                raise BulkLoadError(
+                    f"{path} короче сохранённой позиции ({row['byte_offset']} байт): "
+                    f"файл заменён? Для загрузки заново укажите --restart"
+                )
+            progress.byte_offset = row['byte_offset']
+            progress.line = row['line']
+            progress.loaded = row['loaded']
+            progress.rejected = row['rejected']
+            progress.finished = row['finished'] and row['source_size'] == progress.source_size
+            progress.resumed = True
+        if progress.finished:
+            return progress
+        
+        rows: List[tuple] = []
+        parse_rejects: List[Tuple[int, str]] = []
+        line = progress.line
+        offset = progress.byte_offset
+        for line, offset, record, error in read_records(path, format_, progress.byte_offset, progress.line):
+            if error is None:
+                try:
+                    rows.append((line, *target.parse(record)))
+                except (ValueError, TypeError) as e:
+                    error = f"invalid: {e}"
+            if error is not None:
+                parse_rejects.append((line, error))
+            if len(rows) + len(parse_rejects) >= self.chunk_size:
+                await self._load_chunk(target, progress, rows, parse_rejects, line, offset, False, on_chunk)
+                rows, parse_rejects = [], []
+        
+        await self._load_chunk(target, progress, rows, parse_rejects, line, offset, True, on_chunk)
+        return progress
+    
+    async def _load_chunk(
+        self,
+        target: BulkTarget,
+        progress: LoadProgress,
+        rows: List[tuple],
+        parse_rejects: List[Tuple[int, str]],
+        line: int,
+        offset: int,
+        finished: bool,
+        on_chunk
+    ) -> None:
+        rejects = list(parse_rejects)
+        async with self._database.unit_of_work() as connection:
+            if rows:
+                await connection.execute(target.staging_ddl)
+                await connection.copy_records_to_table(
+                    target.staging,
+                    records=rows,
+                    columns=("line", *target.columns)
+                )
+                # Статистика порции, чтобы проверки шли хеш-соединением
+                await connection.execute(f"ANALYZE {target.staging}")
+                for query in target.validate:
+                    await connection.execute(query)
+                for query in target.apply:
+                    await connection.execute(query)
+                rejects += [
+                    (record['line'], record['reason'])
+                    for record in await connection.fetch(
+                        f"SELECT line, reason FROM {target.staging} WHERE reason IS NOT NULL"
+                    )
+                ]
+            
+            if rejects and self.strict:
+                first_line, reason = min(rejects)
+                raise BulkLoadError(
+                    f"{target.name}: отклонено строк в порции: {len(rejects)}, "
+                    f"первая - строка {first_line}: {reason}; порция не загружена"
+                )
+            
+            loaded = len(rows) - (len(rejects) - len(parse_rejects))
+            await connection.execute(
+                SAVE_CHECKPOINT,
+                progress.job,
+                progress.source_size,
+                offset,
+                line,
+                progress.loaded + loaded,
+                progress.rejected + len(rejects),
+                finished
+            )
+        
+        progress.byte_offset = offset
+        progress.line = line
+        progress.loaded += loaded
+        progress.rejected += len(rejects)
+        progress.finished = finished
+        progress.chunks += 1
+        progress.rows_this_run += len(rows) + len(parse_rejects)
+        if on_chunk is not None:
+            on_chunk(progress, sorted(rejects))
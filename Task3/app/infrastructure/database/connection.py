@@ -1,13 +1,26 @@
 import asyncio
 import asyncpg
 import os
+import time
+from contextvars import ContextVar
 from typing import Optional
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
+from . import statements
+from .tracing import QueryTracer, rows_affected
+from ..monitoring import metrics
 
 # Загружаем переменные окружения из .env файла
 load_dotenv()
 
+# Соединение активной единицы работы в текущей задаче
+_uow_connection: ContextVar[Optional[asyncpg.Connection]] = ContextVar("uow_connection", default=None)
+
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.getenv(name)
+    return float(value) if value else None
+
 
 class DatabaseConnection:
     """Сервис для подключения к PostgreSQL"""
@@ -18,53 +31,242 @@ class DatabaseConnection:
         self.database = os.getenv("DB_NAME", "postgres")
         self.user = os.getenv("DB_USER", "postgres")
         self.password = os.getenv("DB_PASSWORD", "postgres")
+        # Параметры пула и драйвера
+        self.pool_min_size = int(os.getenv("DB_POOL_MIN_SIZE", "10"))
+        self.pool_max_size = int(os.getenv("DB_POOL_MAX_SIZE", "20"))
+        self.statement_cache_size = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+        self.max_inactive_connection_lifetime = float(os.getenv("DB_MAX_INACTIVE_CONNECTION_LIFETIME", "300"))
+        self.command_timeout = _env_float("DB_COMMAND_TIMEOUT")
+        # Режим для PgBouncer (pool_mode=transaction): без серверных подготовленных операторов
+        self.pgbouncer_mode = os.getenv("DB_PGBOUNCER_MODE", "false").lower() == "true"
+        # Отдельный малый пул для потоковых выгрузок (0 - выгрузки отключены)
+        self.export_pool_max_size = int(os.getenv("DB_EXPORT_POOL_MAX_SIZE", "2"))
         self._pool: Optional[asyncpg.Pool] = None
+        self._export_pool: Optional[asyncpg.Pool] = None
+        # Запросы, ожидающие соединение: asyncpg не отдаёт длину своей очереди
+        self._waiters = 0
+        # Трассировка запросов к БД в запросах API (SQL_TRACE_ENABLED=true)
+        self.tracer = QueryTracer(connect=self.create_connection)
+    
+    @property
+    def prepare_statements(self) -> bool:
+        """Кэшируются ли подготовленные операторы на соединениях пула
+        
+        Запрос готовится при первом выполнении на соединении и затем берётся
+        из кэша asyncpg по тексту. Отсутствующий в БД объект проявится
+        ошибкой только в использующем его запросе, а не при создании пула.
+        """
+        return not self.pgbouncer_mode and self.statement_cache_size > 0
     
-    async def create_pool(self, min_size: int = 10, max_size: int = 20) -> None:
-        """Создать пул соединений"""
+    async def create_pool(
+        self,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        statement_cache_size: Optional[int] = None
+    ) -> None:
+        """Создать пул соединений
+        
+        statement_cache_size задаёт размер кэша операторов явно, в обход
+        DB_STATEMENT_CACHE_SIZE и реестра (для бенчмарков).
+        """
+        if statement_cache_size is None and self.prepare_statements:
+            # Кэш должен вмещать весь реестр, иначе его запросы вытеснялись бы
+            statement_cache_size = max(self.statement_cache_size, len(statements.REGISTRY))
+        elif statement_cache_size is None:
+            statement_cache_size = 0
+        
         self._pool = await asyncpg.create_pool(
             host=self.host,
             port=self.port,
             database=self.database,
             user=self.user,
             password=self.password,
-            min_size=min_size,
-            max_size=max_size
+            min_size=self.pool_min_size if min_size is None else min_size,
+            max_size=self.pool_max_size if max_size is None else max_size,
+            statement_cache_size=statement_cache_size,
+            max_inactive_connection_lifetime=self.max_inactive_connection_lifetime,
+            command_timeout=self.command_timeout
+        )
+    
+    async def create_export_pool(self) -> None:
+        """Создать пул выгрузок
+        
+        Выгрузка держит соединение и транзакцию, пока клиент читает ответ,
+        поэтому выгрузки получают собственные соединения и не занимают пул
+        запросов API. Соединения открываются по требованию (min_size=0).
+        """
+        if self.export_pool_max_size <= 0:
+            return
+        self._export_pool = await asyncpg.create_pool(
+            host=self.host,
+            port=self.port,
+            database=self.database,
+            user=self.user,
+            password=self.password,
+            min_size=0,
+            max_size=self.export_pool_max_size,
+            statement_cache_size=0 if self.pgbouncer_mode else self.statement_cache_size,
+            max_inactive_connection_lifetime=self.max_inactive_connection_lifetime,
+            command_timeout=self.command_timeout
+        )
+    
+    @property
+    def pool_waiters(self) -> int:
+        """Запросы, ожидающие соединение из пула"""
+        return self._waiters
+    
+    def pool_stats(self) -> Optional[dict]:
+        """Заполненность пула по счётчикам в памяти, без обращения к БД"""
+        if not self._pool:
+            return None
+        size = self._pool.get_size()
+        idle = self._pool.get_idle_size()
+        return {
+            "size": size,
+            "min_size": self._pool.get_min_size(),
+            "max_size": self._pool.get_max_size(),
+            "in_use": size - idle,
+            "idle": idle,
+            "waiters": self._waiters
+        }
+    
+    async def create_connection(self) -> asyncpg.Connection:
+        """Открыть отдельное соединение вне пула (для LISTEN и служебных задач)"""
+        return await asyncpg.connect(
+            host=self.host,
+            port=self.port,
+            database=self.database,
+            user=self.user,
+            password=self.password
         )
     
     async def close_pool(self) -> None:
-        """Закрыть пул соединений"""
+        """Закрыть пул соединений и пул выгрузок"""
+        if self._export_pool:
+            await self._export_pool.close()
+            self._export_pool = None
         if self._pool:
             await self._pool.close()
     
+    @asynccontextmanager
+    async def export_connection(self, timeout: float):
+        """Получить соединение из пула выгрузок
+        
+        Если за timeout секунд соединение не освободилось, выбрасывается
+        asyncio.TimeoutError.
+        """
+        if not self._export_pool:
+            raise RuntimeError("Export pool is not initialized. Call create_export_pool() first.")
+        
+        connection = await self._export_pool.acquire(timeout=timeout)
+        try:
+            yield connection
+        finally:
+            await self._export_pool.release(connection)
+    
     @asynccontextmanager
     async def get_connection(self):
-        """Получить соединение из пула"""
+        """Получить соединение из пула
+        
+        Внутри unit_of_work() возвращается закреплённое за ней соединение.
+        """
+        connection = _uow_connection.get()
+        if connection is not None:
+            yield connection
+            return
+        
         if not self._pool:
             raise RuntimeError("Database pool is not initialized. Call create_pool() first.")
         
-        async with self._pool.acquire() as connection:
-            yield connection
+        started = time.perf_counter()
+        self._waiters += 1
+        acquired = False
+        try:
+            async with self._pool.acquire() as connection:
+                self._waiters -= 1
+                acquired = True
+                waited = time.perf_counter() - started
+                metrics.DB_POOL_ACQUIRE_DURATION.observe(waited)
+                trace = self.tracer.current()
+                if trace is not None:
+                    trace.add_acquire(waited * 1000)
+                metrics.observe_pool(self._pool, self._waiters)
+                yield connection
+        finally:
+            if not acquired:
+                self._waiters -= 1
+            metrics.observe_pool(self._pool, self._waiters)
+    
+    @asynccontextmanager
+    async def unit_of_work(self, isolation: Optional[str] = None, readonly: bool = False):
+        """Единица работы: одно соединение и одна транзакция на весь блок
+        
+        Все вызовы execute_query/execute_command/fetch_one/fetch_val и
+        get_connection() внутри блока (в том числе из репозиториев) выполняются
+        на закреплённом соединении в общей транзакции. Вложенный вызов
+        открывает savepoint. Уровень изоляции: read_committed, repeatable_read
+        или serializable (по умолчанию - уровень сервера).
+        
+        Соединение не допускает параллельных запросов, поэтому внутри блока
+        запросы выполняются последовательно (без asyncio.gather).
+        """
+        connection = _uow_connection.get()
+        if connection is not None:
+            async with connection.transaction():
+                yield connection
+            return
+        
+        async with self.get_connection() as connection:
+            async with connection.transaction(isolation=isolation, readonly=readonly):
+                token = _uow_connection.set(connection)
+                try:
+                    yield connection
+                finally:
+                    _uow_connection.reset(token)
     
     async def execute_query(self, query: str, *args) -> list:
         """Выполнить запрос и вернуть результат"""
         async with self.get_connection() as conn:
-            return await conn.fetch(query, *args)
+            trace = self.tracer.current()
+            if trace is None:
+                return await conn.fetch(query, *args)
+            started = time.perf_counter()
+            rows = await conn.fetch(query, *args)
+            self.tracer.record(trace, query, args, len(rows), started)
+            return rows
     
     async def execute_command(self, command: str, *args) -> str:
         """Выполнить команду (INSERT, UPDATE, DELETE)"""
         async with self.get_connection() as conn:
-            return await conn.execute(command, *args)
+            trace = self.tracer.current()
+            if trace is None:
+                return await conn.execute(command, *args)
+            started = time.perf_counter()
+            status = await conn.execute(command, *args)
+            self.tracer.record(trace, command, args, rows_affected(status), started)
+            return status
     
     async def fetch_one(self, query: str, *args) -> Optional[asyncpg.Record]:
         """Выполнить запрос и вернуть одну запись"""
         async with self.get_connection() as conn:
-            return await conn.fetchrow(query, *args)
+            trace = self.tracer.current()
+            if trace is None:
+                return await conn.fetchrow(query, *args)
+            started = time.perf_counter()
+            row = await conn.fetchrow(query, *args)
+            self.tracer.record(trace, query, args, int(row is not None), started)
+            return row
     
     async def fetch_val(self, query: str, *args) -> Optional[any]:
         """Выполнить запрос и вернуть одно значение"""
         async with self.get_connection() as conn:
-            return await conn.fetchval(query, *args)
+            trace = self.tracer.current()
+            if trace is None:
+                return await conn.fetchval(query, *args)
+            started = time.perf_counter()
+            value = await conn.fetchval(query, *args)
+            self.tracer.record(trace, query, args, int(value is not None), started)
+            return value
 
 
 # Глобальный экземпляр подключения к БД
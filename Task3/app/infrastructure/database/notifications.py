@@ -0,0 +1,97 @@
+import asyncio
+from typing import Callable, Dict, List, Optional
+from .connection import db_connection
+
+
+class NotificationListener:
+    """Выделенное соединение LISTEN для уведомлений БД (NOTIFY)
+    
+    Процессные кэши подписываются на каналы и получают payload уведомлений.
+    Пока соединение не установлено, уведомления могут теряться, поэтому при
+    каждом подключении и отключении вызываются обработчики сброса, а кэши
+    не используют свои записи, пока listening == False.
+    """
+    
+    def __init__(self):
+        self._handlers: Dict[str, List[Callable[[str], None]]] = {}
+        self._reset_handlers: List[Callable[[], None]] = []
+        self._listening = False
+        self._connected = asyncio.Event()
+        self._listener_task: Optional[asyncio.Task] = None
+    
+    @property
+    def listening(self) -> bool:
+        return self._listening
+    
+    async def wait_listening(self, timeout: float) -> bool:
+        """Дождаться подписки на каналы; False, если за timeout секунд её нет"""
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return self._listening
+    
+    def subscribe(self, channel: str, on_notify: Callable[[str], None], on_reset: Callable[[], None]) -> None:
+        """Подписаться на канал; вызывается до start()"""
+        self._handlers.setdefault(channel, []).append(on_notify)
+        if on_reset not in self._reset_handlers:
+            self._reset_handlers.append(on_reset)
+    
+    async def start(self) -> None:
+        """Запустить фоновое прослушивание каналов"""
+        if self._handlers and self._listener_task is None:
+            self._listener_task = asyncio.create_task(self._listen_forever())
+    
+    async def stop(self) -> None:
+        """Остановить прослушивание"""
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+        self._listening = False
+        self._connected.clear()
+        self._reset()
+    
+    def _reset(self) -> None:
+        for on_reset in self._reset_handlers:
+            on_reset()
+    
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        for on_notify in self._handlers.get(channel, ()):
+            on_notify(payload)
+    
+    async def _listen_forever(self) -> None:
+        retry_delay = 1
+        while True:
+            connection = None
+            try:
+                connection = await db_connection.create_connection()
+                terminated = asyncio.Event()
+                connection.add_termination_listener(lambda _: terminated.set())
+                for channel in self._handlers:
+                    await connection.add_listener(channel, self._on_notify)
+                # Изменения, пропущенные без подписки, сбрасываются вместе с кэшами
+                self._reset()
+                self._listening = True
+                self._connected.set()
+                retry_delay = 1
+                await terminated.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Notification listener error: {e}")
+            finally:
+                self._listening = False
+                self._connected.clear()
+                self._reset()
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, 30)
+
+
+# Глобальный экземпляр слушателя уведомлений
+notification_listener = NotificationListener()
@@ -0,0 +1,198 @@
+import asyncio
+import os
+import zlib
+from typing import AsyncIterator, List, Optional
+from .connection import db_connection
+from ..monitoring import metrics
+
+
+# Заказ со строками и ценами собирается в JSON на стороне PostgreSQL, воркер
+# только склеивает готовые строки. row_to_json и array_to_json дают компактный
+# JSON без переводов строк (json_agg разделяет записи переводом строки).
+# Запрос выполняется курсором на соединении пула выгрузок, поэтому не входит
+# в реестр statements; {where} - условия заданных фильтров
+EXPORT_ORDERS = """
+    SELECT row_to_json(e)::text
+    FROM (
+        SELECT o.id, o.client_id, o.version, COALESCE((
+            SELECT array_to_json(array_agg(l ORDER BY l.good_id))
+            FROM (
+                SELECT og.good_id, og.amount, g.price
+                FROM Ordered_goods og
+                JOIN Goods g ON g.id = og.good_id
+                WHERE og.order_id = o.id
+            ) l
+        ), '[]') AS lines
+        FROM Orders o
+        {where}
+    ) e
+    ORDER BY e.id
+"""
+
+
+class ExportUnavailable(Exception):
+    """Выгрузка не начата: выгрузки отключены или все соединения пула выгрузок заняты"""
+
+
+class ExportTimeout(Exception):
+    """Запрос выгрузки не уложился в DB_COMMAND_TIMEOUT"""
+
+
+class OrderExport:
+    """Открытая выгрузка заказов: курсор в транзакции на соединении пула выгрузок
+    
+    Асинхронный итератор по частям ответа (bytes). Первая порция читается
+    в open(), поэтому ошибки получения соединения и запроса возникают до
+    отправки заголовков ответа. Соединение возвращается в пул после
+    последней порции, при ошибке или закрытии итератора (разрыв клиента).
+    """
+    
+    def __init__(self, chunks: AsyncIterator[List[str]], compress: bool, gzip_level: int):
+        self._chunks = chunks
+        self._first: Optional[List[str]] = None
+        self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+        self.compressed = compress
+    
+    async def open(self) -> "OrderExport":
+        try:
+            self._first = await self._chunks.__anext__()
+        except StopAsyncIteration:
+            self._first = []
+        return self
+    
+    async def __aiter__(self):
+        try:
+            if self._first:
+                yield self._encode(self._first)
+            self._first = None
+            async for lines in self._chunks:
+                data = self._encode(lines)
+                if data:
+                    yield data
+            if self._compressor is not None:
+                yield self._compressor.flush()
+        finally:
+            await self._chunks.aclose()
+    
+    def _encode(self, lines: List[str]) -> bytes:
+        data = ("\n".join(lines) + "\n").encode()
+        if self._compressor is not None:
+            # Сжатый блок может быть пустым: zlib копит данные до полного блока
+            return self._compressor.compress(data)
+        return data
+
+
+class OrderExporter:
+    """Потоковая выгрузка заказов в NDJSON
+    
+    Заказы читаются серверным курсором порциями по chunk_size в порядке ID
+    в одной транзакции REPEATABLE READ READ ONLY, так что выгрузка видит
+    согласованный снимок, а память воркера не зависит от её объёма.
+    Одновременно идёт не больше выгрузок, чем соединений в пуле выгрузок;
+    запрос, не получивший соединение за acquire_timeout, отклоняется.
+    Тайм-аут самого запроса (command_timeout) - отдельная ошибка
+    ExportTimeout: пул при этом не занят, и повтор через Retry-After
+    не поможет.
+    """
+    
+    def __init__(
+        self,
+        chunk_size: Optional[int] = None,
+        acquire_timeout: Optional[float] = None,
+        gzip_level: Optional[int] = None
+    ):
+        self.chunk_size = chunk_size if chunk_size is not None else int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+        self.acquire_timeout = acquire_timeout if acquire_timeout is not None else float(
+            os.getenv("EXPORT_ACQUIRE_TIMEOUT_SECONDS", "1")
+        )
+        # Сжатие выполняется в цикле событий, поэтому по умолчанию - быстрый уровень
+        self.gzip_level = gzip_level if gzip_level is not None else int(os.getenv("EXPORT_GZIP_LEVEL", "1"))
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.exported_orders = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return db_connection.export_pool_max_size > 0
+    
+    def stats(self) -> dict:
+        """Счётчики выгрузок"""
+        return {
+            "enabled": self.enabled,
+            "pool_size": db_connection.export_pool_max_size,
+            "active": self.active,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "exported_orders": self.exported_orders
+        }
+    
+    async def open(
+        self,
+        client_id: Optional[int] = None,
+        id_from: Optional[int] = None,
+        id_to: Optional[int] = None,
+        compress: bool = False
+    ) -> OrderExport:
+        """Начать выгрузку заказов с фильтрами по клиенту и диапазону ID (включительно)
+        
+        Выбрасывает ExportUnavailable, если выгрузки отключены или пул
+        выгрузок занят, и ExportTimeout, если первая порция не прочитана
+        за DB_COMMAND_TIMEOUT.
+        """
+        if not self.enabled:
+            raise ExportUnavailable("Выгрузки отключены")
+        
+        export = OrderExport(self._chunks(client_id, id_from, id_to), compress, self.gzip_level)
+        return await export.open()
+    
+    async def _chunks(
+        self,
+        client_id: Optional[int],
+        id_from: Optional[int],
+        id_to: Optional[int]
+    ) -> AsyncIterator[List[str]]:
+        # Условия добавляются только для заданных фильтров: с "$1 IS NULL OR ..."
+        # общий план не смог бы выбрать индекс под фильтр
+        conditions, args = [], []
+        for condition, value in (("o.client_id = ", client_id), ("o.id >= ", id_from), ("o.id <= ", id_to)):
+            if value is not None:
+                args.append(value)
+                conditions.append(f"{condition}${len(args)}")
+        query = EXPORT_ORDERS.format(where="WHERE " + " AND ".join(conditions) if conditions else "")
+        
+        # asyncpg сообщает о тайм-ауте получения соединения и о command_timeout
+        # одним asyncio.TimeoutError; различаем их по тому, получено ли соединение
+        acquired = False
+        try:
+            async with db_connection.export_connection(self.acquire_timeout) as connection:
+                acquired = True
+                self.active += 1
+                metrics.EXPORTS_ACTIVE.inc()
+                try:
+                    async with connection.transaction(isolation="repeatable_read", readonly=True):
+                        cursor = await connection.cursor(query, *args)
+                        while True:
+                            rows = await cursor.fetch(self.chunk_size)
+                            if not rows:
+                                break
+                            self.exported_orders += len(rows)
+                            metrics.EXPORTED_ORDERS.inc(len(rows))
+                            yield [row[0] for row in rows]
+                    self.completed += 1
+                finally:
+                    self.active -= 1
+                    metrics.EXPORTS_ACTIVE.dec()
+        except asyncio.TimeoutError:
+            if acquired:
+                self.timeouts += 1
+                raise ExportTimeout("Запрос выгрузки превысил тайм-аут БД")
+            self.rejected += 1
+            metrics.EXPORT_REJECTIONS.inc()
+            raise ExportUnavailable("Все соединения выгрузок заняты")
+
+
+# Глобальный экземпляр выгрузки заказов (DB_EXPORT_POOL_MAX_SIZE=0 отключает выгрузки)
+order_exporter = OrderExporter()
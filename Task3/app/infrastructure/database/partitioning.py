@@ -0,0 +1,666 @@
+import asyncio
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+import asyncpg
+from . import statements
+from .connection import DatabaseConnection, db_connection
+
+
+# Ключи хеш-секционирования. Строки заказов секционируются по order_id, а не
+# по (order_id, good_id), как в Task2: иначе выборка строк одного заказа не
+# отсекала бы секции и читала бы все
+PARTITION_KEYS: Dict[str, str] = {
+    "orders": "id",
+    "ordered_goods": "order_id"
+}
+
+# Таблицы переносятся в этом порядке: Orders раньше строк, чтобы внешний
+# ключ строк на новую Orders создавался вместе с новой таблицей строк
+MIGRATION_ORDER = ("orders", "ordered_goods")
+
+# Суффикс новой таблицы на время переноса
+NEW_SUFFIX = "_new"
+
+
+class PartitioningError(Exception):
+    """Ошибка схемы или переноса данных"""
+
+
+@dataclass
+class PartitionInfo:
+    """Секция таблицы: границы хеша и оценка размера"""
+    name: str
+    modulus: int
+    remainder: int
+    rows: int
+    size_bytes: int
+
+
+@dataclass
+class TableLayout:
+    """Текущее устройство таблицы"""
+    table: str
+    partitioned: bool
+    partition_key: Optional[str]
+    partitions: List[PartitionInfo]
+    rows: int
+    size_bytes: int
+    migration_pending: bool
+    
+    @property
+    def modulus(self) -> int:
+        """Модуль секций, 0 - таблица не секционирована"""
+        return max((partition.modulus for partition in self.partitions), default=0)
+    
+    @property
+    def skew(self) -> Optional[float]:
+        """Отношение самой большой секции к средней"""
+        if not self.partitions or not self.rows:
+            return None
+        average = self.rows / len(self.partitions)
+        return max(partition.rows for partition in self.partitions) / average
+
+
+@dataclass
+class MigrationProgress:
+    """Ход переноса таблицы"""
+    table: str
+    modulus: int
+    total_estimate: int
+    copied: int = 0
+    batches: int = 0
+    swap_attempts: int = 0
+    swap_seconds: float = 0.0
+    swapped: bool = False
+    started: float = field(default_factory=time.perf_counter)
+    
+    @property
+    def percent(self) -> float:
+        if not self.total_estimate:
+            return 100.0
+        return min(100.0, self.copied * 100 / self.total_estimate)
+    
+    @property
+    def rows_per_second(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.copied / elapsed if elapsed > 0 else 0.0
+
+
+def _check_table(table: str) -> str:
+    table = table.lower()
+    if table not in PARTITION_KEYS:
+        raise PartitioningError(f"Таблица {table} не поддерживается, доступны: {', '.join(PARTITION_KEYS)}")
+    return table
+
+
+def partition_name(table: str, modulus: int, remainder: int) -> str:
+    """Имя секции: orders_p007 (ширина номера - по модулю, не меньше трёх цифр)"""
+    return f"{table}_p{remainder:0{max(3, len(str(modulus - 1)))}d}"
+
+
+async def table_layout(table: str, exact: bool = False, connection: DatabaseConnection = db_connection) -> TableLayout:
+    """Устройство таблицы: секции, их границы и размеры
+    
+    Число строк берётся из статистики (reltuples), с exact=True - через count(*).
+    """
+    table = _check_table(table)
+    row = await connection.fetch_one("""
+        SELECT c.oid, c.relkind = 'p' AS partitioned,
+               pg_get_partkeydef(c.oid) AS partition_key,
+               GREATEST(c.reltuples, 0)::bigint AS rows,
+               pg_total_relation_size(c.oid) AS size_bytes,
+               to_regclass($2) IS NOT NULL AS migration_pending
+        FROM pg_class c
+        WHERE c.oid = to_regclass($1)
+    """, table, table + NEW_SUFFIX)
+    if row is None:
+        raise PartitioningError(f"Таблица {table} не найдена")
+    
+    partitions = []
+    for part in await connection.execute_query("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) AS bound,
+               GREATEST(c.reltuples, 0)::bigint AS rows,
+               pg_total_relation_size(c.oid) AS size_bytes
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = $1
+        ORDER BY c.relname
+    """, row["oid"]):
+        match = re.search(r"modulus (\d+), remainder (\d+)", part["bound"] or "")
+        rows = part["rows"]
+        if exact:
+            rows = await connection.fetch_val(f"SELECT count(*) FROM {part['relname']}")
+        partitions.append(PartitionInfo(
+            name=part["relname"],
+            modulus=int(match.group(1)) if match else 0,
+            remainder=int(match.group(2)) if match else 0,
+            rows=rows,
+            size_bytes=part["size_bytes"]
+        ))
+    
+    if exact:
+        rows = await connection.fetch_val(f"SELECT count(*) FROM {table}")
+    elif partitions:
+        rows = sum(partition.rows for partition in partitions)
+    else:
+        rows = row["rows"]
+    # У секционированной таблицы нет собственных данных
+    size_bytes = sum(partition.size_bytes for partition in partitions) if partitions else row["size_bytes"]
+    return TableLayout(
+        table=table,
+        partitioned=row["partitioned"],
+        partition_key=row["partition_key"],
+        partitions=partitions,
+        rows=rows,
+        size_bytes=size_bytes,
+        migration_pending=row["migration_pending"]
+    )
+
+
+class PartitionMigrator:
+    """Онлайн-перенос таблицы в хеш-секционированную (или обратно в обычную)
+    
+    Перенос всегда идёт в новую таблицу <table>_new с тем же набором столбцов,
+    ограничений, индексов и исходящих внешних ключей, поэтому одним и тем же
+    способом выполняются секционирование, смена модуля (перебалансировка) и
+    возврат к обычной таблице (modulus=0):
+    
+    1. Подготовка: создаётся <table>_new с секциями, на исходную таблицу
+       ставится строчный триггер, который повторяет в новой таблице каждое
+       изменение (INSERT/UPDATE/DELETE/TRUNCATE).
+    2. Копирование: строки переносятся порциями по batch_size в порядке
+       первичного ключа, каждая порция - отдельной транзакцией. Строки
+       порции блокируются FOR SHARE, поэтому их изменение или удаление
+       дожидается копии и повторяется триггером; конфликт по ключу со
+       строкой, уже записанной триггером, пропускается.
+    3. Переключение: одна короткая транзакция под ACCESS EXCLUSIVE с
+       lock_timeout (при неудаче повторяется до swap_attempts раз) сверяет
+       число строк, переносит триггеры, входящие внешние ключи, владение
+       последовательностями и зависимые представления, удаляет исходную
+       таблицу и переименовывает новую вместе с секциями и индексами.
+    
+    Прерванный перенос можно запустить заново: подготовка не пересоздаёт уже
+    созданную <table>_new того же модуля, а копирование пропускает строки,
+    которые уже есть. abort() удаляет <table>_new и триггер синхронизации.
+    """
+    
+    def __init__(
+        self,
+        batch_size: int = 5000,
+        lock_timeout: float = 2.0,
+        swap_attempts: int = 10,
+        verify: bool = True,
+        connection: DatabaseConnection = db_connection
+    ):
+        self.batch_size = batch_size
+        self.lock_timeout = lock_timeout
+        self.swap_attempts = swap_attempts
+        self.verify = verify
+        self.connection = connection
+    
+    async def migrate(
+        self,
+        table: str,
+        modulus: int,
+        on_batch: Optional[Callable[[MigrationProgress], None]] = None
+    ) -> MigrationProgress:
+        """Перенести таблицу в modulus хеш-секций (0 - в обычную таблицу)"""
+        table = _check_table(table)
+        if modulus < 0:
+            raise PartitioningError("Модуль не может быть отрицательным")
+        layout = await table_layout(table, connection=self.connection)
+        progress = MigrationProgress(table=table, modulus=modulus, total_estimate=layout.rows)
+        
+        await self._prepare(table, modulus, layout)
+        await self._copy(table, progress, on_batch)
+        async with self.connection.get_connection() as conn:
+            await conn.execute(f"ANALYZE {table}{NEW_SUFFIX}")
+        await self._swap(table, progress)
+        return progress
+    
+    async def abort(self, table: str) -> bool:
+        """Отменить незавершённый перенос: удалить <table>_new и триггер синхронизации"""
+        table = _check_table(table)
+        new_table = table + NEW_SUFFIX
+        async with self.connection.unit_of_work() as conn:
+            exists = await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", new_table)
+            await conn.execute(f"DROP TRIGGER IF EXISTS {new_table}_sync ON {table}")
+            await conn.execute(f"DROP TRIGGER IF EXISTS {new_table}_sync_truncate ON {table}")
+            await conn.execute(f"DROP FUNCTION IF EXISTS {new_table}_sync()")
+            await conn.execute(f"DROP TABLE IF EXISTS {new_table}")
+        return exists
+    
+    async def _prepare(self, table: str, modulus: int, layout: TableLayout) -> None:
+        new_table = table + NEW_SUFFIX
+        if layout.migration_pending:
+            current = await self._new_table_modulus(new_table)
+            if current != modulus:
+                raise PartitioningError(
+                    f"Уже идёт перенос {table} в модуль {current}: завершите его или отмените (abort)"
+                )
+            return
+        
+        async with self.connection.unit_of_work() as conn:
+            columns = await self._columns(conn, table)
+            primary_key = await self._primary_key(conn, table)
+            key = PARTITION_KEYS[table]
+            if key not in primary_key:
+                raise PartitioningError(f"Ключ секционирования {key} должен входить в первичный ключ {table}")
+            
+            partition_clause = f" PARTITION BY HASH ({key})" if modulus else ""
+            await conn.execute(
+                f"CREATE TABLE {new_table} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS "
+                f"INCLUDING STORAGE INCLUDING COMMENTS){partition_clause}"
+            )
+            for remainder in range(modulus):
+                await conn.execute(
+                    f"CREATE TABLE {partition_name(new_table, modulus, remainder)} PARTITION OF {new_table} "
+                    f"FOR VALUES WITH (MODULUS {modulus}, REMAINDER {remainder})"
+                )
+            
+            # Индексы и ограничения получают временные имена: имена индексов
+            # уникальны в схеме, исходные освобождаются при переключении
+            for constraint in await conn.fetch("""
+                SELECT conname, pg_get_constraintdef(oid) AS definition
+                FROM pg_constraint
+                WHERE conrelid = $1::regclass AND contype IN ('p', 'u', 'x', 'f') AND conparentid = 0
+                ORDER BY contype DESC, conname
+            """, table):
+                await conn.execute(
+                    f"ALTER TABLE {new_table} ADD CONSTRAINT {constraint['conname']}{NEW_SUFFIX} "
+                    f"{constraint['definition']}"
+                )
+            for index in await conn.fetch("""
+                SELECT i.indexrelid::regclass::text AS name, pg_get_indexdef(i.indexrelid) AS definition
+                FROM pg_index i
+                WHERE i.indrelid = $1::regclass
+                  AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid AND c.conrelid = i.indrelid)
+            """, table):
+                definition = re.sub(
+                    r"^CREATE (UNIQUE )?INDEX \S+ ON (ONLY )?\S+ ",
+                    lambda m: f"CREATE {m.group(1) or ''}INDEX {index['name']}{NEW_SUFFIX} ON {new_table} ",
+                    index["definition"]
+                )
+                await conn.execute(definition)
+            
+            # Синхронизация: изменения исходной таблицы повторяются в новой
+            column_list = ", ".join(columns)
+            key_list = ", ".join(primary_key)
+            non_key = [column for column in columns if column not in primary_key]
+            if non_key:
+                on_conflict = "DO UPDATE SET " + ", ".join(f"{column} = EXCLUDED.{column}" for column in non_key)
+            else:
+                on_conflict = "DO NOTHING"
+            key_match = " AND ".join(f"{column} = OLD.{column}" for column in primary_key)
+            await conn.execute(f"""
+                CREATE FUNCTION {new_table}_sync() RETURNS trigger AS $$
+                BEGIN
+                    IF TG_OP = 'TRUNCATE' THEN
+                        TRUNCATE {new_table};
+                        RETURN NULL;
+                    END IF;
+                    IF TG_OP <> 'INSERT' THEN
+                        DELETE FROM {new_table} WHERE {key_match};
+                    END IF;
+                    IF TG_OP <> 'DELETE' THEN
+                        INSERT INTO {new_table} ({column_list})
+                        VALUES ({", ".join(f"NEW.{column}" for column in columns)})
+                        ON CONFLICT ({key_list}) {on_conflict};
+                    END IF;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql
+            """)
+            await conn.execute(
+                f"CREATE TRIGGER {new_table}_sync AFTER INSERT OR UPDATE OR DELETE ON {table} "
+                f"FOR EACH ROW EXECUTE FUNCTION {new_table}_sync()"
+            )
+            await conn.execute(
+                f"CREATE TRIGGER {new_table}_sync_truncate AFTER TRUNCATE ON {table} "
+                f"FOR EACH STATEMENT EXECUTE FUNCTION {new_table}_sync()"
+            )
+    
+    async def _copy(
+        self,
+        table: str,
+        progress: MigrationProgress,
+        on_batch: Optional[Callable[[MigrationProgress], None]]
+    ) -> None:
+        new_table = table + NEW_SUFFIX
+        async with self.connection.get_connection() as conn:
+            columns = await self._columns(conn, table)
+            primary_key = await self._primary_key(conn, table)
+        column_list = ", ".join(columns)
+        key_list = ", ".join(primary_key)
+        key_params = ", ".join(f"${i + 2}" for i in range(len(primary_key)))
+        key_desc = ", ".join(f"{column} DESC" for column in primary_key)
+        first_batch = f"""
+            WITH batch AS (
+                SELECT {column_list} FROM {table} ORDER BY {key_list} LIMIT $1 FOR SHARE
+            ), copied AS (
+                INSERT INTO {new_table} ({column_list}) SELECT {column_list} FROM batch
+                ON CONFLICT ({key_list}) DO NOTHING
+            )
+            SELECT count(*) AS rows, {", ".join(f"(array_agg({column} ORDER BY {key_desc}))[1] AS {column}" for column in primary_key)}
+            FROM batch
+        """
+        next_batch = first_batch.replace(
+            f"FROM {table} ORDER BY",
+            f"FROM {table} WHERE ({key_list}) > ({key_params}) ORDER BY"
+        )
+        
+        last_key: Optional[Tuple] = None
+        while True:
+            async with self.connection.get_connection() as conn:
+                if last_key is None:
+                    row = await conn.fetchrow(first_batch, self.batch_size)
+                else:
+                    row = await conn.fetchrow(next_batch, self.batch_size, *last_key)
+            if not row["rows"]:
+                break
+            last_key = tuple(row[column] for column in primary_key)
+            progress.copied += row["rows"]
+            progress.batches += 1
+            if on_batch is not None:
+                on_batch(progress)
+            if row["rows"] < self.batch_size:
+                break
+    
+    async def _swap(self, table: str, progress: MigrationProgress) -> None:
+        for attempt in range(1, self.swap_attempts + 1):
+            progress.swap_attempts = attempt
+            started = time.perf_counter()
+            try:
+                deferred = await self._swap_once(table, progress.modulus)
+                progress.swap_seconds = time.perf_counter() - started
+                break
+            except (asyncpg.LockNotAvailableError, asyncpg.DeadlockDetectedError):
+                if attempt >= self.swap_attempts:
+                    raise PartitioningError(
+                        f"Не удалось заблокировать {table} за {self.swap_attempts} попыток: "
+                        f"таблицу держат долгие транзакции; перенос можно повторить"
+                    )
+                await asyncio.sleep(min(0.5 * attempt, 5))
+        progress.swapped = True
+        
+        # Проверка внешних ключей и заполнение представлений - после снятия блокировок
+        async with self.connection.get_connection() as conn:
+            for statement in deferred:
+                await conn.execute(statement)
+    
+    async def _swap_once(self, table: str, modulus: int) -> List[str]:
+        new_table = table + NEW_SUFFIX
+        deferred: List[str] = []
+        async with self.connection.unit_of_work() as conn:
+            await conn.execute(f"SET LOCAL lock_timeout = '{int(self.lock_timeout * 1000)}ms'")
+            
+            incoming = await conn.fetch("""
+                SELECT c.conrelid::regclass::text AS referencing, c.conname,
+                       pg_get_constraintdef(c.oid) AS definition,
+                       r.relkind = 'p' AS referencing_partitioned
+                FROM pg_constraint c
+                JOIN pg_class r ON r.oid = c.conrelid
+                WHERE c.contype = 'f' AND c.confrelid = $1::regclass AND c.conrelid <> $1::regclass
+                  AND c.conparentid = 0 AND c.conrelid <> $2::regclass
+            """, table, new_table)
+            views = await conn.fetch("""
+                SELECT DISTINCT v.oid, v.oid::regclass::text AS name, v.relkind::text AS relkind, v.relispopulated,
+                       pg_get_viewdef(v.oid) AS definition
+                FROM pg_depend d
+                JOIN pg_rewrite r ON r.oid = d.objid
+                JOIN pg_class v ON v.oid = r.ev_class
+                WHERE d.refobjid = $1::regclass AND v.oid <> $1::regclass
+            """, table)
+            view_indexes = await conn.fetch("""
+                SELECT pg_get_indexdef(indexrelid) AS definition
+                FROM pg_index WHERE indrelid = ANY($1::oid[])
+            """, [view["oid"] for view in views])
+            
+            referenced = await conn.fetch("""
+                SELECT DISTINCT confrelid::regclass::text AS name
+                FROM pg_constraint
+                WHERE contype = 'f' AND conrelid = $1::regclass AND confrelid <> $1::regclass AND conparentid = 0
+            """, table)
+            
+            # Удаление исходной таблицы снимает триггеры её внешних ключей с
+            # таблиц, на которые она ссылается, поэтому они блокируются сразу,
+            # а не посреди транзакции. Материализованные представления
+            # LOCK TABLE не принимает, их блокирует DROP
+            locked = (
+                [table, new_table]
+                + [fk["referencing"] for fk in incoming]
+                + [row["name"] for row in referenced]
+                + [view["name"] for view in views if view["relkind"] != "m"]
+            )
+            await conn.execute(f"LOCK TABLE {', '.join(dict.fromkeys(locked))} IN ACCESS EXCLUSIVE MODE")
+            
+            if self.verify:
+                old_rows, new_rows = await conn.fetchrow(
+                    f"SELECT (SELECT count(*) FROM {table}), (SELECT count(*) FROM {new_table})"
+                )
+                if old_rows != new_rows:
+                    raise PartitioningError(
+                        f"Число строк не совпадает: {table} - {old_rows}, {new_table} - {new_rows}"
+                    )
+            
+            triggers = await conn.fetch("""
+                SELECT pg_get_triggerdef(oid) AS definition
+                FROM pg_trigger
+                WHERE tgrelid = $1::regclass AND NOT tgisinternal AND tgparentid = 0
+                  AND tgname NOT LIKE $2
+            """, table, f"{new_table}_sync%")
+            sequences = await conn.fetch("""
+                SELECT d.objid::regclass::text AS sequence, a.attname AS column_name
+                FROM pg_depend d
+                JOIN pg_attribute a ON a.attrelid = d.refobjid AND a.attnum = d.refobjsubid
+                WHERE d.refobjid = $1::regclass AND d.classid = 'pg_class'::regclass
+                  AND d.deptype IN ('a', 'i')
+                  AND (SELECT relkind FROM pg_class WHERE oid = d.objid) = 'S'
+            """, table)
+            
+            for view in views:
+                kind = "MATERIALIZED VIEW" if view["relkind"] == "m" else "VIEW"
+                await conn.execute(f"DROP {kind} {view['name']}")
+            for fk in incoming:
+                await conn.execute(f"ALTER TABLE {fk['referencing']} DROP CONSTRAINT {fk['conname']}")
+            for sequence in sequences:
+                await conn.execute(f"ALTER SEQUENCE {sequence['sequence']} OWNED BY {new_table}.{sequence['column_name']}")
+            
+            await conn.execute(f"DROP TABLE {table}")
+            await conn.execute(f"DROP FUNCTION {new_table}_sync()")
+            await self._rename_new(conn, table, modulus)
+            
+            for trigger in triggers:
+                await conn.execute(trigger["definition"])
+            for fk in incoming:
+                # Для обычной ссылающейся таблицы ключ проверяется уже после
+                # переключения; NOT VALID для секционированной не поддерживается
+                if fk["referencing_partitioned"]:
+                    await conn.execute(
+                        f"ALTER TABLE {fk['referencing']} ADD CONSTRAINT {fk['conname']} {fk['definition']}"
+                    )
+                else:
+                    await conn.execute(
+                        f"ALTER TABLE {fk['referencing']} ADD CONSTRAINT {fk['conname']} {fk['definition']} NOT VALID"
+                    )
+                    deferred.append(f"ALTER TABLE {fk['referencing']} VALIDATE CONSTRAINT {fk['conname']}")
+            for view in views:
+                if view["relkind"] == "m":
+                    await conn.execute(f"CREATE MATERIALIZED VIEW {view['name']} AS {view['definition'].rstrip(';')} WITH NO DATA")
+                    if view["relispopulated"]:
+                        deferred.append(f"REFRESH MATERIALIZED VIEW {view['name']}")
+                else:
+                    await conn.execute(f"CREATE VIEW {view['name']} AS {view['definition']}")
+            for index in view_indexes:
+                await conn.execute(index["definition"])
+        return deferred
+    
+    async def _rename_new(self, conn: asyncpg.Connection, table: str, modulus: int) -> None:
+        new_table = table + NEW_SUFFIX
+        await conn.execute(f"ALTER TABLE {new_table} RENAME TO {table}")
+        
+        # Ограничения с индексами переименовываются вместе с индексом
+        for constraint in await conn.fetch("""
+            SELECT conname FROM pg_constraint
+            WHERE conrelid = $1::regclass AND conname LIKE $2 AND conparentid = 0
+        """, table, f"%{NEW_SUFFIX}"):
+            name = constraint["conname"]
+            await conn.execute(f"ALTER TABLE {table} RENAME CONSTRAINT {name} TO {name[:-len(NEW_SUFFIX)]}")
+        for index in await conn.fetch("""
+            SELECT indexrelid::regclass::text AS name FROM pg_index
+            WHERE indrelid = $1::regclass AND indexrelid::regclass::text LIKE $2
+        """, table, f"%{NEW_SUFFIX}"):
+            name = index["name"]
+            await conn.execute(f"ALTER INDEX {name} RENAME TO {name[:-len(NEW_SUFFIX)]}")
+        
+        # Секции и их индексы: orders_new_p007 -> orders_p007
+        for remainder in range(modulus):
+            old_name = partition_name(new_table, modulus, remainder)
+            name = partition_name(table, modulus, remainder)
+            await conn.execute(f"ALTER TABLE {old_name} RENAME TO {name}")
+            for index in await conn.fetch("""
+                SELECT indexrelid::regclass::text AS name FROM pg_index WHERE indrelid = $1::regclass
+            """, name):
+                if index["name"].startswith(old_name):
+                    await conn.execute(f"ALTER INDEX {index['name']} RENAME TO {name}{index['name'][len(old_name):]}")
+    
+    async def _new_table_modulus(self, new_table: str) -> int:
+        bound = await self.connection.fetch_val("""
+            SELECT pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = $1::regclass
+            LIMIT 1
+        """, new_table)
+        match = re.search(r"modulus (\d+)", bound or "")
+        return int(match.group(1)) if match else 0
+    
+    @staticmethod
+    async def _columns(conn: asyncpg.Connection, table: str) -> List[str]:
+        return [row["attname"] for row in await conn.fetch("""
+            SELECT attname FROM pg_attribute
+            WHERE attrelid = $1::regclass AND attnum > 0 AND NOT attisdropped
+            ORDER BY attnum
+        """, table)]
+    
+    @staticmethod
+    async def _primary_key(conn: asyncpg.Connection, table: str) -> List[str]:
+        columns = [row["attname"] for row in await conn.fetch("""
+            SELECT a.attname
+            FROM pg_constraint c
+            CROSS JOIN LATERAL unnest(c.conkey) WITH ORDINALITY AS k(attnum, position)
+            JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.attnum
+            WHERE c.conrelid = $1::regclass AND c.contype = 'p'
+            ORDER BY k.position
+        """, table)]
+        if not columns:
+            raise PartitioningError(f"У таблицы {table} нет первичного ключа")
+        return columns
+
+
+@dataclass(frozen=True)
+class PruningProbe:
+    """Запрос репозитория для проверки отсечения секций и его аргументы"""
+    statement: str
+    args: Callable[[int, int], tuple]
+
+
+# Запросы OrderRepositoryImpl к Orders и Ordered_goods с аргументами по
+# существующей строке заказа (order_id, good_id)
+PRUNING_PROBES = (
+    PruningProbe("get_order_by_id", lambda order_id, good_id: (order_id,)),
+    PruningProbe("get_ordered_goods_by_order_id", lambda order_id, good_id: (order_id,)),
+    PruningProbe("get_order_details", lambda order_id, good_id: (order_id,)),
+    PruningProbe("update_ordered_good", lambda order_id, good_id: (order_id, good_id, 1)),
+    PruningProbe("delete_ordered_good", lambda order_id, good_id: (order_id, good_id)),
+    PruningProbe("validate_order_lines", lambda order_id, good_id: ([order_id], [good_id])),
+    PruningProbe("upsert_ordered_goods", lambda order_id, good_id: ([order_id], [good_id], [1])),
+)
+
+PLAN_CACHE_MODES = ("force_custom_plan", "force_generic_plan")
+
+
+@dataclass
+class PruningResult:
+    """Секции, которые запрос действительно прочитал"""
+    statement: str
+    plan_cache_mode: str
+    scanned: Dict[str, List[str]]
+    partitions: Dict[str, int]
+    
+    @property
+    def pruned(self) -> bool:
+        return all(len(names) <= 1 for names in self.scanned.values())
+
+
+def _literal(value) -> str:
+    if isinstance(value, (list, tuple)):
+        return "'{" + ",".join(str(int(item)) for item in value) + "}'"
+    return str(int(value))
+
+
+def _executed_relations(plan: dict, found: List[str]) -> List[str]:
+    # Отсечённые при планировании или запуске секции в плане отсутствуют,
+    # отсечённые при выполнении - есть, но с нулём циклов
+    if plan.get("Relation Name") and plan.get("Actual Loops", 0) > 0:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", ()):
+        _executed_relations(child, found)
+    return found
+
+
+async def check_pruning(connection: DatabaseConnection = db_connection) -> List[PruningResult]:
+    """Проверить отсечение секций в планах запросов репозитория
+    
+    Каждый запрос из PRUNING_PROBES выполняется через EXPLAIN ANALYZE для
+    заказа, у которого есть строки, с индивидуальным и с общим планом
+    (plan_cache_mode), как это делает кэш подготовленных операторов.
+    Запросы выполняются в транзакции, которая затем откатывается, поэтому
+    изменений не остаётся, но блокировки товаров берутся на время проверки.
+    """
+    async with connection.get_connection() as conn:
+        sample = await conn.fetchrow("SELECT order_id, good_id FROM Ordered_goods LIMIT 1")
+        if sample is None:
+            raise PartitioningError("Для проверки нужен хотя бы один заказ со строками")
+        partitions: Dict[str, Dict[str, str]] = {}
+        for table in PARTITION_KEYS:
+            for row in await conn.fetch("""
+                SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = $1::regclass
+            """, table):
+                partitions.setdefault(table, {})[row["relname"]] = table
+        owner = {name: table for table_partitions in partitions.values() for name, table in table_partitions.items()}
+        
+        results = []
+        transaction = conn.transaction()
+        await transaction.start()
+        try:
+            for probe in PRUNING_PROBES:
+                sql = statements.REGISTRY[probe.statement]
+                args = ", ".join(_literal(value) for value in probe.args(sample["order_id"], sample["good_id"]))
+                for mode in PLAN_CACHE_MODES:
+                    await conn.execute(f"SET LOCAL plan_cache_mode = {mode}")
+                    await conn.execute(f"PREPARE partition_probe AS {sql}")
+                    try:
+                        plan = await conn.fetchval(
+                            f"EXPLAIN (ANALYZE, COSTS OFF, TIMING OFF, FORMAT JSON) EXECUTE partition_probe({args})"
+                        )
+                    finally:
+                        await conn.execute("DEALLOCATE partition_probe")
+                    scanned: Dict[str, List[str]] = {}
+                    for name in _executed_relations(json.loads(plan)[0]["Plan"], []):
+                        if name in owner:
+                            scanned.setdefault(owner[name], [])
+                            if name not in scanned[owner[name]]:
+                                scanned[owner[name]].append(name)
+                    results.append(PruningResult(
+                        statement=probe.statement,
+                        plan_cache_mode=mode,
+                        scanned=scanned,
+                        partitions={table: len(names) for table, names in partitions.items()}
+                    ))
+        finally:
+            await transaction.rollback()
+    return results
@@ -0,0 +1,215 @@
+from typing import Dict
+
+
+# Реестр запросов репозиториев: имя -> текст запроса.
+# Запрос подготавливается при первом выполнении на соединении пула, а затем
+# берётся из кэша подготовленных операторов asyncpg по тексту, поэтому в
+# методы DatabaseConnection передаются сами строки. Размер кэша не меньше
+# числа запросов реестра, чтобы они не вытесняли друг друга.
+REGISTRY: Dict[str, str] = {}
+
+
+def register(name: str, sql: str) -> str:
+    """Зарегистрировать запрос в реестре"""
+    if name in REGISTRY:
+        raise ValueError(f"Statement '{name}' is already registered")
+    REGISTRY[name] = sql
+    return sql
+
+
+GET_ORDER_BY_ID = register("get_order_by_id", """
+    SELECT id, client_id FROM Orders WHERE id = $1
+""")
+
+GET_ORDERED_GOODS_BY_ORDER_ID = register("get_ordered_goods_by_order_id", """
+    SELECT order_id, good_id, amount
+    FROM Ordered_goods
+    WHERE order_id = $1
+""")
+
+# Заказ, его строки и цены товаров одним запросом (LEFT JOIN сохраняет пустой заказ)
+GET_ORDER_DETAILS = register("get_order_details", """
+    SELECT o.id, o.client_id, o.version, og.good_id, og.amount, g.name, g.price
+    FROM Orders o
+    LEFT JOIN Ordered_goods og ON og.order_id = o.id
+    LEFT JOIN Goods g ON g.id = og.good_id
+    WHERE o.id = $1
+    ORDER BY og.good_id
+""")
+
+# Итоги клиента; клиент без заказов может ещё не иметь строки в Client_totals
+GET_CLIENT_TOTALS = register("get_client_totals", """
+    SELECT c.id, c.name,
+           COALESCE(t.total_amount, 0) AS total_amount,
+           COALESCE(t.total_cost, 0) AS total_cost
+    FROM Clients c
+    LEFT JOIN Client_totals t ON t.client_id = c.id
+    WHERE c.id = $1
+""")
+
+REBUILD_CLIENT_TOTALS = register("rebuild_client_totals", """
+    SELECT client_id, stored_amount, actual_amount, stored_cost, actual_cost
+    FROM rebuild_client_totals($1)
+""")
+
+# Goods_stock отдаёт полный остаток и для товаров с шардированным остатком
+GET_GOOD_BY_ID = register("get_good_by_id", """
+    SELECT id, name, amount, price, catalogue_id
+    FROM Goods_stock
+    WHERE id = $1
+""")
+
+INSERT_ORDERED_GOOD = register("insert_ordered_good", """
+    INSERT INTO Ordered_goods (order_id, good_id, amount)
+    VALUES ($1, $2, $3)
+""")
+
+UPDATE_ORDERED_GOOD = register("update_ordered_good", """
+    UPDATE Ordered_goods
+    SET amount = $3
+    WHERE order_id = $1 AND good_id = $2
+""")
+
+DELETE_ORDERED_GOOD = register("delete_ordered_good", """
+    DELETE FROM Ordered_goods
+    WHERE order_id = $1 AND good_id = $2
+""")
+
+UPDATE_GOOD_AMOUNT = register("update_good_amount", """
+    SELECT set_good_stock($1, $2)
+""")
+
+SET_STOCK_SHARDS = register("set_stock_shards", """
+    SELECT set_stock_shards($1, $2)
+""")
+
+ADD_GOOD_TO_ORDER = register("add_good_to_order", """
+    SELECT status, stock_left, ordered_amount
+    FROM add_ordered_good($1, $2, $3)
+""")
+
+ADD_GOOD_TO_ORDER_ONCE = register("add_good_to_order_once", """
+    SELECT replayed, request_matches, status, stock_left, ordered_amount, expires_at
+    FROM add_ordered_good_once($1, $2, $3, $4, make_interval(secs => $5))
+""")
+
+DELETE_EXPIRED_IDEMPOTENCY_KEYS = register("delete_expired_idempotency_keys", """
+    DELETE FROM Idempotency_keys
+    WHERE key IN (
+        SELECT key FROM Idempotency_keys
+        WHERE expires_at <= now()
+        LIMIT $1
+        FOR UPDATE SKIP LOCKED
+    )
+""")
+
+# Проверка строк пакета с блокировкой затронутых товаров в порядке ID,
+# а затем шардов их остатка в порядке (good_id, shard). FOR NO KEY UPDATE
+# не конфликтует с FOR KEY SHARE одиночного списания и проверки внешнего
+# ключа Ordered_goods, поэтому одиночное списание с уже взятым шардом не
+# ждёт строку Goods, заблокированную пакетом
+VALIDATE_ORDER_LINES = register("validate_order_lines", """
+    WITH locked_goods AS MATERIALIZED (
+        SELECT id, COALESCE(amount, 0) AS amount, stock_shards
+        FROM Goods
+        WHERE id = ANY($2::int[])
+        ORDER BY id
+        FOR NO KEY UPDATE
+    ),
+    locked_shards AS MATERIALIZED (
+        SELECT s.good_id, s.amount
+        FROM Goods_stock_shards s
+        WHERE s.good_id IN (SELECT id FROM locked_goods WHERE stock_shards > 0)
+        ORDER BY s.good_id, s.shard
+        FOR UPDATE
+    ),
+    stock AS (
+        SELECT g.id,
+               CASE WHEN g.stock_shards > 0
+                    THEN (SELECT COALESCE(SUM(s.amount), 0) FROM locked_shards s WHERE s.good_id = g.id)::int
+                    ELSE g.amount
+               END AS amount
+        FROM locked_goods g
+    )
+    SELECT o.id IS NOT NULL AS order_exists, g.id AS good_id, g.amount AS stock
+    FROM unnest($1::bigint[], $2::int[]) WITH ORDINALITY AS l(order_id, good_id, idx)
+    LEFT JOIN Orders o ON o.id = l.order_id
+    LEFT JOIN stock g ON g.id = l.good_id
+    ORDER BY l.idx
+""")
+
+DECREMENT_GOODS_AMOUNT = register("decrement_goods_amount", """
+    SELECT decrement_goods_stock($1::int[], $2::int[])
+""")
+
+UPSERT_ORDERED_GOODS = register("upsert_ordered_goods", """
+    INSERT INTO Ordered_goods AS og (order_id, good_id, amount)
+    SELECT * FROM unnest($1::bigint[], $2::int[], $3::int[])
+    ON CONFLICT (order_id, good_id) DO UPDATE SET amount = og.amount + EXCLUDED.amount
+    RETURNING og.order_id, og.good_id, og.amount
+""")
+
+# Отчёт топ-5 товаров вместе со временем его обновления и возрастом по часам БД
+GET_TOP_GOODS = register("get_top_goods", """
+    SELECT r.refreshed_at,
+           EXTRACT(EPOCH FROM clock_timestamp() - r.refreshed_at)::float8 AS age_seconds,
+           t.good_id, t.Наименование_товара AS name, t.Категория_1_го_уровня AS category,
+           t.Общее_количество_проданных_штук AS total_sold
+    FROM Report_refreshes r
+    LEFT JOIN top5_monthly_purchased_goods t ON TRUE
+    WHERE r.name = 'top5_monthly_purchased_goods'
+    ORDER BY t.Общее_количество_проданных_штук DESC, t.Наименование_товара
+""")
+
+REFRESH_TOP_GOODS = register("refresh_top_goods", """
+    SELECT refresh_top5_monthly_purchased_goods($1, $2, $3)
+""")
+
+GET_CATALOGUE = register("get_catalogue", """
+    SELECT id, name, path::text AS path
+    FROM Catalogue
+""")
+
+# Товары поддерева каталога: ID категорий поддерева берутся из дерева в памяти
+GET_GOODS_BY_CATALOGUE_IDS = register("get_goods_by_catalogue_ids", """
+    SELECT id, name, amount, price, catalogue_id
+    FROM Goods_stock
+    WHERE catalogue_id = ANY($1::smallint[])
+    ORDER BY id
+""")
+
+# Тикеты отложенного добавления товара. Вставка захватывает тикеты пакета:
+# RETURNING возвращает только новые, так что повтор пакета после потерянного
+# подтверждения COMMIT не применяет строки второй раз
+CLAIM_ADD_GOOD_TICKETS = register("claim_add_good_tickets", """
+    INSERT INTO Add_good_tickets (id, order_id, good_id, amount, accepted_at, expires_at)
+    SELECT t.id, t.order_id, t.good_id, t.amount, t.accepted_at, now() + make_interval(secs => $6)
+    FROM unnest($1::uuid[], $2::bigint[], $3::integer[], $4::integer[], $5::timestamptz[])
+        AS t(id, order_id, good_id, amount, accepted_at)
+    ON CONFLICT (id) DO NOTHING
+    RETURNING id
+""")
+
+SAVE_ADD_GOOD_TICKET_RESULTS = register("save_add_good_ticket_results", """
+    UPDATE Add_good_tickets t
+    SET status = r.status, stock_left = r.stock_left, ordered_amount = r.ordered_amount, completed_at = now()
+    FROM unnest($1::uuid[], $2::text[], $3::integer[], $4::integer[])
+        AS r(id, status, stock_left, ordered_amount)
+    WHERE t.id = r.id
+""")
+
+GET_ADD_GOOD_TICKETS = register("get_add_good_tickets", """
+    SELECT id, order_id, good_id, amount, status, stock_left, ordered_amount, accepted_at, completed_at
+    FROM Add_good_tickets
+    WHERE id = ANY($1::uuid[])
+""")
+
+DELETE_EXPIRED_ADD_GOOD_TICKETS = register("delete_expired_add_good_tickets", """
+    DELETE FROM Add_good_tickets
+    WHERE id IN (
+        SELECT id FROM Add_good_tickets
+        WHERE expires_at <= now()
+        LIMIT $1
+        FOR UPDATE SKIP LOCKED
+    )
+""")
@@ -0,0 +1,432 @@
+import itertools
+import random
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from .connection import DatabaseConnection, db_connection
+
+
+# Таблицы набора данных; TRUNCATE ... CASCADE очищает и зависящие от них
+# (итоги клиентов, шарды остатка, ключи идемпотентности, квитанции)
+TABLES = ("catalogue", "goods", "clients", "orders", "ordered_goods")
+
+# Предел SMALLSERIAL Catalogue.id
+MAX_CATALOGUE_NODES = 32767
+
+# Индексы, рекомендованные в Task2/T2_scripts.ipynb. Часть из них уже создаёт
+# init.sql под этими же именами. Индекс Ordered_goods (order_id) не нужен:
+# его заменяет первичный ключ (order_id, good_id)
+NOTEBOOK_INDEXES: Dict[str, str] = {
+    "ordered_goods_good_id_idx": "CREATE INDEX ordered_goods_good_id_idx ON Ordered_goods (good_id)",
+    "goods_catalogue_id_idx": "CREATE INDEX goods_catalogue_id_idx ON Goods (catalogue_id)",
+    "orders_client_id_idx": "CREATE INDEX orders_client_id_idx ON Orders (client_id, id)",
+    "catalogue_path_nlevel_idx": "CREATE INDEX catalogue_path_nlevel_idx ON Catalogue (nlevel(path))",
+    "catalogue_path_gist_idx": "CREATE INDEX catalogue_path_gist_idx ON Catalogue USING GIST (path)",
+    "catalogue_path_btree_idx": "CREATE INDEX catalogue_path_btree_idx ON Catalogue USING BTREE (path)",
+}
+
+# keep - индексы схемы как были, notebook - плюс рекомендованные,
+# none - без рекомендованных (исходная схема Task1 для сравнения планов)
+INDEX_MODES = ("keep", "notebook", "none")
+
+# Строчные триггеры Ordered_goods, отключаемые на время загрузки: версии
+# новых заказов остаются нулевыми, а итоги клиентов пересчитываются одним
+# запросом после загрузки. Кэши приложения сбрасывает TRUNCATE
+LOAD_DISABLED_TRIGGERS = ("ordered_goods_changed", "ordered_goods_client_totals_insert")
+
+# У секционированной таблицы определение индекса содержит ON ONLY: такой
+# индекс создаётся без индексов секций, поэтому ONLY убирается
+SECONDARY_INDEXES = """
+    SELECT i.relname AS name, replace(pg_get_indexdef(i.oid), ' ON ONLY ', ' ON ') AS definition
+    FROM pg_index x
+    JOIN pg_class i ON i.oid = x.indexrelid
+    WHERE x.indrelid IN (SELECT to_regclass(t) FROM unnest($1::text[]) AS t)
+      AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)
+    ORDER BY i.relname
+"""
+
+# Внешние ключи загружаемых таблиц (без унаследованных секциями)
+FOREIGN_KEYS = """
+    SELECT conrelid::regclass::text AS table_name, conname AS name, pg_get_constraintdef(oid) AS definition
+    FROM pg_constraint
+    WHERE contype = 'f' AND conparentid = 0
+      AND conrelid IN (SELECT to_regclass(t) FROM unnest($1::text[]) AS t)
+    ORDER BY conname
+"""
+
+# Порядконезависимая сводка содержимого таблиц набора. Совпадает у наборов
+# с одинаковыми параметрами и seed на одной версии PostgreSQL и меняется
+# после любых изменений данных (в том числе остатков нагрузочными тестами)
+FINGERPRINT = """
+    SELECT md5(string_agg(part, '|' ORDER BY n)) FROM (
+        SELECT 1, count(*) || ':' || COALESCE(sum(hashtext(concat_ws(';', id, name, path))::bigint), 0)
+        FROM Catalogue
+        UNION ALL
+        SELECT 2, count(*) || ':' || COALESCE(sum(hashtext(concat_ws(';', id, name, amount, price, catalogue_id))::bigint), 0)
+        FROM Goods
+        UNION ALL
+        SELECT 3, count(*) || ':' || COALESCE(sum(hashtext(concat_ws(';', id, name, address))::bigint), 0)
+        FROM Clients
+        UNION ALL
+        SELECT 4, count(*) || ':' || COALESCE(sum(hashtext(concat_ws(';', id, client_id))::bigint), 0)
+        FROM Orders
+        UNION ALL
+        SELECT 5, count(*) || ':' || COALESCE(sum(hashtext(concat_ws(';', order_id, good_id, amount))::bigint), 0)
+        FROM Ordered_goods
+    ) s(n, part)
+"""
+
+CITIES = (
+    "Москва", "Санкт-Петербург", "Екатеринбург", "Новосибирск", "Казань", "Нижний Новгород",
+    "Ростов-на-Дону", "Краснодар", "Челябинск", "Омск", "Самара", "Уфа", "Воронеж", "Пермь"
+)
+STREETS = ("Ленина", "Пушкина", "Кирова", "Садовая", "Мира", "Гагарина", "Советская", "Лесная", "Школьная")
+
+# Количество товара в строке заказа: чаще всего одна штука
+LINE_AMOUNTS = (1, 2, 3, 4, 5)
+LINE_AMOUNT_WEIGHTS = (70, 18, 7, 3, 2)
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    """Параметры синтетического набора данных
+    
+    Одинаковые параметры и seed дают одинаковые данные. Каждая сущность
+    генерируется своим генератором случайных чисел от seed, поэтому,
+    например, изменение числа заказов не меняет каталог, товары и клиентов.
+    """
+    seed: int = 42
+    orders: int = 1_000_000
+    clients: int = 100_000
+    goods: int = 10_000
+    # Доля клиентов без единого заказа
+    clients_without_orders: float = 0.2
+    # Строк в заказе: от 1 до max_lines (повторы товара суммируются)
+    max_lines: int = 5
+    # Популярность товаров по закону Ципфа: вес товара ранга r - 1 / r^s
+    zipf_exponent: float = 1.1
+    # Дерево каталога: корни, уровни, до catalogue_fanout детей у узла
+    catalogue_roots: int = 8
+    catalogue_depth: int = 7
+    catalogue_fanout: int = 4
+    max_stock: int = 1000
+    
+    @property
+    def active_clients(self) -> int:
+        return self.clients - round(self.clients * self.clients_without_orders)
+    
+    def validate(self) -> None:
+        if self.goods < 1 or self.clients < 1 or self.orders < 0:
+            raise ValueError("Нужны хотя бы один товар и один клиент, число заказов не может быть отрицательным")
+        if not 0 <= self.clients_without_orders < 1:
+            raise ValueError("Доля клиентов без заказов должна быть в [0, 1)")
+        if self.active_clients < 1 or self.orders < self.active_clients:
+            raise ValueError(
+                f"Заказов ({self.orders}) меньше, чем клиентов с заказами ({self.active_clients}): "
+                f"уменьшите число клиентов или увеличьте долю клиентов без заказов"
+            )
+        if self.max_lines < 1 or self.max_stock < 0 or self.zipf_exponent < 0:
+            raise ValueError("max_lines должен быть положительным, max_stock и показатель Ципфа - неотрицательными")
+        if self.catalogue_roots < 1 or self.catalogue_depth < 1 or self.catalogue_fanout < 1:
+            raise ValueError("Корней, уровней и детей каталога должно быть не меньше одного")
+        if self.catalogue_roots > MAX_CATALOGUE_NODES:
+            raise ValueError(f"Корней каталога не может быть больше {MAX_CATALOGUE_NODES}")
+
+
+@dataclass
+class GenerationProgress:
+    """Ход загрузки заказов"""
+    total_orders: int
+    orders: int = 0
+    lines: int = 0
+    chunks: int = 0
+    started: float = field(default_factory=time.perf_counter)
+    
+    @property
+    def percent(self) -> float:
+        return 100.0 * self.orders / self.total_orders if self.total_orders else 100.0
+    
+    @property
+    def rows_per_second(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return (self.orders + self.lines) / elapsed if elapsed > 0 else 0.0
+
+
+@dataclass
+class DatasetSummary:
+    """Итог генерации набора"""
+    spec: DatasetSpec
+    catalogue_nodes: int
+    catalogue_depth: int
+    catalogue_leaves: int
+    goods: int
+    clients: int
+    clients_without_orders: int
+    orders: int
+    lines: int
+    # Доля строк заказов у 1% самых популярных товаров
+    top_goods_share: float
+    indexes: List[str]
+    load_seconds: float
+    # Построение индексов и проверка внешних ключей
+    index_seconds: float
+    vacuum_seconds: float
+    fingerprint: str
+
+
+@dataclass
+class _Catalogue:
+    rows: List[Tuple[int, str, str]]
+    leaves: List[int]
+    depth: int
+
+
+class SyntheticDataset:
+    """Генератор синтетического набора данных для проверки схемы на объёме
+    
+    Заменяет содержимое Catalogue, Goods, Clients, Orders и Ordered_goods
+    (и зависящих от них таблиц) набором по DatasetSpec: дерево каталога
+    ltree заданной глубины (метки пути - ID узлов, как в init.sql), товары
+    в листьях каталога, клиенты, часть которых без заказов, и заказы,
+    товары которых выбираются по закону Ципфа.
+    
+    Замена выполняется одной транзакцией, поэтому при ошибке прежние данные
+    остаются. Вторичные индексы и внешние ключи удаляются до загрузки и
+    восстанавливаются после неё (ключи проверяются одним запросом, а не по
+    строке). Данные загружаются бинарным COPY порциями по chunk_size
+    заказов, строки заказа - сразу после своих заказов. Строчные триггеры
+    Ordered_goods на время загрузки отключаются, итоги клиентов
+    пересчитываются rebuild_client_totals. После фиксации таблицы обрабатываются
+    VACUUM ANALYZE (статистика и карта видимости для index-only scan) и
+    обновляется отчёт топ-5.
+    
+    Загрузка берёт ACCESS EXCLUSIVE блокировку таблиц до конца транзакции:
+    генератор предназначен для стендов, а не для рабочей БД.
+    """
+    
+    def __init__(
+        self,
+        spec: DatasetSpec,
+        chunk_size: int = 50000,
+        index_mode: str = "keep",
+        database: DatabaseConnection = db_connection
+    ):
+        if index_mode not in INDEX_MODES:
+            raise ValueError(f"Неизвестный режим индексов {index_mode}, доступны: {', '.join(INDEX_MODES)}")
+        spec.validate()
+        self.spec = spec
+        self.chunk_size = chunk_size
+        self.index_mode = index_mode
+        self._database = database
+    
+    def rng(self, entity: str) -> random.Random:
+        """Генератор случайных чисел сущности: зависит только от seed и имени"""
+        return random.Random(f"{self.spec.seed}:{entity}")
+    
+    def catalogue(self) -> _Catalogue:
+        """Дерево каталога по уровням; у узла от 1 до catalogue_fanout детей"""
+        rng = self.rng("catalogue")
+        rows: List[Tuple[int, str, str]] = []
+        parents = set()
+        level: List[Tuple[int, str]] = []
+        for _ in range(self.spec.catalogue_roots):
+            node_id = len(rows) + 1
+            rows.append((node_id, f"Раздел {node_id}", str(node_id)))
+            level.append((node_id, str(node_id)))
+        
+        depth = 1
+        while depth < self.spec.catalogue_depth and len(rows) < MAX_CATALOGUE_NODES:
+            next_level = []
+            for parent_id, parent_path in level:
+                for _ in range(rng.randint(1, self.spec.catalogue_fanout)):
+                    if len(rows) >= MAX_CATALOGUE_NODES:
+                        break
+                    node_id = len(rows) + 1
+                    path = f"{parent_path}.{node_id}"
+                    rows.append((node_id, f"Раздел {path}", path))
+                    next_level.append((node_id, path))
+                    parents.add(parent_id)
+            level = next_level
+            depth += 1
+        
+        leaves = [node_id for node_id, _, _ in rows if node_id not in parents]
+        return _Catalogue(rows=rows, leaves=leaves, depth=depth)
+    
+    def goods(self, leaves: List[int]) -> List[Tuple[int, str, int, Decimal, int]]:
+        """Товары в листьях каталога: (id, name, amount, price, catalogue_id)"""
+        rng = self.rng("goods")
+        rows = []
+        for good_id in range(1, self.spec.goods + 1):
+            # Цены распределены логнормально: много дешёвых, мало дорогих
+            price = Decimal(f"{min(rng.lognormvariate(8.5, 1.2), 9_999_999):.2f}")
+            amount = 0 if rng.random() < 0.05 or not self.spec.max_stock else rng.randint(1, self.spec.max_stock)
+            rows.append((good_id, f"Товар {good_id}", amount, price, rng.choice(leaves)))
+        return rows
+    
+    def clients(self) -> Iterator[Tuple[int, str, str]]:
+        """Клиенты: (id, name, address)"""
+        rng = self.rng("clients")
+        for client_id in range(1, self.spec.clients + 1):
+            address = f"г. {rng.choice(CITIES)}, ул. {rng.choice(STREETS)}, д. {rng.randint(1, 150)}"
+            yield client_id, f"Клиент {client_id}", address
+    
+    def active_clients(self) -> List[int]:
+        """Клиенты с заказами в случайном порядке"""
+        client_ids = list(range(1, self.spec.clients + 1))
+        self.rng("active_clients").shuffle(client_ids)
+        return client_ids[self.spec.clients - self.spec.active_clients:]
+    
+    def popularity(self) -> Tuple[List[int], List[float]]:
+        """Товары по убыванию популярности и накопленные веса Ципфа
+        
+        Ранги назначаются случайной перестановкой, чтобы популярные товары
+        не совпадали с первыми ID и не собирались в одной категории.
+        """
+        ranking = list(range(1, self.spec.goods + 1))
+        self.rng("popularity").shuffle(ranking)
+        cum_weights = list(itertools.accumulate(
+            1 / rank ** self.spec.zipf_exponent for rank in range(1, self.spec.goods + 1)
+        ))
+        return ranking, cum_weights
+    
+    def order_chunks(self) -> Iterator[Tuple[List[Tuple[int, int]], List[Tuple[int, int, int]]]]:
+        """Порции заказов (id, client_id) и их строк (order_id, good_id, amount)
+        
+        Первые заказы достаются каждому клиенту с заказами по одному,
+        остальные - случайным из них.
+        """
+        rng = self.rng("orders")
+        active = self.active_clients()
+        ranking, cum_weights = self.popularity()
+        for start in range(1, self.spec.orders + 1, self.chunk_size):
+            orders = []
+            lines = []
+            for order_id in range(start, min(start + self.chunk_size, self.spec.orders + 1)):
+                index = order_id - 1
+                client_id = active[index] if index < len(active) else rng.choice(active)
+                orders.append((order_id, client_id))
+                count = rng.randint(1, self.spec.max_lines)
+                amounts: Dict[int, int] = {}
+                for good_id, amount in zip(
+                    rng.choices(ranking, cum_weights=cum_weights, k=count),
+                    rng.choices(LINE_AMOUNTS, weights=LINE_AMOUNT_WEIGHTS, k=count)
+                ):
+                    amounts[good_id] = amounts.get(good_id, 0) + amount
+                lines.extend((order_id, good_id, amount) for good_id, amount in amounts.items())
+            yield orders, lines
+    
+    async def generate(self, on_chunk: Optional[Callable[[GenerationProgress], None]] = None) -> DatasetSummary:
+        """Заменить данные таблиц синтетическим набором"""
+        catalogue = self.catalogue()
+        goods = self.goods(catalogue.leaves)
+        progress = GenerationProgress(total_orders=self.spec.orders)
+        
+        started = time.perf_counter()
+        async with self._database.unit_of_work() as connection:
+            await connection.execute("SET LOCAL maintenance_work_mem = '256MB'")
+            existing = await connection.fetch(SECONDARY_INDEXES, list(TABLES))
+            foreign_keys = await connection.fetch(FOREIGN_KEYS, list(TABLES))
+            await connection.execute(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE")
+            for index in existing:
+                await connection.execute(f'DROP INDEX "{index["name"]}"')
+            # Внешние ключи проверяются одним соединением таблиц при
+            # восстановлении, а не построчно при COPY
+            for key in foreign_keys:
+                await connection.execute(f'ALTER TABLE {key["table_name"]} DROP CONSTRAINT "{key["name"]}"')
+            for trigger in LOAD_DISABLED_TRIGGERS:
+                await connection.execute(f"ALTER TABLE Ordered_goods DISABLE TRIGGER {trigger}")
+            
+            # У ltree нет бинарного кодека asyncpg, поэтому каталог (не больше
+            # MAX_CATALOGUE_NODES строк) вставляется из массивов, а не COPY
+            await connection.execute(
+                """
+                INSERT INTO Catalogue (id, name, path)
+                SELECT id, name, path::ltree FROM unnest($1::smallint[], $2::text[], $3::text[]) AS c(id, name, path)
+                """,
+                *(list(column) for column in zip(*catalogue.rows))
+            )
+            await connection.copy_records_to_table(
+                "goods", records=goods, columns=("id", "name", "amount", "price", "catalogue_id")
+            )
+            await connection.copy_records_to_table("clients", records=self.clients(), columns=("id", "name", "address"))
+            for orders, lines in self.order_chunks():
+                await connection.copy_records_to_table("orders", records=orders, columns=("id", "client_id"))
+                await connection.copy_records_to_table(
+                    "ordered_goods", records=lines, columns=("order_id", "good_id", "amount")
+                )
+                progress.orders += len(orders)
+                progress.lines += len(lines)
+                progress.chunks += 1
+                if on_chunk is not None:
+                    on_chunk(progress)
+            
+            for trigger in LOAD_DISABLED_TRIGGERS:
+                await connection.execute(f"ALTER TABLE Ordered_goods ENABLE TRIGGER {trigger}")
+            # ID новых строк через API продолжаются после набора
+            for table in ("catalogue", "goods", "clients", "orders"):
+                await connection.execute(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM {table}), 1), (SELECT MAX(id) IS NOT NULL FROM {table}))"
+                )
+            await connection.execute("SELECT count(*) FROM rebuild_client_totals()")
+            load_seconds = time.perf_counter() - started
+            
+            started = time.perf_counter()
+            indexes = self._index_definitions({index["name"]: index["definition"] for index in existing})
+            for definition in indexes.values():
+                await connection.execute(definition)
+            for key in foreign_keys:
+                await connection.execute(
+                    f'ALTER TABLE {key["table_name"]} ADD CONSTRAINT "{key["name"]}" {key["definition"]}'
+                )
+            index_seconds = time.perf_counter() - started
+            top_goods_share = await connection.fetchval(
+                """
+                SELECT COALESCE(sum(n) FILTER (WHERE rank <= GREATEST($1 / 100, 1))::float / NULLIF(sum(n), 0), 0)
+                FROM (
+                    SELECT count(*) AS n, row_number() OVER (ORDER BY count(*) DESC) AS rank
+                    FROM Ordered_goods GROUP BY good_id
+                ) s
+                """,
+                self.spec.goods
+            )
+        
+        started = time.perf_counter()
+        async with self._database.get_connection() as connection:
+            # VACUUM не выполняется внутри транзакции
+            for table in TABLES + ("client_totals",):
+                await connection.execute(f"VACUUM ANALYZE {table}")
+            vacuum_seconds = time.perf_counter() - started
+            await connection.execute("SELECT refresh_top5_monthly_purchased_goods(0, TRUE, 0)")
+        
+        return DatasetSummary(
+            spec=self.spec,
+            catalogue_nodes=len(catalogue.rows),
+            catalogue_depth=catalogue.depth,
+            catalogue_leaves=len(catalogue.leaves),
+            goods=len(goods),
+            clients=self.spec.clients,
+            clients_without_orders=self.spec.clients - self.spec.active_clients,
+            orders=progress.orders,
+            lines=progress.lines,
+            top_goods_share=top_goods_share,
+            indexes=sorted(indexes),
+            load_seconds=load_seconds,
+            index_seconds=index_seconds,
+            vacuum_seconds=vacuum_seconds,
+            fingerprint=await dataset_fingerprint(self._database)
+        )
+    
+    def _index_definitions(self, existing: Dict[str, str]) -> Dict[str, str]:
+        if self.index_mode == "notebook":
+            return {**NOTEBOOK_INDEXES, **existing}
+        if self.index_mode == "none":
+            return {name: definition for name, definition in existing.items() if name not in NOTEBOOK_INDEXES}
+        return existing
+
+
+async def dataset_fingerprint(database: DatabaseConnection = db_connection) -> str:
+    """Сводка содержимого таблиц набора для сравнения стендов и прогонов"""
+    async with database.get_connection() as connection:
+        return await connection.fetchval(FINGERPRINT)
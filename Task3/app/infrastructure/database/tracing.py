@@ -0,0 +1,195 @@
+import asyncio
+import os
+import random
+import time
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+from . import statements
+from ..monitoring import metrics
+
+# Трассировка запроса API, выполняемого в текущей задаче
+_request_trace: ContextVar[Optional["RequestTrace"]] = ContextVar("request_trace", default=None)
+
+# Метка запросов не из реестра statements
+UNREGISTERED_LABEL = "sql"
+
+
+@dataclass
+class TracedQuery:
+    """Запрос к БД в рамках запроса API"""
+    label: str
+    rows: int
+    execute_ms: float
+    acquire_ms: float
+
+
+@dataclass
+class RequestTrace:
+    """Запросы к БД, выполненные при обработке одного запроса API"""
+    path: str
+    queries: List[TracedQuery] = field(default_factory=list)
+    acquire_ms: float = 0.0
+    acquires: int = 0
+    # Ожидание соединения, ещё не отнесённое к запросу
+    pending_acquire_ms: float = 0.0
+    
+    def add_acquire(self, wait_ms: float) -> None:
+        self.acquire_ms += wait_ms
+        self.acquires += 1
+        self.pending_acquire_ms += wait_ms
+    
+    def add_query(self, label: str, rows: int, execute_ms: float) -> TracedQuery:
+        query = TracedQuery(label, rows, execute_ms, self.pending_acquire_ms)
+        self.pending_acquire_ms = 0.0
+        self.queries.append(query)
+        return query
+    
+    def server_timing(self) -> str:
+        """Значение заголовка Server-Timing: ожидание пула, БД всего и по меткам запросов"""
+        by_label: Dict[str, List[TracedQuery]] = {}
+        for query in self.queries:
+            by_label.setdefault(query.label, []).append(query)
+        entries = [
+            f'pool;dur={self.acquire_ms:.2f};desc="{self.acquires} acquires"',
+            f'db;dur={sum(query.execute_ms for query in self.queries):.2f};desc="{len(self.queries)} queries"'
+        ]
+        for label, queries in by_label.items():
+            count = f"{len(queries)}x, " if len(queries) > 1 else ""
+            entries.append(
+                f'{label};dur={sum(query.execute_ms for query in queries):.2f};'
+                f'desc="{count}rows={sum(query.rows for query in queries)}"'
+            )
+        return ", ".join(entries)
+
+
+def rows_affected(status: str) -> int:
+    """Число строк из статуса команды ("UPDATE 3", "INSERT 0 1")"""
+    count = status.rpartition(" ")[2]
+    return int(count) if count.isdigit() else 0
+
+
+class QueryTracer:
+    """Трассировка запросов к БД в запросах API и журнал медленных запросов
+    
+    Включается переменной SQL_TRACE_ENABLED. Для каждого запроса API
+    запоминаются метка запроса (имя в реестре statements), число строк,
+    время выполнения и ожидание соединения из пула; сводка отдаётся в
+    заголовке Server-Timing. Запросы дольше slow_query_ms выводятся в журнал,
+    а для доли sample_rate из них на отдельном соединении снимается
+    EXPLAIN (ANALYZE, BUFFERS) в откатываемой транзакции - не чаще одного
+    раза в explain_interval секунд. Запрос в EXPLAIN выполняется повторно,
+    поэтому его изменения откатываются, но блокировки на время выполнения
+    берутся.
+    
+    Выключенная трассировка стоит одного чтения ContextVar на запрос к БД.
+    """
+    
+    EXPLAIN_STATEMENT_TIMEOUT = "5s"
+    EXPLAIN_LOCK_TIMEOUT = "1s"
+    
+    def __init__(
+        self,
+        connect: Callable[[], Awaitable],
+        enabled: Optional[bool] = None,
+        slow_query_ms: Optional[float] = None,
+        sample_rate: Optional[float] = None,
+        explain_interval: Optional[float] = None
+    ):
+        self.enabled = enabled if enabled is not None else os.getenv("SQL_TRACE_ENABLED", "false").lower() == "true"
+        # 0 - не выводить медленные запросы
+        self.slow_query_ms = slow_query_ms if slow_query_ms is not None else float(os.getenv("SQL_SLOW_QUERY_MS", "100"))
+        self.sample_rate = sample_rate if sample_rate is not None else float(os.getenv("SQL_EXPLAIN_SAMPLE_RATE", "0.1"))
+        self.explain_interval = explain_interval if explain_interval is not None else float(
+            os.getenv("SQL_EXPLAIN_MIN_INTERVAL_SECONDS", "10")
+        )
+        self.traced_requests = 0
+        self.slow_queries = 0
+        self.explains = 0
+        self.explain_errors = 0
+        self._connect = connect
+        self._labels: Optional[Dict[str, str]] = None
+        self._last_explain: Optional[float] = None
+        self._explain_tasks: Set[asyncio.Task] = set()
+    
+    @staticmethod
+    def current() -> Optional[RequestTrace]:
+        """Трассировка текущего запроса API или None"""
+        return _request_trace.get()
+    
+    def start_request(self, path: str) -> Optional[Token]:
+        """Начать трассировку запроса API в текущем контексте"""
+        if not self.enabled:
+            return None
+        self.traced_requests += 1
+        return _request_trace.set(RequestTrace(path))
+    
+    def finish_request(self, token: Token) -> None:
+        _request_trace.reset(token)
+    
+    def label(self, sql: str) -> str:
+        if self._labels is None:
+            self._labels = {query: name for name, query in statements.REGISTRY.items()}
+        return self._labels.get(sql, UNREGISTERED_LABEL)
+    
+    def record(self, trace: RequestTrace, sql: str, args: tuple, rows: int, started: float) -> None:
+        """Записать выполненный запрос; started - perf_counter() перед выполнением"""
+        execute_ms = (time.perf_counter() - started) * 1000
+        query = trace.add_query(self.label(sql), rows, execute_ms)
+        if self.slow_query_ms and execute_ms >= self.slow_query_ms:
+            self.slow_queries += 1
+            metrics.SLOW_QUERIES.labels(statement=query.label).inc()
+            print(
+                f"Slow query {query.label} in {trace.path}: {execute_ms:.1f} ms, "
+                f"rows {rows}, pool wait {query.acquire_ms:.1f} ms",
+                flush=True
+            )
+            if self._should_explain():
+                task = asyncio.create_task(self._explain(query.label, sql, args))
+                self._explain_tasks.add(task)
+                task.add_done_callback(self._explain_tasks.discard)
+    
+    def stats(self) -> dict:
+        """Счётчики трассировки"""
+        return {
+            "enabled": self.enabled,
+            "slow_query_ms": self.slow_query_ms,
+            "traced_requests": self.traced_requests,
+            "slow_queries": self.slow_queries,
+            "explains": self.explains,
+            "explain_errors": self.explain_errors
+        }
+    
+    def _should_explain(self) -> bool:
+        if self._explain_tasks or random.random() >= self.sample_rate:
+            return False
+        now = time.monotonic()
+        if self._last_explain is not None and now - self._last_explain < self.explain_interval:
+            return False
+        self._last_explain = now
+        return True
+    
+    async def _explain(self, label: str, sql: str, args: tuple) -> None:
+        connection = None
+        try:
+            # Соединение вне пула: снятие плана не занимает соединения запросов API
+            connection = await self._connect()
+            transaction = connection.transaction()
+            await transaction.start()
+            try:
+                await connection.execute(
+                    f"SET LOCAL statement_timeout = '{self.EXPLAIN_STATEMENT_TIMEOUT}'; "
+                    f"SET LOCAL lock_timeout = '{self.EXPLAIN_LOCK_TIMEOUT}'"
+                )
+                rows = await connection.fetch(f"EXPLAIN (ANALYZE, BUFFERS) {sql}", *args)
+            finally:
+                await transaction.rollback()
+            self.explains += 1
+            plan = "\n".join(f"    {row[0]}" for row in rows)
+            print(f"Slow query {label} plan:\n{plan}", flush=True)
+        except Exception as e:
+            self.explain_errors += 1
+            print(f"Slow query {label} EXPLAIN error: {e}", flush=True)
+        finally:
+            if connection is not None and not connection.is_closed():
+                await connection.close()
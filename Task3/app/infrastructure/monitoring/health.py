@@ -0,0 +1,136 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
+from ..database.connection import DatabaseConnection, db_connection
+
+
+class HealthChecker:
+    """Фоновая проверка БД для проб готовности
+    
+    Раз в interval секунд выполняется SELECT 1 на отдельном соединении вне
+    пула, поэтому проверка не конкурирует с запросами за соединения и не
+    зависает при исчерпании пула. Результат хранится в памяти с временем
+    проверки; пробы читают его и заполненность пула по счётчикам, не
+    обращаясь к БД.
+    
+    Воркер не готов, если последняя проверка не прошла или устарела, либо
+    соединения пула ждут больше max_waiters запросов: балансировщик снимает
+    с него нагрузку раньше, чем запросы начнут уходить в тайм-аут.
+    """
+    
+    def __init__(
+        self,
+        interval: Optional[float] = None,
+        timeout: Optional[float] = None,
+        max_waiters: Optional[int] = None,
+        database: DatabaseConnection = db_connection
+    ):
+        self.interval = interval if interval is not None else float(os.getenv("HEALTH_CHECK_INTERVAL_SECONDS", "2"))
+        self.timeout = timeout if timeout is not None else float(os.getenv("HEALTH_CHECK_TIMEOUT_SECONDS", "1"))
+        # По умолчанию - очередь длиннее заполненного пула
+        max_waiters_env = os.getenv("HEALTH_READY_MAX_POOL_WAITERS")
+        self.max_waiters = max_waiters if max_waiters is not None else (
+            int(max_waiters_env) if max_waiters_env else None
+        )
+        self.database_ok = False
+        self.checked_at: Optional[datetime] = None
+        self.latency_ms: Optional[float] = None
+        self.error: Optional[str] = None
+        self._checked_monotonic: Optional[float] = None
+        self._database = database
+        self._connection = None
+        self._task: Optional[asyncio.Task] = None
+    
+    @property
+    def stale_after(self) -> float:
+        """Возраст проверки, после которого её результат не учитывается"""
+        return self.interval * 3 + self.timeout
+    
+    def age_seconds(self) -> Optional[float]:
+        if self._checked_monotonic is None:
+            return None
+        return time.monotonic() - self._checked_monotonic
+    
+    async def check(self) -> bool:
+        """Проверить БД и сохранить результат"""
+        started = time.perf_counter()
+        try:
+            if self._connection is None or self._connection.is_closed():
+                self._connection = await asyncio.wait_for(self._database.create_connection(), self.timeout)
+            await self._connection.fetchval("SELECT 1", timeout=self.timeout)
+            self.database_ok = True
+            self.error = None
+        except Exception as e:
+            self.database_ok = False
+            self.error = str(e) or type(e).__name__
+            await self._close_connection()
+        self.latency_ms = round((time.perf_counter() - started) * 1000, 3)
+        self.checked_at = datetime.now(timezone.utc)
+        self._checked_monotonic = time.monotonic()
+        return self.database_ok
+    
+    def readiness(self) -> dict:
+        """Готовность воркера по сохранённой проверке и счётчикам пула"""
+        age = self.age_seconds()
+        pool = self._database.pool_stats()
+        reasons: List[str] = []
+        if age is None:
+            reasons.append("database_not_checked")
+        elif not self.database_ok:
+            reasons.append("database_unavailable")
+        elif age > self.stale_after:
+            reasons.append("database_check_stale")
+        if pool is None:
+            reasons.append("pool_not_initialized")
+        else:
+            max_waiters = self.max_waiters if self.max_waiters is not None else pool["max_size"]
+            pool["saturation"] = round(pool["in_use"] / pool["max_size"], 3) if pool["max_size"] else None
+            pool["max_waiters"] = max_waiters
+            if pool["waiters"] > max_waiters:
+                reasons.append("pool_saturated")
+        
+        return {
+            "ready": not reasons,
+            "reasons": reasons,
+            "database": {
+                "ok": self.database_ok,
+                "checked_at": self.checked_at.isoformat() if self.checked_at else None,
+                "age_seconds": round(age, 3) if age is not None else None,
+                "latency_ms": self.latency_ms,
+                "error": self.error
+            },
+            "pool": pool
+        }
+    
+    async def start(self) -> None:
+        """Выполнить первую проверку и запустить фоновые проверки"""
+        await self.check()
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._check_forever())
+    
+    async def stop(self) -> None:
+        """Остановить фоновые проверки и закрыть соединение"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._close_connection()
+    
+    async def _close_connection(self) -> None:
+        connection, self._connection = self._connection, None
+        if connection is not None and not connection.is_closed():
+            connection.terminate()
+    
+    async def _check_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
+
+
+# Глобальный экземпляр проверки готовности
+health_checker = HealthChecker()
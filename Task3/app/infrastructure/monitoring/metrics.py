@@ -0,0 +1,184 @@
+import functools
+import os
+import time
+from typing import Optional
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    generate_latest,
+    multiprocess
+)
+
+# При нескольких воркерах uvicorn метрики пишутся в файлы каталога
+# PROMETHEUS_MULTIPROC_DIR и агрегируются при каждом запросе /metrics
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+HTTP_REQUEST_DURATION = Histogram(
+    "order_api_http_request_duration_seconds",
+    "Длительность обработки HTTP-запроса",
+    ["method", "route", "status"]
+)
+
+REPOSITORY_METHOD_DURATION = Histogram(
+    "order_api_repository_method_duration_seconds",
+    "Длительность вызова метода репозитория",
+    ["method"]
+)
+
+DB_POOL_SIZE = Gauge(
+    "order_api_db_pool_size",
+    "Количество открытых соединений в пуле",
+    multiprocess_mode="livesum"
+)
+
+DB_POOL_IDLE = Gauge(
+    "order_api_db_pool_idle",
+    "Количество свободных соединений в пуле",
+    multiprocess_mode="livesum"
+)
+
+DB_POOL_WAITERS = Gauge(
+    "order_api_db_pool_waiters",
+    "Количество запросов, ожидающих соединение из пула",
+    multiprocess_mode="livesum"
+)
+
+DB_POOL_ACQUIRE_DURATION = Histogram(
+    "order_api_db_pool_acquire_seconds",
+    "Время ожидания соединения из пула",
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+
+OVERSELL_REJECTIONS = Counter(
+    "order_api_oversell_rejections",
+    "Единицы товара сверх остатка в отклонённых из-за его недостатка добавлениях"
+)
+
+INSUFFICIENT_STOCK_REJECTIONS = Counter(
+    "order_api_insufficient_stock_rejections",
+    "Добавления товара, отклонённые из-за недостатка остатка"
+)
+
+IDEMPOTENT_REPLAYS = Counter(
+    "order_api_idempotent_replays",
+    "Повторы запросов, обслуженные по ключу идемпотентности",
+    ["source"]
+)
+
+ID_FILTER_REJECTIONS = Counter(
+    "order_api_id_filter_rejections",
+    "Обращения к БД, не выполненные из-за заведомо несуществующего ID",
+    ["table"]
+)
+
+
+WRITE_BEHIND_QUEUE_DEPTH = Gauge(
+    "order_api_write_behind_queue_depth",
+    "Тикеты отложенного добавления товара, ожидающие в очереди",
+    multiprocess_mode="livesum"
+)
+
+WRITE_BEHIND_BATCH_SIZE = Histogram(
+    "order_api_write_behind_batch_size",
+    "Размер пакетов отложенного добавления товара",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+
+WRITE_BEHIND_REJECTIONS = Counter(
+    "order_api_write_behind_rejections",
+    "Отложенные добавления товара, отклонённые при заполненной очереди"
+)
+
+WRITE_BEHIND_FAILED_TICKETS = Counter(
+    "order_api_write_behind_failed_tickets",
+    "Тикеты, не применённые из-за ошибок БД после всех попыток"
+)
+
+EXPORTS_ACTIVE = Gauge(
+    "order_api_exports_active",
+    "Выгрузки заказов, передаваемые в данный момент",
+    multiprocess_mode="livesum"
+)
+
+EXPORTED_ORDERS = Counter(
+    "order_api_exported_orders",
+    "Заказы, прочитанные потоковыми выгрузками"
+)
+
+EXPORT_REJECTIONS = Counter(
+    "order_api_export_rejections",
+    "Выгрузки, отклонённые из-за занятого пула выгрузок"
+)
+
+
+ADMISSION_REJECTIONS = Counter(
+    "order_api_admission_rejections",
+    "Запросы API, отклонённые с 503 из-за превышения ограничения одновременных запросов",
+    ["route_class"]
+)
+
+ADMISSION_QUEUE_WAIT = Histogram(
+    "order_api_admission_queue_wait_seconds",
+    "Ожидание места принятыми запросами API",
+    ["route_class"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+
+SLOW_QUERIES = Counter(
+    "order_api_slow_queries",
+    "Запросы к БД дольше SQL_SLOW_QUERY_MS в трассируемых запросах API",
+    ["statement"]
+)
+
+REPORT_REFRESHES = Counter(
+    "order_api_report_refreshes",
+    "Обновления MATERIALIZED VIEW отчётов, выполненные этим процессом",
+    ["report", "trigger"]
+)
+
+
+def observe_pool(pool, waiters: int = 0) -> None:
+    """Обновить показатели пула соединений"""
+    DB_POOL_SIZE.set(pool.get_size())
+    DB_POOL_IDLE.set(pool.get_idle_size())
+    DB_POOL_WAITERS.set(waiters)
+
+
+def observe_repository_method(func):
+    """Декоратор: замер длительности асинхронного метода репозитория"""
+    histogram = REPOSITORY_METHOD_DURATION.labels(method=func.__name__)
+    
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - started)
+    
+    return wrapper
+
+
+def render_latest() -> bytes:
+    """Сформировать ответ /metrics в текстовом формате Prometheus"""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def mark_process_dead(pid: Optional[int] = None) -> None:
+    """Удалить live-метрики завершившегося воркера (по умолчанию - текущего процесса)
+    
+    Мастер serve.py вызывает её для каждого завершённого воркера, в том числе
+    упавшего без завершения lifespan: иначе его значения gauge с режимом
+    livesum/liveall остались бы в сумме по воркерам.
+    """
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid() if pid is None else pid)
+
@@ -0,0 +1,49 @@
+from typing import List, Optional
+from ...domain.models.order import ClientTotals, ClientTotalsDrift
+from ...domain.repositories.client_repository import ClientRepository
+from ..database import statements
+from ..database.connection import db_connection
+from ..monitoring.metrics import observe_repository_method
+
+
+class ClientRepositoryImpl(ClientRepository):
+    """Реализация репозитория для работы с клиентами"""
+    
+    @observe_repository_method
+    async def get_client_totals(self, client_id: int) -> Optional[ClientTotals]:
+        """Получить итоги клиента по ID
+        
+        Итоги поддерживаются триггерами в таблице Client_totals, поэтому
+        чтение - поиск по первичному ключу вместо агрегата по всем заказам.
+        """
+        query = statements.GET_CLIENT_TOTALS
+        row = await db_connection.fetch_one(query, client_id)
+        
+        if row:
+            return ClientTotals(
+                client_id=row['id'],
+                name=row['name'],
+                total_amount=row['total_amount'],
+                total_cost=float(row['total_cost'])
+            )
+        return None
+    
+    @observe_repository_method
+    async def reconcile_client_totals(self, apply: bool = True) -> List[ClientTotalsDrift]:
+        """Пересчитать итоги клиентов с нуля и вернуть расхождения
+        
+        При apply=False таблица итогов не изменяется.
+        """
+        query = statements.REBUILD_CLIENT_TOTALS
+        rows = await db_connection.execute_query(query, apply)
+        
+        return [
+            ClientTotalsDrift(
+                client_id=row['client_id'],
+                stored_amount=row['stored_amount'],
+                actual_amount=row['actual_amount'],
+                stored_cost=float(row['stored_cost']),
+                actual_cost=float(row['actual_cost'])
+            )
+            for row in rows
+        ]
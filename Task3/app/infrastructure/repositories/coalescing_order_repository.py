@@ -0,0 +1,97 @@
+import asyncio
+import contextvars
+import os
+from typing import Dict, List, Optional, Set
+from ...domain.models.order import OrderedGood, AddGoodResult
+from .order_repository_impl import OrderRepositoryImpl
+
+
+class _PendingBatch:
+    """Накапливаемые запросы на один товар"""
+    
+    def __init__(self):
+        self.lines: List[OrderedGood] = []
+        self.futures: List[asyncio.Future] = []
+
+
+class AddGoodCoalescer:
+    """Объединение конкурентных добавлений одного товара в пакеты
+    
+    Запросы на один good_id накапливаются в течение окна (или до максимального
+    размера пакета) и применяются одним вызовом add_goods_to_orders в режиме
+    частичного применения. Строки пакета идут в порядке поступления, поэтому
+    остаток распределяется между вызывающими в том же порядке.
+    """
+    
+    def __init__(self, window_ms: Optional[float] = None, max_batch: Optional[int] = None):
+        self.enabled = os.getenv("ADD_GOOD_COALESCING", "false").lower() == "true"
+        self.window_ms = window_ms if window_ms is not None else float(os.getenv("ADD_GOOD_COALESCING_WINDOW_MS", "2"))
+        self.max_batch = max_batch if max_batch is not None else int(os.getenv("ADD_GOOD_COALESCING_MAX_BATCH", "100"))
+        self._repository = OrderRepositoryImpl()
+        self._pending: Dict[int, _PendingBatch] = {}
+        self._tasks: Set[asyncio.Task] = set()
+    
+    async def add_good_to_order(self, order_id: int, good_id: int, amount: int) -> AddGoodResult:
+        """Поставить запрос в пакет товара и дождаться своего результата"""
+        loop = asyncio.get_running_loop()
+        batch = self._pending.get(good_id)
+        if batch is None:
+            batch = self._pending[good_id] = _PendingBatch()
+            loop.call_later(self.window_ms / 1000, self._flush, good_id, batch)
+        
+        future = loop.create_future()
+        batch.lines.append(OrderedGood(order_id=order_id, good_id=good_id, amount=amount))
+        batch.futures.append(future)
+        
+        if len(batch.lines) >= self.max_batch:
+            self._flush(good_id, batch)
+        
+        return await future
+    
+    async def drain(self) -> None:
+        """Применить все накопленные пакеты (вызывается при остановке приложения)"""
+        for good_id, batch in list(self._pending.items()):
+            self._flush(good_id, batch)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+    
+    def _flush(self, good_id: int, batch: _PendingBatch) -> None:
+        # Пакет мог быть уже отправлен по размеру до срабатывания таймера
+        if self._pending.get(good_id) is not batch:
+            return
+        del self._pending[good_id]
+        # Пакет применяется вне единицы работы вызвавшего запроса
+        task = asyncio.create_task(self._apply(batch), context=contextvars.Context())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _apply(self, batch: _PendingBatch) -> None:
+        try:
+            results = await self._repository.add_goods_to_orders(batch.lines, atomic=False)
+        except Exception as e:
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for future, result in zip(batch.futures, results):
+            if not future.done():
+                future.set_result(result)
+
+
+class CoalescingOrderRepository(OrderRepositoryImpl):
+    """Репозиторий заказов, объединяющий конкурентные добавления одного товара"""
+    
+    def __init__(self, coalescer: AddGoodCoalescer):
+        self._coalescer = coalescer
+    
+    async def add_good_to_order(self, order_id: int, good_id: int, amount: int) -> AddGoodResult:
+        """Добавить товар в заказ через пакет конкурентных запросов на этот товар"""
+        rejected = self._rejected_by_id_filters(order_id, good_id)
+        if rejected is not None:
+            return rejected
+        return await self._coalescer.add_good_to_order(order_id, good_id, amount)
+
+
+# Глобальный экземпляр коалесцера (включается переменной ADD_GOOD_COALESCING=true)
+add_good_coalescer = AddGoodCoalescer()
@@ -1,66 +1,129 @@
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timezone
 from decimal import Decimal
-from ...domain.models.order import Order, OrderedGood, Good
+from ...domain.models.order import (
+    Order,
+    OrderedGood,
+    OrderDetails,
+    OrderLine,
+    Good,
+    AddGoodResult,
+    AddGoodStatus,
+    AddGoodTicket,
+    TicketStatus
+)
 from ...domain.repositories.order_repository import OrderRepository
+from ..database import statements
 from ..database.connection import db_connection
+from ..cache.goods_cache import goods_cache
+from ..cache.id_filter import good_id_filter, order_id_filter
+from ..cache.idempotency_cache import idempotency_cache
+from ..cache.order_cache import order_cache
+from ..cache.top_goods_report import top_goods_report
+from ..monitoring import metrics
+from ..monitoring.metrics import observe_repository_method
 
 
 class OrderRepositoryImpl(OrderRepository):
     """Реализация репозитория для работы с заказами"""
     
+    @observe_repository_method
     async def get_order_by_id(self, order_id: int) -> Optional[Order]:
         """Получить заказ по ID"""
-        query = "SELECT id, client_id FROM Orders WHERE id = $1"
-        row = await db_connection.fetch_one("SELECT * FROM Clients")
+        if order_id_filter.absent(order_id):
+            return None
+        
+        query = statements.GET_ORDER_BY_ID
         row = await db_connection.fetch_one(query, order_id)
         
         if row:
-            return Order(id=row['id'], client_id=row['client_id'])
+            return Order.from_row(row)
         return None
     
+    @observe_repository_method
     async def get_ordered_goods_by_order_id(self, order_id: int) -> List[OrderedGood]:
         """Получить товары в заказе по ID заказа"""
-        query = """
-            SELECT order_id, good_id, amount 
-            FROM Ordered_goods 
-            WHERE order_id = $1
+        query = statements.GET_ORDERED_GOODS_BY_ORDER_ID
+        rows = await db_connection.execute_query(query, order_id)
+        
+        return [OrderedGood.from_row(row) for row in rows]
+    
+    @observe_repository_method
+    async def get_order_details(self, order_id: int) -> Optional[OrderDetails]:
+        """Получить заказ со строками и ценами товаров
+        
+        Результат get_order_by_id и get_ordered_goods_by_order_id вместе
+        с ценами одним запросом; повторные чтения обслуживаются из кэша
+        заказов до изменения строк заказа или товаров.
         """
+        if order_id_filter.absent(order_id):
+            return None
+        
+        details = order_cache.get(order_id)
+        if details:
+            return details
+        
+        query = statements.GET_ORDER_DETAILS
+        generation = order_cache.generation()
         rows = await db_connection.execute_query(query, order_id)
         
-        return [
-            OrderedGood(
-                order_id=row['order_id'],
-                good_id=row['good_id'],
-                amount=row['amount']
+        if rows:
+            first = rows[0]
+            details = OrderDetails(
+                order=Order.from_row(first),
+                version=first['version'],
+                lines=[
+                    OrderLine(
+                        good_id=row['good_id'],
+                        name=row['name'],
+                        amount=row['amount'],
+                        price=float(row['price'])
+                    )
+                    for row in rows
+                    if row['good_id'] is not None
+                ]
             )
-            for row in rows
-        ]
+            order_cache.put(details, generation)
+            return details
+        return None
     
+    @observe_repository_method
     async def get_good_by_id(self, good_id: int) -> Optional[Good]:
-        """Получить товар по ID"""
-        query = """
-            SELECT id, name, amount, price, catalogue_id 
-            FROM Goods 
-            WHERE id = $1
+        """Получить товар по ID
+        
+        Наименование, цена и категория берутся из кэша товаров; amount
+        товара из кэша может быть устаревшим, списание проверяет остаток в БД.
+        Каждый вызов получает собственный экземпляр Good.
         """
+        if good_id_filter.absent(good_id):
+            return None
+        
+        good = goods_cache.get(good_id)
+        if good:
+            return good
+        
+        query = statements.GET_GOOD_BY_ID
+        generation = goods_cache.generation()
         row = await db_connection.fetch_one(query, good_id)
         
         if row:
-            return Good(
-                id=row['id'],
-                name=row['name'],
-                amount=row['amount'],
-                price=float(row['price']),
-                catalogue_id=row['catalogue_id']
-            )
+            good = Good.from_row(row)
+            goods_cache.put(good, generation)
+            return good
         return None
     
+    @observe_repository_method
+    async def get_goods_by_catalogue_ids(self, catalogue_ids: List[int]) -> List[Good]:
+        """Получить товары, относящиеся к любой из категорий, одним запросом"""
+        query = statements.GET_GOODS_BY_CATALOGUE_IDS
+        rows = await db_connection.execute_query(query, catalogue_ids)
+        
+        return [Good.from_row(row) for row in rows]
+    
+    @observe_repository_method
     async def add_ordered_good(self, ordered_good: OrderedGood) -> bool:
         """Добавить товар в заказ"""
-        query = """
-            INSERT INTO Ordered_goods (order_id, good_id, amount)
-            VALUES ($1, $2, $3)
-        """
+        query = statements.INSERT_ORDERED_GOOD
         try:
             await db_connection.execute_command(
                 query, 
@@ -68,17 +131,15 @@ class OrderRepositoryImpl(OrderRepository):
                 ordered_good.good_id, 
                 ordered_good.amount
             )
+            order_cache.invalidate(ordered_good.order_id)
             return True
         except Exception:
             return False
     
+    @observe_repository_method
     async def update_ordered_good(self, ordered_good: OrderedGood) -> bool:
         """Обновить товар в заказе"""
-        query = """
-            UPDATE Ordered_goods 
-            SET amount = $3 
-            WHERE order_id = $1 AND good_id = $2
-        """
+        query = statements.UPDATE_ORDERED_GOOD
         try:
             result = await db_connection.execute_command(
                 query, 
@@ -86,32 +147,286 @@ class OrderRepositoryImpl(OrderRepository):
                 ordered_good.good_id, 
                 ordered_good.amount
             )
+            order_cache.invalidate(ordered_good.order_id)
             return "UPDATE 1" in result
         except Exception:
             return False
     
+    @observe_repository_method
     async def delete_ordered_good(self, order_id: int, good_id: int) -> bool:
         """Удалить товар из заказа"""
-        query = """
-            DELETE FROM Ordered_goods 
-            WHERE order_id = $1 AND good_id = $2
-        """
+        query = statements.DELETE_ORDERED_GOOD
         try:
             result = await db_connection.execute_command(query, order_id, good_id)
+            order_cache.invalidate(order_id)
             return "DELETE 1" in result
         except Exception:
             return False
     
+    @observe_repository_method
     async def update_good_amount(self, good_id: int, new_amount: int) -> bool:
         """Обновить количество товара на складе"""
-        query = """
-            UPDATE Goods 
-            SET amount = $2 
-            WHERE id = $1
-        """
+        query = statements.UPDATE_GOOD_AMOUNT
         try:
-            result = await db_connection.execute_command(query, good_id, new_amount)
-            return "UPDATE 1" in result
+            return bool(await db_connection.fetch_val(query, good_id, new_amount))
         except Exception:
             return False
     
+    @observe_repository_method
+    async def set_stock_shards(self, good_id: int, shards: int) -> bool:
+        """Переключить хранение остатка товара между Goods.amount и шардами
+        
+        shards > 0 распределяет остаток по указанному числу шардов,
+        shards = 0 собирает его обратно в Goods.amount.
+        """
+        query = statements.SET_STOCK_SHARDS
+        return bool(await db_connection.fetch_val(query, good_id, shards))
+    
+    @observe_repository_method
+    async def add_good_to_order(self, order_id: int, good_id: int, amount: int) -> AddGoodResult:
+        """Атомарно списать товар со склада и добавить его в заказ"""
+        rejected = self._rejected_by_id_filters(order_id, good_id)
+        if rejected is not None:
+            return rejected
+        
+        query = statements.ADD_GOOD_TO_ORDER
+        row = await db_connection.fetch_one(query, order_id, good_id, amount)
+        
+        if row['status'] == AddGoodStatus.OK.value:
+            goods_cache.update_amount(good_id, row['stock_left'])
+            order_cache.invalidate(order_id)
+            top_goods_report.mark_dirty()
+        elif row['status'] == AddGoodStatus.INSUFFICIENT_STOCK.value:
+            self._count_insufficient_stock(amount, row['stock_left'])
+        
+        return AddGoodResult(
+            status=AddGoodStatus(row['status']),
+            stock_left=row['stock_left'],
+            ordered_amount=row['ordered_amount']
+        )
+    
+    @observe_repository_method
+    async def add_good_to_order_once(self, key: str, order_id: int, good_id: int, amount: int) -> AddGoodResult:
+        """Добавить товар в заказ не более одного раза для ключа идемпотентности
+        
+        Повтор сначала ищется в кэше воркера, затем ключ захватывается в БД
+        в одной транзакции со списанием. Повтор с другими параметрами
+        запроса возвращает KEY_REUSED, ничего не меняя.
+        """
+        request = (order_id, good_id, amount)
+        cached = idempotency_cache.get(key)
+        if cached is not None:
+            metrics.IDEMPOTENT_REPLAYS.labels(source="memory").inc()
+            stored_request, result = cached
+            return self._replayed_result(result, stored_request == request)
+        
+        query = statements.ADD_GOOD_TO_ORDER_ONCE
+        row = await db_connection.fetch_one(query, key, order_id, good_id, amount, idempotency_cache.ttl_seconds)
+        
+        result = AddGoodResult(
+            status=AddGoodStatus(row['status']),
+            stock_left=row['stock_left'],
+            ordered_amount=row['ordered_amount']
+        )
+        if row['request_matches']:
+            idempotency_cache.put(key, request, result, row['expires_at'].timestamp())
+        
+        if row['replayed']:
+            metrics.IDEMPOTENT_REPLAYS.labels(source="database").inc()
+            return self._replayed_result(result, row['request_matches'])
+        
+        if result.status is AddGoodStatus.OK:
+            goods_cache.update_amount(good_id, result.stock_left)
+            order_cache.invalidate(order_id)
+            top_goods_report.mark_dirty()
+        elif result.status is AddGoodStatus.INSUFFICIENT_STOCK:
+            self._count_insufficient_stock(amount, result.stock_left)
+        return result
+    
+    @staticmethod
+    def _rejected_by_id_filters(order_id: int, good_id: int) -> Optional[AddGoodResult]:
+        """Результат для заведомо несуществующего заказа или товара без обращения к БД
+        
+        Проверки идут в том же порядке, что в add_ordered_good. Добавление
+        с ключом идемпотентности фильтр не использует: результат по ключу
+        сохраняется в БД.
+        """
+        if order_id_filter.absent(order_id):
+            return AddGoodResult(status=AddGoodStatus.ORDER_NOT_FOUND)
+        if good_id_filter.absent(good_id):
+            return AddGoodResult(status=AddGoodStatus.GOOD_NOT_FOUND)
+        return None
+    
+    @staticmethod
+    def _count_insufficient_stock(amount: int, stock_left: int) -> None:
+        """Учесть добавление, отклонённое из-за недостатка остатка, и его превышение"""
+        metrics.INSUFFICIENT_STOCK_REJECTIONS.inc()
+        metrics.OVERSELL_REJECTIONS.inc(amount - stock_left)
+    
+    @staticmethod
+    def _replayed_result(result: AddGoodResult, request_matches: bool) -> AddGoodResult:
+        if not request_matches:
+            return AddGoodResult(status=AddGoodStatus.KEY_REUSED, replayed=True)
+        return AddGoodResult(
+            status=result.status,
+            stock_left=result.stock_left,
+            ordered_amount=result.ordered_amount,
+            replayed=True
+        )
+    
+    @observe_repository_method
+    async def add_goods_to_orders(self, lines: List[OrderedGood], atomic: bool = True) -> List[AddGoodResult]:
+        """Добавить пакет товаров в заказы в одной транзакции
+        
+        Строки проверяются одним запросом, который блокирует затронутые товары,
+        затем остатки списываются и строки заказов добавляются пакетными
+        операторами через unnest. В режиме atomic при ошибке в любой строке
+        не применяется ни одна из них.
+        """
+        async with db_connection.unit_of_work():
+            rows = await db_connection.execute_query(
+                statements.VALIDATE_ORDER_LINES,
+                [line.order_id for line in lines],
+                [line.good_id for line in lines]
+            )
+            
+            # Остатки заблокированы до конца транзакции, поэтому проверка здесь авторитетна
+            stock = {row['good_id']: row['stock'] for row in rows if row['good_id'] is not None}
+            results: List[AddGoodResult] = []
+            for line, row in zip(lines, rows):
+                if not row['order_exists']:
+                    results.append(AddGoodResult(status=AddGoodStatus.ORDER_NOT_FOUND))
+                elif row['good_id'] is None:
+                    results.append(AddGoodResult(status=AddGoodStatus.GOOD_NOT_FOUND))
+                elif stock[line.good_id] < line.amount:
+                    self._count_insufficient_stock(line.amount, stock[line.good_id])
+                    results.append(AddGoodResult(
+                        status=AddGoodStatus.INSUFFICIENT_STOCK,
+                        stock_left=stock[line.good_id]
+                    ))
+                else:
+                    stock[line.good_id] -= line.amount
+                    results.append(AddGoodResult(
+                        status=AddGoodStatus.OK,
+                        stock_left=stock[line.good_id]
+                    ))
+            
+            applied = [(line, result) for line, result in zip(lines, results) if result.success]
+            if atomic and len(applied) < len(lines):
+                for result in results:
+                    if result.success:
+                        result.status = AddGoodStatus.NOT_APPLIED
+                        result.stock_left = None
+                return results
+            if not applied:
+                return results
+            
+            stock_deltas: Dict[int, int] = {}
+            line_deltas: Dict[Tuple[int, int], int] = {}
+            for line, _ in applied:
+                stock_deltas[line.good_id] = stock_deltas.get(line.good_id, 0) + line.amount
+                key = (line.order_id, line.good_id)
+                line_deltas[key] = line_deltas.get(key, 0) + line.amount
+            
+            # Сортировка задаёт единый порядок блокировок для конкурентных пакетов
+            goods_ids = sorted(stock_deltas)
+            await db_connection.execute_command(
+                statements.DECREMENT_GOODS_AMOUNT,
+                goods_ids,
+                [stock_deltas[good_id] for good_id in goods_ids]
+            )
+            keys = sorted(line_deltas)
+            upserted = await db_connection.execute_query(
+                statements.UPSERT_ORDERED_GOODS,
+                [order_id for order_id, _ in keys],
+                [good_id for _, good_id in keys],
+                [line_deltas[key] for key in keys]
+            )
+        
+        for good_id in goods_ids:
+            goods_cache.update_amount(good_id, stock[good_id])
+        for order_id in {order_id for order_id, _ in keys}:
+            order_cache.invalidate(order_id)
+        top_goods_report.mark_dirty(len(applied))
+        
+        # Количество в заказе после каждой строки: итог минус более поздние строки той же пары
+        ordered_amounts = {(row['order_id'], row['good_id']): row['amount'] for row in upserted}
+        for line, result in reversed(applied):
+            key = (line.order_id, line.good_id)
+            result.ordered_amount = ordered_amounts[key]
+            ordered_amounts[key] -= line.amount
+        
+        return results
+    
+    @observe_repository_method
+    async def apply_add_good_tickets(self, tickets: List[AddGoodTicket], ttl_seconds: float) -> None:
+        """Применить тикеты отложенного добавления одной транзакцией
+        
+        Тикеты сначала захватываются вставкой в Add_good_tickets, строки
+        новых тикетов применяются как пакет с частичным применением, и их
+        результаты сохраняются в той же транзакции. Тикеты, уже записанные
+        прошлой попыткой (COMMIT прошёл, но подтверждение потеряно),
+        не применяются повторно: их результат читается из таблицы.
+        Заполняет result, status и completed_at каждого тикета.
+        """
+        async with db_connection.unit_of_work():
+            claimed = await db_connection.execute_query(
+                statements.CLAIM_ADD_GOOD_TICKETS,
+                [ticket.id for ticket in tickets],
+                [ticket.line.order_id for ticket in tickets],
+                [ticket.line.good_id for ticket in tickets],
+                [ticket.line.amount for ticket in tickets],
+                [ticket.accepted_at for ticket in tickets],
+                ttl_seconds
+            )
+            claimed_ids = {str(row['id']) for row in claimed}
+            new_tickets = [ticket for ticket in tickets if ticket.id in claimed_ids]
+            if new_tickets:
+                results = await self.add_goods_to_orders([ticket.line for ticket in new_tickets], atomic=False)
+                await db_connection.execute_command(
+                    statements.SAVE_ADD_GOOD_TICKET_RESULTS,
+                    [ticket.id for ticket in new_tickets],
+                    [result.status.value for result in results],
+                    [result.stock_left for result in results],
+                    [result.ordered_amount for result in results]
+                )
+                for ticket, result in zip(new_tickets, results):
+                    ticket.result = result
+            
+            applied_before = [ticket.id for ticket in tickets if ticket.id not in claimed_ids]
+            if applied_before:
+                rows = await db_connection.execute_query(statements.GET_ADD_GOOD_TICKETS, applied_before)
+                stored = {str(row['id']): self._ticket_from_row(row) for row in rows}
+                for ticket in tickets:
+                    if ticket.id in stored:
+                        ticket.result = stored[ticket.id].result
+        
+        completed_at = datetime.now(timezone.utc)
+        for ticket in tickets:
+            ticket.status = TicketStatus.COMPLETED
+            ticket.completed_at = completed_at
+    
+    @observe_repository_method
+    async def get_add_good_ticket(self, ticket_id: str) -> Optional[AddGoodTicket]:
+        """Получить обработанный тикет отложенного добавления"""
+        query = statements.GET_ADD_GOOD_TICKETS
+        rows = await db_connection.execute_query(query, [ticket_id])
+        
+        if rows:
+            return self._ticket_from_row(rows[0])
+        return None
+    
+    @staticmethod
+    def _ticket_from_row(row) -> AddGoodTicket:
+        return AddGoodTicket(
+            id=str(row['id']),
+            line=OrderedGood.from_row(row),
+            accepted_at=row['accepted_at'],
+            status=TicketStatus.COMPLETED,
+            result=AddGoodResult(
+                status=AddGoodStatus(row['status']),
+                stock_left=row['stock_left'],
+                ordered_amount=row['ordered_amount']
+            ),
+            completed_at=row['completed_at']
+        )
@@ -0,0 +1,263 @@
+import asyncio
+import contextvars
+import math
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+from ...domain.models.order import OrderedGood, AddGoodTicket, TicketStatus
+from ..database import statements
+from ..database.connection import db_connection
+from ..monitoring import metrics
+from .order_repository_impl import OrderRepositoryImpl
+
+
+class AddGoodWriteBehind:
+    """Отложенное добавление товара в заказ пакетами
+    
+    Принятый запрос получает тикет и ставится в ограниченную очередь воркера;
+    фоновая задача выбирает из неё до max_batch тикетов и применяет их одной
+    транзакцией через add_goods_to_orders в режиме частичного применения,
+    записывая результат каждого тикета в Add_good_tickets. Строки пакета идут
+    в порядке приёма, поэтому остаток распределяется в том же порядке.
+    
+    При заполненной очереди новые тикеты не выдаются (обратное давление).
+    Ошибка БД откатывает пакет целиком, и он повторяется до max_attempts раз;
+    повтор не применяет тикеты, уже записанные прошлой попыткой. При остановке
+    приём прекращается, а очередь применяется до конца, но не дольше
+    stop_timeout секунд; если время вышло или фоновая задача завершилась
+    с ошибкой, неприменённые тикеты выводятся в лог.
+    
+    Ожидающие и недавно обработанные тикеты хранятся в памяти воркера,
+    обработанные - ещё и в БД до истечения ticket_ttl_seconds.
+    """
+    
+    def __init__(
+        self,
+        queue_size: Optional[int] = None,
+        max_batch: Optional[int] = None,
+        linger_ms: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        ticket_ttl_seconds: Optional[float] = None,
+        completed_cache_size: Optional[int] = None,
+        cleanup_interval: Optional[float] = None,
+        stop_timeout: Optional[float] = None,
+        retry_delay: float = 0.5,
+        cleanup_batch: int = 1000
+    ):
+        self.queue_size = queue_size if queue_size is not None else int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", "10000"))
+        self.max_batch = max_batch if max_batch is not None else int(os.getenv("WRITE_BEHIND_MAX_BATCH", "500"))
+        self.linger_ms = linger_ms if linger_ms is not None else float(os.getenv("WRITE_BEHIND_LINGER_MS", "20"))
+        self.max_attempts = max_attempts if max_attempts is not None else int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", "3"))
+        self.ticket_ttl_seconds = ticket_ttl_seconds if ticket_ttl_seconds is not None else float(
+            os.getenv("WRITE_BEHIND_TICKET_TTL_SECONDS", "86400")
+        )
+        self.completed_cache_size = completed_cache_size if completed_cache_size is not None else int(
+            os.getenv("WRITE_BEHIND_COMPLETED_CACHE_SIZE", "10000")
+        )
+        self.cleanup_interval = cleanup_interval if cleanup_interval is not None else float(
+            os.getenv("WRITE_BEHIND_CLEANUP_INTERVAL_SECONDS", "300")
+        )
+        # Меньше GRACEFUL_TIMEOUT_SECONDS serve.py, чтобы лог успел записаться до SIGKILL
+        self.stop_timeout = stop_timeout if stop_timeout is not None else float(
+            os.getenv("WRITE_BEHIND_STOP_TIMEOUT_SECONDS", "25")
+        )
+        self.retry_delay = retry_delay
+        self.cleanup_batch = cleanup_batch
+        self.accepted = 0
+        self.rejected = 0
+        self.batches = 0
+        self.completed = 0
+        self.failed = 0
+        self.expired_deleted = 0
+        # Скользящее среднее длительности пакета для оценки Retry-After
+        self._batch_seconds = 0.0
+        self._repository = OrderRepositoryImpl()
+        self._queue: Optional[asyncio.Queue] = None
+        self._accepting = False
+        self._pending: Dict[str, AddGoodTicket] = {}
+        self._completed: "OrderedDict[str, AddGoodTicket]" = OrderedDict()
+        self._tasks: Set[asyncio.Task] = set()
+        self._drain_task: Optional[asyncio.Task] = None
+    
+    @property
+    def enabled(self) -> bool:
+        return self.queue_size > 0
+    
+    def submit(self, order_id: int, good_id: int, amount: int) -> Optional[AddGoodTicket]:
+        """Выдать тикет и поставить строку в очередь
+        
+        Возвращает None, если очередь заполнена или приём остановлен.
+        """
+        if not self._accepting or self._queue.full():
+            self.rejected += 1
+            metrics.WRITE_BEHIND_REJECTIONS.inc()
+            return None
+        
+        ticket = AddGoodTicket(
+            id=str(uuid.uuid4()),
+            line=OrderedGood(order_id=order_id, good_id=good_id, amount=amount),
+            accepted_at=datetime.now(timezone.utc)
+        )
+        self._queue.put_nowait(ticket)
+        self._pending[ticket.id] = ticket
+        self.accepted += 1
+        metrics.WRITE_BEHIND_QUEUE_DEPTH.set(self._queue.qsize())
+        return ticket
+    
+    def get(self, ticket_id: str) -> Optional[AddGoodTicket]:
+        """Тикет из памяти воркера: ожидающий или недавно обработанный"""
+        ticket = self._pending.get(ticket_id)
+        if ticket is None:
+            ticket = self._completed.get(ticket_id)
+        return ticket
+    
+    def retry_after(self) -> int:
+        """Оценка, через сколько секунд в очереди освободится место"""
+        if self._queue is None or not self._accepting:
+            return 1
+        batches_ahead = self._queue.qsize() / max(self.max_batch, 1)
+        return max(1, math.ceil(batches_ahead * self._batch_seconds))
+    
+    def stats(self) -> dict:
+        """Счётчики очереди"""
+        return {
+            "enabled": self.enabled,
+            "queue_size": self.queue_size,
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "pending": len(self._pending),
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "completed": self.completed,
+            "failed": self.failed,
+            "expired_deleted": self.expired_deleted
+        }
+    
+    async def delete_expired(self) -> int:
+        """Удалить истёкшие тикеты из БД пакетами по cleanup_batch"""
+        deleted = 0
+        while True:
+            result = await db_connection.execute_command(
+                statements.DELETE_EXPIRED_ADD_GOOD_TICKETS, self.cleanup_batch
+            )
+            count = int(result.split()[-1])
+            deleted += count
+            if count < self.cleanup_batch:
+                break
+        self.expired_deleted += deleted
+        return deleted
+    
+    async def start(self) -> None:
+        """Начать приём тикетов и запустить фоновые задачи"""
+        if not self.enabled or self._queue is not None:
+            return
+        self._queue = asyncio.Queue(self.queue_size)
+        self._accepting = True
+        # Пакеты применяются вне единицы работы вызвавшего кода
+        self._drain_task = self._spawn(self._drain_forever())
+        if self.cleanup_interval > 0:
+            self._spawn(self._cleanup_forever())
+    
+    async def stop(self) -> None:
+        """Прекратить приём тикетов и применить очередь (не дольше stop_timeout)"""
+        if self._queue is None:
+            return
+        self._accepting = False
+        # Ожидание очереди прерывается, если фоновая задача завершилась: иначе
+        # join() ждал бы тикеты, которые уже некому применить
+        joined = asyncio.ensure_future(self._queue.join())
+        await asyncio.wait(
+            {joined, self._drain_task},
+            timeout=self.stop_timeout if self.stop_timeout > 0 else None,
+            return_when=asyncio.FIRST_COMPLETED
+        )
+        joined.cancel()
+        if self._pending:
+            self._log_unapplied()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._queue = None
+        self._drain_task = None
+    
+    def _log_unapplied(self) -> None:
+        if self._drain_task.done():
+            error = None if self._drain_task.cancelled() else self._drain_task.exception()
+            reason = f"drain task exited: {error!r}"
+        else:
+            reason = f"stop timeout of {self.stop_timeout:g} s exceeded"
+        print(
+            f"Write-behind stopped with {len(self._pending)} unapplied tickets ({reason}): "
+            f"{', '.join(self._pending)}"
+        )
+    
+    def _spawn(self, coroutine) -> asyncio.Task:
+        task = asyncio.create_task(coroutine, context=contextvars.Context())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+    
+    async def _drain_forever(self) -> None:
+        while True:
+            first = await self._queue.get()
+            # Короткое ожидание набирает пакет при редком потоке запросов
+            if self._accepting and self.linger_ms > 0 and self._queue.qsize() < self.max_batch - 1:
+                await asyncio.sleep(self.linger_ms / 1000)
+            batch = [first]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            metrics.WRITE_BEHIND_QUEUE_DEPTH.set(self._queue.qsize())
+            try:
+                await self._apply(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+    
+    async def _apply(self, batch: List[AddGoodTicket]) -> None:
+        started = time.perf_counter()
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await self._repository.apply_add_good_tickets(batch, self.ticket_ttl_seconds)
+                self.completed += len(batch)
+                break
+            except Exception as e:
+                if attempt >= self.max_attempts:
+                    print(f"Write-behind batch of {len(batch)} tickets failed: {e}")
+                    completed_at = datetime.now(timezone.utc)
+                    for ticket in batch:
+                        ticket.status = TicketStatus.FAILED
+                        ticket.error = str(e)
+                        ticket.completed_at = completed_at
+                    self.failed += len(batch)
+                    metrics.WRITE_BEHIND_FAILED_TICKETS.inc(len(batch))
+                    break
+                await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+        
+        elapsed = time.perf_counter() - started
+        self._batch_seconds = elapsed if not self.batches else 0.8 * self._batch_seconds + 0.2 * elapsed
+        self.batches += 1
+        metrics.WRITE_BEHIND_BATCH_SIZE.observe(len(batch))
+        
+        for ticket in batch:
+            self._pending.pop(ticket.id, None)
+            if self.completed_cache_size > 0:
+                self._completed[ticket.id] = ticket
+        while len(self._completed) > self.completed_cache_size:
+            self._completed.popitem(last=False)
+    
+    async def _cleanup_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.cleanup_interval)
+            try:
+                await self.delete_expired()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Add-good tickets cleanup error: {e}")
+
+
+# Глобальный экземпляр отложенного добавления (WRITE_BEHIND_QUEUE_SIZE=0 отключает режим)
+add_good_write_behind = AddGoodWriteBehind()
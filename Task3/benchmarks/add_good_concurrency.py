@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Конкурентный тест добавления товара в заказ.
+
+Сравнивает прежний многошаговый путь (чтение остатка -> запись нового значения)
+с атомарным вызовом add_ordered_good. Проверяет, что остаток не уходит в минус
+и что списано ровно столько, сколько подтверждено успешных добавлений.
+
+Запуск из директории Task3 (БД инициализирована через init.sql):
+    python -m benchmarks.add_good_concurrency --good-id 5 --stock 50 --requests 500
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+
+from app.domain.models.order import OrderedGood
+from app.infrastructure.database.connection import db_connection
+from app.infrastructure.repositories.order_repository_impl import OrderRepositoryImpl
+
+
+async def legacy_add_good(repository: OrderRepositoryImpl, order_id: int, good_id: int, amount: int) -> bool:
+    """Прежняя последовательность шагов OrderService.add_ordered_good"""
+    if not await repository.get_order_by_id(order_id):
+        return False
+    good = await repository.get_good_by_id(good_id)
+    if not good or good.amount < amount:
+        return False
+    existing = await repository.get_ordered_goods_by_order_id(order_id)
+    existing_good = next((og for og in existing if og.good_id == good_id), None)
+    if not await repository.update_good_amount(good_id, good.amount - amount):
+        return False
+    if existing_good:
+        return await repository.update_ordered_good(
+            OrderedGood(order_id=order_id, good_id=good_id, amount=existing_good.amount + amount)
+        )
+    return await repository.add_ordered_good(OrderedGood(order_id=order_id, good_id=good_id, amount=amount))
+
+
+async def atomic_add_good(repository: OrderRepositoryImpl, order_id: int, good_id: int, amount: int) -> bool:
+    result = await repository.add_good_to_order(order_id, good_id, amount)
+    return result.success
+
+
+async def run_mode(name, add_good, args, order_ids) -> bool:
+    repository = OrderRepositoryImpl()
+    await repository.update_good_amount(args.good_id, args.stock)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    successes = 0
+
+    async def one_call():
+        nonlocal successes
+        async with semaphore:
+            started = time.perf_counter()
+            if await add_good(repository, random.choice(order_ids), args.good_id, args.amount):
+                successes += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_call() for _ in range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    final_stock = (await repository.get_good_by_id(args.good_id)).amount
+    oversold = successes * args.amount - (args.stock - final_stock)
+    percentiles = statistics.quantiles(latencies, n=100)
+    print(f"[{name}] успешно: {successes}, остаток: {final_stock}, перепродано: {oversold}")
+    print(f"[{name}] p50: {percentiles[49]:.2f} мс, p99: {percentiles[98]:.2f} мс, "
+          f"RPS: {args.requests / elapsed:.0f}")
+    return final_stock >= 0 and oversold == 0
+
+
+async def main(args) -> int:
+    await db_connection.create_pool()
+    try:
+        order_ids = [row['id'] for row in await db_connection.execute_query("SELECT id FROM Orders")]
+        original_stock = (await OrderRepositoryImpl().get_good_by_id(args.good_id)).amount
+        snapshot = await db_connection.execute_query(
+            "SELECT order_id, good_id, amount FROM Ordered_goods WHERE good_id = $1", args.good_id
+        )
+        try:
+            legacy_ok = await run_mode("legacy", legacy_add_good, args, order_ids)
+            atomic_ok = await run_mode("atomic", atomic_add_good, args, order_ids)
+        finally:
+            # Возвращаем исходные данные товара
+            await db_connection.execute_command("DELETE FROM Ordered_goods WHERE good_id = $1", args.good_id)
+            async with db_connection.get_connection() as conn:
+                await conn.executemany(
+                    "INSERT INTO Ordered_goods (order_id, good_id, amount) VALUES ($1, $2, $3)",
+                    [tuple(row) for row in snapshot]
+                )
+            await OrderRepositoryImpl().update_good_amount(args.good_id, original_stock)
+    finally:
+        await db_connection.close_pool()
+
+    if not legacy_ok:
+        print("Прежний путь нарушил инвариант остатка (ожидаемо при конкурентной нагрузке)")
+    if not atomic_ok:
+        print("ОШИБКА: атомарный путь нарушил инвариант остатка")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--good-id", type=int, default=5)
+    parser.add_argument("--stock", type=int, default=50)
+    parser.add_argument("--amount", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарк и проверка дерева каталога в памяти (CatalogueTree).
+
+Замеряет построение дерева из строк Catalogue, подъём к корню и выбор
+поддерева на синтетическом каталоге, а затем проверяет каталоги с циклом
+в путях ('3.1' у категории 1 и '1.3' у 3): дерево должно разорвать цикл,
+а root() и descendants() - завершиться. Дерево обходится синхронно в цикле
+событий, поэтому зацикливание остановило бы воркер целиком. Если проверка
+не прошла или не завершилась за --timeout секунд, скрипт завершается с
+кодом 1.
+
+БД и сеть не нужны. Запуск из директории Task3:
+    python -m benchmarks.catalogue_tree --categories 10000
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from app.domain.models.catalogue import CatalogueTree
+
+
+def synthetic_rows(categories: int, fanout: int, seed: int) -> List[Tuple[int, str, Optional[str]]]:
+    """Каталог из categories узлов: у каждого узла до fanout детей, метки пути - ID"""
+    rng = random.Random(seed)
+    rows = [(1, "Категория 1", "1")]
+    paths = {1: "1"}
+    open_parents = [1]
+    children = {1: 0}
+    for category_id in range(2, categories + 1):
+        parent_id = rng.choice(open_parents)
+        children[parent_id] += 1
+        if children[parent_id] >= fanout:
+            open_parents.remove(parent_id)
+        paths[category_id] = f"{paths[parent_id]}.{category_id}"
+        children[category_id] = 0
+        open_parents.append(category_id)
+        rows.append((category_id, f"Категория {category_id}", paths[category_id]))
+    rng.shuffle(rows)
+    return rows
+
+
+def measure(label: str, operation, iterations: int) -> None:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        operation()
+    elapsed = time.perf_counter() - started
+    print(f"{label}: {elapsed / iterations * 1_000_000:.1f} мкс")
+
+
+# Строки каталога с циклом и ожидаемые корни после его разрыва
+CYCLE_CASES = [
+    ("цикл из двух категорий", [(1, "a", "3.1"), (3, "b", "1.3")]),
+    ("цикл из трёх категорий с хвостом", [
+        (1, "a", "1"), (2, "b", "1.2"), (4, "c", "6.4"), (5, "d", "4.5"), (6, "e", "5.6"), (7, "f", "6.7")
+    ]),
+]
+
+
+def check_cycles() -> List[str]:
+    """Проверить каталоги с циклами; вернуть описания ошибок"""
+    errors = []
+    for name, rows in CYCLE_CASES:
+        tree = CatalogueTree(rows)
+        for category_id, _, _ in rows:
+            root = tree.root(category_id)
+            if root.parent_id is not None:
+                errors.append(f"{name}: root({category_id}) вернул категорию {root.id} с родителем")
+            subtree = tree.subtree_ids(root.id)
+            if category_id not in subtree or len(subtree) != len(set(subtree)):
+                errors.append(f"{name}: поддерево {root.id} = {subtree} не содержит {category_id} ровно один раз")
+        reachable = sum(len(tree.subtree_ids(root.id)) for root in tree.roots())
+        if reachable != len(rows):
+            errors.append(f"{name}: из корней достижимо {reachable} категорий из {len(rows)}")
+    return errors
+
+
+def main(args) -> int:
+    rows = synthetic_rows(args.categories, args.fanout, args.seed)
+    tree = CatalogueTree(rows)
+    depth = max(category.depth for category in tree.roots() for category in tree.descendants(category.id))
+    print(f"Каталог: {len(tree)} категорий, глубина {depth}")
+    ids = [category_id for category_id, _, _ in rows]
+    rng = random.Random(args.seed)
+    measure("Построение дерева", lambda: CatalogueTree(rows), max(1, args.iterations // 1000))
+    measure("root()", lambda: tree.root(rng.choice(ids)), args.iterations)
+    measure("descendants() корня", lambda: tree.descendants(1), max(1, args.iterations // 1000))
+
+    # Зациклившийся обход нельзя прервать из Python, поэтому проверка идёт
+    # в отдельном потоке, а главный ждёт её не дольше --timeout
+    errors: List[str] = []
+    checker = threading.Thread(target=lambda: errors.extend(check_cycles()), daemon=True)
+    checker.start()
+    checker.join(args.timeout)
+    if checker.is_alive():
+        print(f"ОШИБКА: обход каталога с циклом не завершился за {args.timeout} с", file=sys.stderr, flush=True)
+        os._exit(1)
+    for error in errors:
+        print(f"ОШИБКА: {error}", file=sys.stderr)
+    if not errors:
+        print("Каталоги с циклами: циклы разорваны, обходы завершаются")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--categories", type=int, default=10000)
+    parser.add_argument("--fanout", type=int, default=8, help="максимум детей у категории")
+    parser.add_argument("--iterations", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=5.0, help="секунд на проверку каталогов с циклами")
+    sys.exit(main(parser.parse_args()))
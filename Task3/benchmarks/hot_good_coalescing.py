@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк добавления одного "горячего" товара с объединением запросов и без него.
+
+Все запросы списывают один и тот же товар, поэтому без объединения они
+выстраиваются в очередь на блокировку одной строки Goods. С объединением
+конкурентные запросы применяются пакетами через add_goods_to_orders.
+
+Запуск из директории Task3 (БД инициализирована через init.sql):
+    python -m benchmarks.hot_good_coalescing --requests 5000 --concurrency 200
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+
+from app.infrastructure.database.connection import db_connection
+from app.infrastructure.repositories.order_repository_impl import OrderRepositoryImpl
+from app.infrastructure.repositories.coalescing_order_repository import (
+    AddGoodCoalescer,
+    CoalescingOrderRepository
+)
+
+
+async def run_mode(name, repository, args, order_ids) -> bool:
+    await OrderRepositoryImpl().update_good_amount(args.good_id, args.stock)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    successes = 0
+
+    async def one_call():
+        nonlocal successes
+        async with semaphore:
+            started = time.perf_counter()
+            result = await repository.add_good_to_order(random.choice(order_ids), args.good_id, 1)
+            latencies.append((time.perf_counter() - started) * 1000)
+            successes += result.success
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_call() for _ in range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    final_stock = (await OrderRepositoryImpl().get_good_by_id(args.good_id)).amount
+    percentiles = statistics.quantiles(latencies, n=100)
+    print(f"[{name}] RPS: {args.requests / elapsed:.0f}, p50: {percentiles[49]:.2f} мс, "
+          f"p99: {percentiles[98]:.2f} мс, успешно: {successes}, остаток: {final_stock}")
+    return final_stock >= 0 and args.stock - final_stock == successes
+
+
+async def main(args) -> int:
+    await db_connection.create_pool()
+    try:
+        order_ids = [row['id'] for row in await db_connection.execute_query("SELECT id FROM Orders")]
+        original_stock = (await OrderRepositoryImpl().get_good_by_id(args.good_id)).amount
+        snapshot = await db_connection.execute_query(
+            "SELECT order_id, good_id, amount FROM Ordered_goods WHERE good_id = $1", args.good_id
+        )
+        coalescer = AddGoodCoalescer(window_ms=args.window_ms, max_batch=args.max_batch)
+        try:
+            plain_ok = await run_mode("без объединения", OrderRepositoryImpl(), args, order_ids)
+            coalesced_ok = await run_mode(
+                f"окно {args.window_ms} мс, пакет до {args.max_batch}",
+                CoalescingOrderRepository(coalescer), args, order_ids
+            )
+        finally:
+            await coalescer.drain()
+            # Возвращаем исходные данные товара
+            await db_connection.execute_command("DELETE FROM Ordered_goods WHERE good_id = $1", args.good_id)
+            async with db_connection.get_connection() as conn:
+                await conn.executemany(
+                    "INSERT INTO Ordered_goods (order_id, good_id, amount) VALUES ($1, $2, $3)",
+                    [tuple(row) for row in snapshot]
+                )
+            await OrderRepositoryImpl().update_good_amount(args.good_id, original_stock)
+    finally:
+        await db_connection.close_pool()
+
+    if not (plain_ok and coalesced_ok):
+        print("ОШИБКА: нарушен инвариант остатка")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--good-id", type=int, default=5)
+    parser.add_argument("--stock", type=int, default=1000000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--window-ms", type=float, default=2)
+    parser.add_argument("--max-batch", type=int, default=100)
+    sys.exit(asyncio.run(main(parser.parse_args())))
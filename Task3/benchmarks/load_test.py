@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест HTTP API с отчётом в формате JSON.
+
+Сценарии:
+- uniform_add_good - добавление случайного товара в случайный заказ;
+- hot_good         - все запросы списывают один и тот же товар;
+- large_cart       - пакетное добавление большой корзины через /orders/add-goods;
+- not_found_mix    - преобладают запросы к несуществующим заказам и товарам;
+- health_storm     - поток запросов к /health;
+- slow_db          - uniform_add_good, пока отдельное соединение периодически
+                     блокирует все товары на --slow-db-hold-ms (замедленная БД);
+- sharded_mix      - одиночные и пакетные добавления одного товара, остаток
+                     которого разделён на --stock-shards шардов; любая ошибка
+                     (например, взаимная блокировка) - код возврата 1.
+
+Нагрузка задаётся числом одновременных запросов (--concurrency) или целевым
+RPS (--rps, открытая модель: задержка считается от запланированного момента
+отправки). Перед каждым изменяющим сценарием остаток всех товаров
+устанавливается в --stock, после сценария исходные данные восстанавливаются.
+Согласованность остатка проверяется напрямую в БД: списано ровно столько,
+сколько подтверждено успешными ответами, и ни один остаток не ушёл в минус.
+
+Отчёт (p50/p95/p99, пропускная способность, доли ошибок, отказов и
+сброшенных ограничением запросов (503), согласованность остатка) выводится
+в stdout или в файл --output, чтобы сравнивать прогоны между релизами.
+
+Запуск из директории Task3 (переменные DB_* те же, что у приложения):
+    python -m benchmarks.load_test --start-app --reset-db --output run.json
+    python -m benchmarks.load_test --base-url http://localhost:8000 --scenario hot_good --rps 500
+    ADMISSION_MAX_CONCURRENCY=20 python -m benchmarks.load_test --start-app --scenario slow_db \
+        --rps 80 --concurrency 1000 --slow-db-hold-ms 900 --slow-db-period-ms 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.infrastructure.database.connection import db_connection
+
+
+TASK_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_INIT_SQL = TASK_DIR.parent / "init.sql"
+
+# Несуществующие ID для сценария not_found_mix
+MISSING_ID_OFFSET = 1_000_000
+
+
+class Scenario:
+    """Сценарий нагрузки: генератор запросов и учёт подтверждённых списаний"""
+
+    def __init__(
+        self,
+        name: str,
+        mutating: bool,
+        make_request: Callable[[random.Random], Tuple[str, str, Optional[dict]]],
+        slow_db: bool = False,
+        sharded_good_id: Optional[int] = None,
+        fail_on_errors: bool = False
+    ):
+        self.name = name
+        self.mutating = mutating
+        self.make_request = make_request
+        self.slow_db = slow_db
+        # Товар, остаток которого на время сценария делится на --stock-shards шардов
+        self.sharded_good_id = sharded_good_id
+        self.fail_on_errors = fail_on_errors
+
+
+def confirmed_amounts(path: str, payload: Optional[dict], status_code: int, body: Optional[dict]) -> Dict[int, int]:
+    """Списания по товарам, подтверждённые ответом API"""
+    confirmed: Dict[int, int] = defaultdict(int)
+    if path == "/orders/add-good" and 200 <= status_code < 300:
+        confirmed[payload["good_id"]] += payload["amount"]
+    elif path == "/orders/add-goods" and body and body.get("results"):
+        for line in body["results"]:
+            if line.get("success"):
+                confirmed[line["good_id"]] += line["amount"]
+    return confirmed
+
+
+def build_scenarios(args, order_ids: List[int], good_ids: List[int]) -> Dict[str, Scenario]:
+    missing_order_id = max(order_ids) + MISSING_ID_OFFSET
+    missing_good_id = max(good_ids) + MISSING_ID_OFFSET
+    hot_good_id = args.hot_good_id or good_ids[0]
+    other_good_ids = [good_id for good_id in good_ids if good_id != hot_good_id]
+
+    def uniform_add_good(rng):
+        return "POST", "/orders/add-good", {
+            "order_id": rng.choice(order_ids), "good_id": rng.choice(good_ids), "amount": args.amount
+        }
+
+    def hot_good(rng):
+        return "POST", "/orders/add-good", {
+            "order_id": rng.choice(order_ids), "good_id": hot_good_id, "amount": args.amount
+        }
+
+    def large_cart(rng):
+        order_id = rng.choice(order_ids)
+        return "POST", "/orders/add-goods", {
+            "lines": [
+                {"order_id": order_id, "good_id": good_id, "amount": args.amount}
+                for good_id in rng.choices(good_ids, k=args.cart_size)
+            ],
+            "atomic": args.atomic_carts
+        }
+
+    def not_found_mix(rng):
+        order_id = rng.choice(order_ids)
+        good_id = rng.choice(good_ids)
+        if rng.random() < args.not_found_ratio:
+            if rng.random() < 0.5:
+                order_id = missing_order_id
+            else:
+                good_id = missing_good_id
+        return "POST", "/orders/add-good", {"order_id": order_id, "good_id": good_id, "amount": args.amount}
+
+    def health_storm(rng):
+        return "GET", "/health", None
+
+    def sharded_mix(rng):
+        order_id = rng.choice(order_ids)
+        if rng.random() < 0.5:
+            return "POST", "/orders/add-good", {"order_id": order_id, "good_id": hot_good_id, "amount": args.amount}
+        # Пакет блокирует товары, а затем шарды: тот же порядок, что у одиночного списания
+        others = rng.sample(other_good_ids, k=min(2, len(other_good_ids)))
+        return "POST", "/orders/add-goods", {
+            "lines": [
+                {"order_id": order_id, "good_id": good_id, "amount": args.amount}
+                for good_id in [hot_good_id, *others]
+            ],
+            "atomic": True
+        }
+
+    return {
+        "uniform_add_good": Scenario("uniform_add_good", True, uniform_add_good),
+        "hot_good": Scenario("hot_good", True, hot_good),
+        "large_cart": Scenario("large_cart", True, large_cart),
+        "not_found_mix": Scenario("not_found_mix", True, not_found_mix),
+        "health_storm": Scenario("health_storm", False, health_storm),
+        "slow_db": Scenario("slow_db", True, uniform_add_good, slow_db=True),
+        "sharded_mix": Scenario("sharded_mix", True, sharded_mix, sharded_good_id=hot_good_id, fail_on_errors=True),
+    }
+
+
+def percentile_summary(latencies: List[float]) -> dict:
+    if not latencies:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    if len(latencies) == 1:
+        value = round(latencies[0], 3)
+        return {"p50": value, "p95": value, "p99": value, "mean": value, "max": value}
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "p50": round(cuts[49], 3),
+        "p95": round(cuts[94], 3),
+        "p99": round(cuts[98], 3),
+        "mean": round(statistics.mean(latencies), 3),
+        "max": round(max(latencies), 3),
+    }
+
+
+async def drive(client: httpx.AsyncClient, scenario: Scenario, args, rng: random.Random) -> dict:
+    """Выполнить --requests запросов сценария и собрать сырые результаты"""
+    requests_plan = [scenario.make_request(rng) for _ in range(args.requests)]
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    confirmed: Dict[int, int] = defaultdict(int)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one_call(request, scheduled_at: Optional[float] = None):
+        method, path, payload = request
+        async with semaphore:
+            if scheduled_at is None:
+                scheduled_at = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=payload)
+                status = str(response.status_code)
+                body = None
+                if scenario.mutating:
+                    try:
+                        body = response.json()
+                    except ValueError:
+                        pass
+                for good_id, amount in confirmed_amounts(path, payload, response.status_code, body).items():
+                    confirmed[good_id] += amount
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            # В открытой модели задержка включает ожидание в очереди клиента
+            latencies.append((time.perf_counter() - scheduled_at) * 1000)
+        statuses[status] += 1
+
+    started = time.perf_counter()
+    if args.rps:
+        tasks = []
+        for index, request in enumerate(requests_plan):
+            scheduled_at = started + index / args.rps
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(one_call(request, scheduled_at)))
+        await asyncio.gather(*tasks)
+    else:
+        await asyncio.gather(*(one_call(request) for request in requests_plan))
+    elapsed = time.perf_counter() - started
+
+    return {"latencies": latencies, "statuses": statuses, "confirmed": confirmed, "elapsed": elapsed}
+
+
+async def slow_down_database(args, stop: asyncio.Event) -> None:
+    """Держать блокировку всех товаров --slow-db-hold-ms из каждых --slow-db-period-ms
+
+    Списания ждут блокировку, поэтому запросы добавления товара выполняются
+    дольше, а пул соединений приложения заполняется, как при медленной БД.
+    """
+    conn = await db_connection.create_connection()
+    try:
+        while not stop.is_set():
+            async with conn.transaction():
+                await conn.execute("SELECT id FROM Goods ORDER BY id FOR UPDATE")
+                await asyncio.sleep(args.slow_db_hold_ms / 1000)
+            await asyncio.sleep(max(args.slow_db_period_ms - args.slow_db_hold_ms, 0) / 1000)
+    finally:
+        await conn.close()
+
+
+async def snapshot_data(conn) -> dict:
+    goods = await conn.fetch("SELECT id, amount FROM Goods_stock ORDER BY id")
+    ordered = await conn.fetch("SELECT order_id, good_id, amount FROM Ordered_goods")
+    return {"goods": [tuple(row) for row in goods], "ordered": [tuple(row) for row in ordered]}
+
+
+async def restore_data(conn, snapshot: dict) -> None:
+    async with conn.transaction():
+        await conn.execute("DELETE FROM Ordered_goods")
+        await conn.copy_records_to_table(
+            "ordered_goods", records=snapshot["ordered"], columns=["order_id", "good_id", "amount"]
+        )
+        await conn.execute(
+            "SELECT set_good_stock(s.id, s.amount) FROM unnest($1::int[], $2::int[]) AS s(id, amount) ORDER BY s.id",
+            [good_id for good_id, _ in snapshot["goods"]],
+            [amount for _, amount in snapshot["goods"]]
+        )
+
+
+async def stock_state(conn) -> Dict[int, Tuple[int, int]]:
+    """Остаток и суммарное заказанное количество по каждому товару"""
+    rows = await conn.fetch("""
+        SELECT g.id, g.amount, COALESCE(SUM(og.amount), 0) AS ordered
+        FROM Goods_stock g
+        LEFT JOIN Ordered_goods og ON og.good_id = g.id
+        GROUP BY g.id, g.amount
+    """)
+    return {row['id']: (row['amount'], row['ordered']) for row in rows}
+
+
+def stock_report(before: Dict[int, Tuple[int, int]], after: Dict[int, Tuple[int, int]], confirmed: Dict[int, int]) -> dict:
+    mismatched = []
+    for good_id, (stock_before, ordered_before) in before.items():
+        stock_after, ordered_after = after[good_id]
+        decremented = stock_before - stock_after
+        ordered_delta = ordered_after - ordered_before
+        if not decremented == ordered_delta == confirmed.get(good_id, 0):
+            mismatched.append({
+                "good_id": good_id,
+                "decremented": decremented,
+                "ordered_delta": ordered_delta,
+                "confirmed": confirmed.get(good_id, 0),
+            })
+    negative = [good_id for good_id, (stock, _) in after.items() if stock < 0]
+    return {
+        "consistent": not mismatched and not negative,
+        "confirmed_total": sum(confirmed.values()),
+        "decremented_total": sum(before[g][0] - after[g][0] for g in before),
+        "mismatched_goods": mismatched,
+        "negative_stock_goods": negative,
+    }
+
+
+def scenario_report(raw: dict) -> dict:
+    total = sum(raw["statuses"].values())
+    # 503 - запрос сброшен ограничением одновременных запросов и не выполнялся
+    shed = raw["statuses"].get("503", 0)
+    errors = sum(
+        count for status, count in raw["statuses"].items()
+        if not status.isdigit() or (status.startswith("5") and status != "503")
+    )
+    rejected = sum(count for status, count in raw["statuses"].items() if status.startswith("4"))
+    return {
+        "requests": total,
+        "duration_s": round(raw["elapsed"], 3),
+        "throughput_rps": round(total / raw["elapsed"], 1) if raw["elapsed"] else None,
+        "latency_ms": percentile_summary(raw["latencies"]),
+        "status_counts": dict(sorted(raw["statuses"].items())),
+        "error_rate": round(errors / total, 4) if total else None,
+        "rejection_rate": round(rejected / total, 4) if total else None,
+        "shed_rate": round(shed / total, 4) if total else None,
+    }
+
+
+async def reset_database(init_sql: Path) -> None:
+    """Пересоздать схему public и заполнить её из init.sql"""
+    conn = await db_connection.create_connection()
+    try:
+        await conn.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public;")
+        await conn.execute(init_sql.read_text(encoding="utf-8"))
+    finally:
+        await conn.close()
+
+
+def start_app(args) -> subprocess.Popen:
+    command = [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--host", "127.0.0.1", "--port", str(args.port),
+        "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"
+    ]
+    return subprocess.Popen(command, cwd=TASK_DIR)
+
+
+async def wait_for_app(client: httpx.AsyncClient, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            response = await client.get("/health")
+            if response.status_code == 200 and response.json().get("status") == "healthy":
+                return
+        except httpx.HTTPError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"API не ответило на /health за {timeout:.0f} с")
+        await asyncio.sleep(0.2)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=TASK_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> dict:
+    if args.reset_db:
+        await reset_database(args.init_sql)
+
+    app_process = start_app(args) if args.start_app else None
+    base_url = f"http://127.0.0.1:{args.port}" if args.start_app else args.base_url
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    conn = await db_connection.create_connection()
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "base_url": base_url,
+            "parameters": {
+                key: str(value) if isinstance(value, Path) else value
+                for key, value in vars(args).items()
+            },
+        },
+        "scenarios": {},
+    }
+    try:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+            await wait_for_app(client, args.startup_timeout)
+            order_ids = [row['id'] for row in await conn.fetch("SELECT id FROM Orders ORDER BY id")]
+            good_ids = [row['id'] for row in await conn.fetch("SELECT id FROM Goods ORDER BY id")]
+            scenarios = build_scenarios(args, order_ids, good_ids)
+
+            for name in args.scenario or list(scenarios):
+                scenario = scenarios[name]
+                rng = random.Random(f"{args.seed}:{name}")
+                snapshot = await snapshot_data(conn) if scenario.mutating else None
+                original_shards = None
+                try:
+                    if scenario.mutating:
+                        await conn.execute("SELECT set_good_stock(id, $1) FROM Goods ORDER BY id", args.stock)
+                    if scenario.sharded_good_id is not None:
+                        original_shards = await conn.fetchval(
+                            "SELECT stock_shards FROM Goods WHERE id = $1", scenario.sharded_good_id
+                        )
+                        await conn.execute("SELECT set_stock_shards($1, $2)", scenario.sharded_good_id, args.stock_shards)
+                    before = await stock_state(conn)
+                    for _ in range(args.warmup):
+                        method, path, _payload = scenarios["health_storm"].make_request(rng)
+                        await client.request(method, path)
+                    stop_slowdown = asyncio.Event()
+                    slowdown = asyncio.create_task(slow_down_database(args, stop_slowdown)) if scenario.slow_db else None
+                    try:
+                        raw = await drive(client, scenario, args, rng)
+                    finally:
+                        if slowdown is not None:
+                            stop_slowdown.set()
+                            await slowdown
+                    result = scenario_report(raw)
+                    result["stock"] = stock_report(before, await stock_state(conn), raw["confirmed"])
+                finally:
+                    if original_shards is not None:
+                        await conn.execute(
+                            "SELECT set_stock_shards($1, $2)", scenario.sharded_good_id, original_shards
+                        )
+                    if snapshot is not None and not args.keep_data:
+                        await restore_data(conn, snapshot)
+                result["fail_on_errors"] = scenario.fail_on_errors
+                report["scenarios"][name] = result
+                latency = result["latency_ms"]
+                print(
+                    f"[{name}] RPS: {result['throughput_rps']}, p50: {latency['p50']} мс, "
+                    f"p95: {latency['p95']} мс, p99: {latency['p99']} мс, "
+                    f"ошибки: {result['error_rate']}, отказы: {result['rejection_rate']}, "
+                    f"сброшено (503): {result['shed_rate']}, "
+                    f"остаток согласован: {result['stock']['consistent']}",
+                    file=sys.stderr
+                )
+    finally:
+        await conn.close()
+        if app_process is not None:
+            app_process.terminate()
+            app_process.wait(timeout=30)
+    return report
+
+
+async def main(args) -> int:
+    report = await run(args)
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+    consistent = all(result["stock"]["consistent"] for result in report["scenarios"].values())
+    errors = any(result["fail_on_errors"] and result["error_rate"] for result in report["scenarios"].values())
+    return 0 if consistent and not errors else 1
+
+
+if __name__ == "__main__":
+    scenario_names = [
+        "uniform_add_good", "hot_good", "large_cart", "not_found_mix", "health_storm", "slow_db", "sharded_mix"
+    ]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=os.getenv("API_BASE_URL", "http://localhost:8000"))
+    parser.add_argument("--scenario", action="append", choices=scenario_names,
+                        help="сценарий для запуска (можно указать несколько раз), по умолчанию - все")
+    parser.add_argument("--requests", type=int, default=2000, help="запросов на сценарий")
+    parser.add_argument("--concurrency", type=int, default=50, help="максимум одновременных запросов")
+    parser.add_argument("--rps", type=float, help="целевой RPS (открытая модель нагрузки)")
+    parser.add_argument("--warmup", type=int, default=20, help="прогревочных запросов /health перед сценарием")
+    parser.add_argument("--amount", type=int, default=1, help="количество товара в одной строке")
+    parser.add_argument("--stock", type=int, default=10000, help="остаток каждого товара перед сценарием")
+    parser.add_argument("--hot-good-id", type=int, help="товар для hot_good, по умолчанию - первый по ID")
+    parser.add_argument("--cart-size", type=int, default=50, help="строк в корзине large_cart")
+    parser.add_argument("--atomic-carts", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--not-found-ratio", type=float, default=0.8)
+    parser.add_argument("--stock-shards", type=int, default=4, help="sharded_mix: шардов остатка товара")
+    parser.add_argument("--slow-db-hold-ms", type=float, default=200, help="slow_db: удержание блокировки товаров, мс")
+    parser.add_argument("--slow-db-period-ms", type=float, default=250, help="slow_db: период блокировки товаров, мс")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=30.0, help="таймаут HTTP-запроса, с")
+    parser.add_argument("--keep-data", action="store_true", help="не восстанавливать данные после сценариев")
+    parser.add_argument("--reset-db", action="store_true",
+                        help="пересоздать схему из init.sql перед запуском (приложение должно стартовать после этого)")
+    parser.add_argument("--init-sql", type=Path, default=DEFAULT_INIT_SQL)
+    parser.add_argument("--start-app", action="store_true", help="запустить приложение через uvicorn")
+    parser.add_argument("--port", type=int, default=8011, help="порт для --start-app")
+    parser.add_argument("--workers", type=int, default=1, help="воркеров uvicorn для --start-app")
+    parser.add_argument("--startup-timeout", type=float, default=30.0)
+    parser.add_argument("--output", help="файл для JSON-отчёта, по умолчанию - stdout")
+    sys.exit(asyncio.run(main(parser.parse_args())))
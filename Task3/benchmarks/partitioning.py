@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк чтения заказа и добавления товара на обычной и хеш-секционированных
+схемах Orders и Ordered_goods.
+
+Перед замерами в БД добавляется --orders синтетических заказов по --lines
+строк. Затем для каждого модуля из --modulus (0 - обычные таблицы) таблицы
+переносятся командой секционирования и замеряются:
+- чтение заказа - GET_ORDER_DETAILS последовательно, мимо кэша заказов;
+- добавление товара - add_good_to_order с --concurrency параллельными
+  запросами по синтетическим заказам.
+Для секционированных схем проверяется и отсечение секций в планах.
+
+В конце таблицы возвращаются к исходному модулю, синтетические заказы
+удаляются (кроме --keep-data), остатки товаров восстанавливаются.
+
+Запуск из директории Task3 (БД инициализирована через init.sql):
+    python -m benchmarks.partitioning --orders 500000 --modulus 0 16 64
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+
+from app.infrastructure.database import statements
+from app.infrastructure.database.connection import db_connection
+from app.infrastructure.database.partitioning import (
+    MIGRATION_ORDER,
+    PartitionMigrator,
+    check_pruning,
+    table_layout
+)
+from app.infrastructure.repositories.order_repository_impl import OrderRepositoryImpl
+
+# Остаток товаров на время замеров, чтобы добавления не упирались в нехватку
+BENCHMARK_STOCK = 100_000_000
+
+
+async def generate_orders(count: int, lines: int, chunk: int = 50_000) -> tuple:
+    """Добавить синтетические заказы; вернуть диапазон их ID"""
+    first_id = None
+    last_id = None
+    for offset in range(0, count, chunk):
+        row = await db_connection.fetch_one("""
+            WITH clients AS (SELECT array_agg(id ORDER BY id) AS ids FROM Clients),
+            goods AS (SELECT array_agg(id ORDER BY id) AS ids FROM Goods),
+            new_orders AS (
+                INSERT INTO Orders (client_id)
+                SELECT clients.ids[1 + n % array_length(clients.ids, 1)]
+                FROM generate_series(1, $1) AS n, clients
+                RETURNING id
+            ),
+            new_lines AS (
+                INSERT INTO Ordered_goods (order_id, good_id, amount)
+                SELECT o.id, goods.ids[1 + (o.id * 7 + i) % array_length(goods.ids, 1)], 1 + (o.id + i) % 3
+                FROM new_orders o, generate_series(0, $2 - 1) AS i, goods
+            )
+            SELECT min(id) AS first_id, max(id) AS last_id FROM new_orders
+        """, min(chunk, count - offset), lines)
+        first_id = row["first_id"] if first_id is None else first_id
+        last_id = row["last_id"]
+        print(f"Синтетические заказы: {offset + min(chunk, count - offset)} из {count}", flush=True)
+    return first_id, last_id
+
+
+async def delete_orders(first_id: int, last_id: int, chunk: int = 10_000) -> None:
+    for start in range(first_id, last_id + 1, chunk):
+        await db_connection.execute_command(
+            "DELETE FROM Orders WHERE id BETWEEN $1 AND $2", start, min(start + chunk - 1, last_id)
+        )
+
+
+def percentiles(latencies) -> str:
+    values = statistics.quantiles(latencies, n=100)
+    return f"p50 {values[49]:.2f} мс, p99 {values[98]:.2f} мс"
+
+
+async def measure_reads(order_ids: range, iterations: int) -> list:
+    latencies = []
+    for _ in range(iterations):
+        order_id = random.choice(order_ids)
+        started = time.perf_counter()
+        await db_connection.execute_query(statements.GET_ORDER_DETAILS, order_id)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+async def measure_adds(order_ids: range, good_ids: list, requests: int, concurrency: int) -> tuple:
+    repository = OrderRepositoryImpl()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one_call():
+        async with semaphore:
+            started = time.perf_counter()
+            await repository.add_good_to_order(random.choice(order_ids), random.choice(good_ids), 1)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_call() for _ in range(requests)))
+    return latencies, requests / (time.perf_counter() - started)
+
+
+async def run_mode(modulus: int, args, order_ids: range, good_ids: list) -> None:
+    migrator = PartitionMigrator(batch_size=args.batch_size)
+    started = time.perf_counter()
+    for table in MIGRATION_ORDER:
+        if (await table_layout(table)).modulus != modulus:
+            await migrator.migrate(table, modulus)
+    migrated = time.perf_counter() - started
+
+    pruning = ""
+    if modulus:
+        results = await check_pruning()
+        pruned = sum(result.pruned for result in results)
+        pruning = f", отсечение секций: {pruned} из {len(results)} планов"
+
+    # Прогрев: кэш подготовленных операторов и страницы индексов
+    await measure_reads(order_ids, min(500, args.reads))
+    reads = await measure_reads(order_ids, args.reads)
+    adds, rps = await measure_adds(order_ids, good_ids, args.adds, args.concurrency)
+
+    name = f"модуль {modulus}" if modulus else "без секций"
+    print(f"[{name}] перенос {migrated:.1f} с{pruning}")
+    print(f"[{name}] чтение заказа: {percentiles(reads)}")
+    print(f"[{name}] добавление товара: {rps:.0f} RPS, {percentiles(adds)}")
+
+
+async def main(args) -> int:
+    await db_connection.create_pool(min_size=args.concurrency, max_size=args.concurrency)
+    try:
+        original = {table: (await table_layout(table)).modulus for table in MIGRATION_ORDER}
+        stock = await db_connection.execute_query("SELECT id, amount FROM Goods_stock ORDER BY id")
+        good_ids = [row["id"] for row in stock]
+        if args.lines > len(good_ids):
+            print(f"--lines не может быть больше числа товаров ({len(good_ids)})", file=sys.stderr)
+            return 2
+
+        first_id, last_id = await generate_orders(args.orders, args.lines)
+        order_ids = range(first_id, last_id + 1)
+        repository = OrderRepositoryImpl()
+        try:
+            for good_id in good_ids:
+                await repository.update_good_amount(good_id, BENCHMARK_STOCK)
+            for modulus in args.modulus:
+                await run_mode(modulus, args, order_ids, good_ids)
+        finally:
+            migrator = PartitionMigrator(batch_size=args.batch_size)
+            for table in MIGRATION_ORDER:
+                if (await table_layout(table)).modulus != original[table]:
+                    await migrator.migrate(table, original[table])
+            if not args.keep_data:
+                await delete_orders(first_id, last_id)
+            for row in stock:
+                await repository.update_good_amount(row["id"], row["amount"])
+    finally:
+        await db_connection.close_pool()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=500_000, help="синтетических заказов")
+    parser.add_argument("--lines", type=int, default=3, help="строк в синтетическом заказе")
+    parser.add_argument("--modulus", type=int, nargs="+", default=[0, 16, 64])
+    parser.add_argument("--reads", type=int, default=5000)
+    parser.add_argument("--adds", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=10000, help="строк в порции переноса")
+    parser.add_argument("--keep-data", action="store_true", help="не удалять синтетические заказы")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк накладных расходов пула соединений и поведения при его исчерпании.
+
+1. Стоимость одного захвата соединения из пула (без запроса).
+2. Запрос из нескольких шагов чтения (заказ, товар, строки заказа), выполненный
+   отдельными обращениями к пулу ("до") и в одной единице работы ("после").
+   Прогоняется при разной конкурентности, чтобы показать поведение пула
+   при max_size=20.
+
+Запуск из директории Task3 (БД инициализирована через init.sql):
+    python -m benchmarks.pool_acquire --requests 2000 --concurrency 10 20 80
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+
+from app.infrastructure.database.connection import db_connection
+from app.infrastructure.repositories.order_repository_impl import OrderRepositoryImpl
+
+
+async def read_steps(repository: OrderRepositoryImpl, order_id: int, good_id: int) -> None:
+    """Шаги чтения прежнего OrderService.add_ordered_good"""
+    await repository.get_order_by_id(order_id)
+    await repository.get_good_by_id(good_id)
+    await repository.get_ordered_goods_by_order_id(order_id)
+
+
+async def per_call_pool(repository, order_id, good_id) -> None:
+    await read_steps(repository, order_id, good_id)
+
+
+async def single_unit_of_work(repository, order_id, good_id) -> None:
+    async with db_connection.unit_of_work(readonly=True):
+        await read_steps(repository, order_id, good_id)
+
+
+async def measure_acquire(iterations: int) -> None:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        async with db_connection.get_connection():
+            pass
+    per_acquire = (time.perf_counter() - started) / iterations * 1_000_000
+    print(f"Захват соединения из пула: {per_acquire:.1f} мкс")
+
+
+async def run_mode(name, handler, requests, concurrency) -> None:
+    repository = OrderRepositoryImpl()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one_call():
+        async with semaphore:
+            started = time.perf_counter()
+            await handler(repository, random.randint(1, 69), random.randint(1, 15))
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_call() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    percentiles = statistics.quantiles(latencies, n=100)
+    print(f"[{name}, конкурентность {concurrency}] RPS: {requests / elapsed:.0f}, "
+          f"p50: {percentiles[49]:.2f} мс, p99: {percentiles[98]:.2f} мс")
+
+
+async def main(args) -> int:
+    await db_connection.create_pool(min_size=args.pool_size, max_size=args.pool_size)
+    try:
+        await measure_acquire(args.requests)
+        for concurrency in args.concurrency:
+            await run_mode("захват на каждый запрос", per_call_pool, args.requests, concurrency)
+            await run_mode("единица работы", single_unit_of_work, args.requests, concurrency)
+    finally:
+        await db_connection.close_pool()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 20, 80])
+    parser.add_argument("--pool-size", type=int, default=20)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк задержки запросов репозитория при разном кэше подготовленных операторов.
+
+Режимы:
+- registry    - кэш операторов не меньше реестра statements (по умолчанию):
+                запрос готовится при первом выполнении на соединении, дальше
+                берётся из кэша;
+- small_cache - кэш на 2 оператора, меньше числа чередующихся запросов:
+                каждый вызов вытесняет соседний и готовится заново (так было
+                бы без расчёта размера кэша по реестру);
+- pgbouncer   - DB_PGBOUNCER_MODE: кэш операторов отключён, каждый запрос
+                разбирается сервером заново.
+
+Запросы чередуются, как в реальном потоке, и выполняются последовательно на
+одном соединении, поэтому задержка отражает стоимость одного обращения к БД.
+Отдельно выводится первый вызов каждого запроса на новом соединении - цена
+подготовки при первом использовании.
+
+Запуск из директории Task3 (БД инициализирована через init.sql):
+    python -m benchmarks.prepared_statements --iterations 5000
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from typing import Optional
+
+from app.infrastructure.database.connection import db_connection
+from app.infrastructure.repositories.order_repository_impl import OrderRepositoryImpl
+
+
+async def run_mode(name: str, pgbouncer_mode: bool, statement_cache_size: Optional[int], iterations: int) -> None:
+    db_connection.pgbouncer_mode = pgbouncer_mode
+    await db_connection.create_pool(min_size=1, max_size=1, statement_cache_size=statement_cache_size)
+    repository = OrderRepositoryImpl()
+    calls = {
+        "get_order_by_id": lambda: repository.get_order_by_id(random.randint(1, 69)),
+        "get_good_by_id": lambda: repository.get_good_by_id(random.randint(1, 15)),
+        "get_ordered_goods_by_order_id": lambda: repository.get_ordered_goods_by_order_id(random.randint(1, 69)),
+    }
+    try:
+        first_calls = {}
+        for query_name, call in calls.items():
+            started = time.perf_counter()
+            await call()
+            first_calls[query_name] = (time.perf_counter() - started) * 1_000_000
+        
+        latencies = {query_name: [] for query_name in calls}
+        for _ in range(iterations):
+            for query_name, call in calls.items():
+                started = time.perf_counter()
+                await call()
+                latencies[query_name].append((time.perf_counter() - started) * 1_000_000)
+        
+        for query_name, samples in latencies.items():
+            percentiles = statistics.quantiles(samples, n=100)
+            print(f"[{name}] {query_name}: первый вызов {first_calls[query_name]:.0f} мкс, "
+                  f"среднее {statistics.mean(samples):.0f} мкс, "
+                  f"p50 {percentiles[49]:.0f} мкс, p99 {percentiles[98]:.0f} мкс")
+    finally:
+        await db_connection.close_pool()
+
+
+async def main(args) -> int:
+    await run_mode("registry", False, None, args.iterations)
+    await run_mode("small_cache", False, 2, args.iterations)
+    await run_mode("pgbouncer", True, None, args.iterations)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5000)
+    sys.exit(asyncio.run(main(parser.parse_args())))
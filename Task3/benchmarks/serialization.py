@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарк сериализации ответов и создания доменных моделей.
+
+Сравнивает процессорное время и память на одну операцию:
+  - ответ POST /orders/add-good и GET /orders/{id}: стандартный путь FastAPI
+    (валидация по response_model, dict, json.dumps в JSONResponse) против
+    ModelResponse (скомпилированный сериализатор pydantic-core, модель
+    собрана через model_construct);
+  - модель товара из строки БД: dataclass с __dict__ и проверками в
+    __post_init__ (как до перехода на __slots__) против Good.from_row.
+
+БД и сеть не нужны. Запуск из директории Task3:
+    python -m benchmarks.serialization --iterations 50000
+"""
+import argparse
+import asyncio
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+
+from app.application.controllers.responses import ModelResponse
+from app.application.dto.order_dto import AddOrderedGoodResponse, OrderDetailsResponse, OrderLineResponse
+from app.domain.models.order import Good
+from main import app
+
+
+@dataclass
+class DictGood:
+    """Модель товара до перехода на __slots__ и from_row"""
+    id: int
+    name: str
+    amount: int
+    price: float
+    catalogue_id: Optional[int] = None
+
+    def __post_init__(self):
+        if self.id <= 0:
+            raise ValueError("Good ID must be positive")
+        if not self.name or not self.name.strip():
+            raise ValueError("Good name cannot be empty")
+        if self.amount < 0:
+            raise ValueError("Amount cannot be negative")
+        if self.price < 0:
+            raise ValueError("Price cannot be negative")
+        if self.catalogue_id is not None and self.catalogue_id <= 0:
+            raise ValueError("Catalogue ID must be positive")
+
+
+def response_field(path: str, method: str):
+    for route in app.routes:
+        if getattr(route, "path", None) == path and method in getattr(route, "methods", ()):
+            return route.response_field
+    raise LookupError(f"Route {method} {path} not found")
+
+
+async def measure(name: str, operation, iterations: int) -> dict:
+    """CPU-время и пик выделенной памяти на одну операцию"""
+    for _ in range(min(iterations, 1000)):
+        await operation()
+
+    started = time.process_time_ns()
+    for _ in range(iterations):
+        await operation()
+    cpu_us = (time.process_time_ns() - started) / iterations / 1000
+
+    # Пик памяти внутри операции относительно памяти до неё
+    samples = min(iterations, 2000)
+    peak_total = 0
+    tracemalloc.start()
+    for _ in range(samples):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        await operation()
+        _, peak = tracemalloc.get_traced_memory()
+        peak_total += peak - before
+    tracemalloc.stop()
+
+    return {"name": name, "cpu_us": cpu_us, "peak_bytes": peak_total / samples}
+
+
+def retained_bytes(factory, count: int = 10000) -> float:
+    """Память, занимаемая одной моделью, по count созданным экземплярам"""
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    objects = [factory() for _ in range(count)]
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return (after - before) / count
+
+
+def print_pair(title: str, before: dict, after: dict, before_size: Optional[float] = None,
+               after_size: Optional[float] = None) -> None:
+    print(title)
+    for label, result, size in (("до", before, before_size), ("после", after, after_size)):
+        line = f"  {label:<6} {result['name']:<44} CPU: {result['cpu_us']:7.2f} мкс, пик памяти: {result['peak_bytes']:7.0f} Б"
+        if size is not None:
+            line += f", объект: {size:5.0f} Б"
+        print(line)
+    print(f"  ускорение: x{before['cpu_us'] / after['cpu_us']:.1f}")
+
+
+async def main(args) -> int:
+    add_good_field = response_field("/orders/add-good", "POST")
+    order_field = response_field("/orders/{order_id}", "GET")
+    message = "Количество товара в заказе увеличено. Новое количество: 3. Остаток на складе: 41"
+    lines = [
+        dict(good_id=good_id, name=f"Товар {good_id}", amount=good_id % 4 + 1, price=1999.9 + good_id,
+             total=round((good_id % 4 + 1) * (1999.9 + good_id), 2))
+        for good_id in range(1, args.order_lines + 1)
+    ]
+
+    async def add_good_default():
+        response = AddOrderedGoodResponse(success=True, message=message)
+        content = await serialize_response(field=add_good_field, response_content=response)
+        return JSONResponse(content, status_code=201)
+
+    async def add_good_fast():
+        response = AddOrderedGoodResponse.model_construct(success=True, message=message)
+        return ModelResponse(response, status_code=201)
+
+    def order_details():
+        return OrderDetailsResponse(
+            id=1, client_id=1, version=7,
+            lines=[OrderLineResponse(**line) for line in lines],
+            total=round(sum(line["total"] for line in lines), 2)
+        )
+
+    async def order_default():
+        content = await serialize_response(field=order_field, response_content=order_details())
+        return JSONResponse(content, headers={"ETag": '"1-7-0"'})
+
+    async def order_fast():
+        return ModelResponse(order_details(), headers={"ETag": '"1-7-0"'})
+
+    # Контроль: оба пути отдают одинаковое тело
+    assert (await add_good_default()).body == (await add_good_fast()).body
+    assert (await order_default()).body == (await order_fast()).body
+
+    row = {"id": 5, "name": "Ноутбук Lenovo 17\"", "amount": 42, "price": 54999.90, "catalogue_id": 9}
+
+    def dict_good():
+        return DictGood(
+            id=row['id'],
+            name=row['name'],
+            amount=row['amount'],
+            price=float(row['price']),
+            catalogue_id=row['catalogue_id']
+        )
+
+    def slotted_good():
+        return Good.from_row(row)
+
+    async def dict_good_op():
+        return dict_good()
+
+    async def slotted_good_op():
+        return slotted_good()
+
+    n = args.iterations
+    print_pair("POST /orders/add-good, тело ответа",
+               await measure("FastAPI: response_model + JSONResponse", add_good_default, n),
+               await measure("model_construct + ModelResponse", add_good_fast, n))
+    print_pair(f"GET /orders/{{id}}, заказ из {args.order_lines} строк",
+               await measure("FastAPI: response_model + JSONResponse", order_default, n),
+               await measure("ModelResponse", order_fast, n))
+    print_pair("Товар из строки БД",
+               await measure("dataclass + __post_init__", dict_good_op, n),
+               await measure("__slots__ + Good.from_row", slotted_good_op, n),
+               retained_bytes(dict_good), retained_bytes(slotted_good))
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50000)
+    parser.add_argument("--order-lines", type=int, default=5)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк конкурентного списания одного товара при разном числе шардов остатка.
+
+Все запросы вызывают add_good_to_order для одного товара. При 0 шардов
+остаток хранится в Goods.amount и запросы выстраиваются в очередь на
+блокировку одной строки; с N шардами списание блокирует только один из них.
+Для каждого числа шардов проверяется, что списано ровно столько, сколько
+подтверждено успешных добавлений, и остаток не ушёл в минус.
+
+Запуск из директории Task3 (БД инициализирована через init.sql):
+    python -m benchmarks.stock_shards --shards 0 1 2 4 8 16 --requests 5000 --concurrency 100
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+
+from app.infrastructure.database.connection import db_connection
+from app.infrastructure.repositories.order_repository_impl import OrderRepositoryImpl
+
+
+async def current_stock(good_id: int) -> int:
+    return await db_connection.fetch_val("SELECT amount FROM Goods_stock WHERE id = $1", good_id)
+
+
+async def run_mode(shards: int, args, order_ids) -> bool:
+    repository = OrderRepositoryImpl()
+    await repository.set_stock_shards(args.good_id, shards)
+    await repository.update_good_amount(args.good_id, args.stock)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    successes = 0
+
+    async def one_call():
+        nonlocal successes
+        async with semaphore:
+            started = time.perf_counter()
+            result = await repository.add_good_to_order(random.choice(order_ids), args.good_id, args.amount)
+            latencies.append((time.perf_counter() - started) * 1000)
+            successes += result.success
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_call() for _ in range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    final_stock = await current_stock(args.good_id)
+    percentiles = statistics.quantiles(latencies, n=100)
+    print(f"[шардов: {shards}] RPS: {args.requests / elapsed:.0f}, p50: {percentiles[49]:.2f} мс, "
+          f"p99: {percentiles[98]:.2f} мс, успешно: {successes}, остаток: {final_stock}")
+    return final_stock >= 0 and args.stock - final_stock == successes * args.amount
+
+
+async def main(args) -> int:
+    await db_connection.create_pool(min_size=args.concurrency, max_size=args.concurrency)
+    try:
+        order_ids = [row['id'] for row in await db_connection.execute_query("SELECT id FROM Orders")]
+        original_stock = await current_stock(args.good_id)
+        original_shards = await db_connection.fetch_val(
+            "SELECT stock_shards FROM Goods WHERE id = $1", args.good_id
+        )
+        snapshot = await db_connection.execute_query(
+            "SELECT order_id, good_id, amount FROM Ordered_goods WHERE good_id = $1", args.good_id
+        )
+        consistent = True
+        try:
+            for shards in args.shards:
+                consistent &= await run_mode(shards, args, order_ids)
+        finally:
+            # Возвращаем исходные данные товара
+            await db_connection.execute_command("DELETE FROM Ordered_goods WHERE good_id = $1", args.good_id)
+            async with db_connection.get_connection() as conn:
+                await conn.executemany(
+                    "INSERT INTO Ordered_goods (order_id, good_id, amount) VALUES ($1, $2, $3)",
+                    [tuple(row) for row in snapshot]
+                )
+            repository = OrderRepositoryImpl()
+            await repository.set_stock_shards(args.good_id, original_shards)
+            await repository.update_good_amount(args.good_id, original_stock)
+    finally:
+        await db_connection.close_pool()
+
+    if not consistent:
+        print("ОШИБКА: нарушен инвариант остатка")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--good-id", type=int, default=5)
+    parser.add_argument("--shards", type=int, nargs="+", default=[0, 1, 2, 4, 8, 16])
+    parser.add_argument("--stock", type=int, default=1_000_000)
+    parser.add_argument("--amount", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк масштабирования по воркерам: пропускная способность от 1 до N воркеров.
+
+Для каждого числа воркеров приложение запускается через serve.py с одним и тем
+же бюджетом соединений (пул каждого воркера уменьшается с ростом их числа),
+затем нагрузку подаёт benchmarks.load_test, после чего приложение
+останавливается по SIGTERM. Проверяется, что мастер завершился с кодом 0,
+то есть все воркеры корректно завершили запросы и lifespan.
+
+Генератор нагрузки работает на той же машине, поэтому при числе воркеров,
+равном числу CPU, он конкурирует с ними за процессор.
+
+Запуск из директории Task3 (БД инициализирована через init.sql):
+    python -m benchmarks.worker_scaling --workers 1 2 4 8 --db-connection-budget 80
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+TASK_DIR = Path(__file__).resolve().parent.parent
+
+
+def wait_for_health(port: int, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=2) as response:
+                if json.load(response).get("status") == "healthy":
+                    return
+        except OSError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"API не ответило на /health за {timeout:.0f} с")
+        time.sleep(0.2)
+
+
+def run_workers(workers: int, args) -> dict:
+    server = subprocess.Popen(
+        [
+            sys.executable, "serve.py",
+            "--host", "127.0.0.1", "--port", str(args.port),
+            "--workers", str(workers),
+            "--db-connection-budget", str(args.db_connection_budget),
+            "--log-level", "warning", "--no-access-log"
+        ],
+        cwd=TASK_DIR,
+        # Каталог метрик у каждого запуска свой
+        env={key: value for key, value in os.environ.items() if key != "PROMETHEUS_MULTIPROC_DIR"}
+    )
+    try:
+        wait_for_health(args.port, args.startup_timeout)
+        with tempfile.NamedTemporaryFile(suffix=".json") as output:
+            command = [
+                sys.executable, "-m", "benchmarks.load_test",
+                "--base-url", f"http://127.0.0.1:{args.port}",
+                "--requests", str(args.requests),
+                "--concurrency", str(args.concurrency),
+                "--output", output.name
+            ]
+            for scenario in args.scenario:
+                command += ["--scenario", scenario]
+            subprocess.run(command, cwd=TASK_DIR, check=True, stderr=subprocess.DEVNULL)
+            report = json.loads(Path(output.name).read_text(encoding="utf-8"))
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            exit_code = server.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            exit_code = server.wait()
+
+    return {"scenarios": report["scenarios"], "graceful_exit": exit_code == 0}
+
+
+def main(args) -> int:
+    results = {}
+    for workers in args.workers:
+        results[workers] = run_workers(workers, args)
+
+    ok = True
+    for scenario in args.scenario:
+        print(f"[{scenario}]")
+        baseline = None
+        for workers, result in results.items():
+            report = result["scenarios"][scenario]
+            rps = report["throughput_rps"]
+            baseline = baseline or rps
+            consistent = report["stock"]["consistent"]
+            ok &= consistent and result["graceful_exit"]
+            print(
+                f"  воркеров: {workers:>2}, RPS: {rps:8.1f} (x{rps / baseline:.2f}), "
+                f"p99: {report['latency_ms']['p99']} мс, ошибки: {report['error_rate']}, "
+                f"остаток согласован: {consistent}, корректная остановка: {result['graceful_exit']}"
+            )
+    if not ok:
+        print("ОШИБКА: нарушен инвариант остатка или воркеры не завершились корректно")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--scenario", action="append", choices=["uniform_add_good", "hot_good", "health_storm"])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--db-connection-budget", type=int, default=80)
+    parser.add_argument("--port", type=int, default=8013)
+    parser.add_argument("--startup-timeout", type=float, default=30.0)
+    args = parser.parse_args()
+    args.scenario = args.scenario or ["uniform_add_good", "health_storm"]
+    sys.exit(main(args))
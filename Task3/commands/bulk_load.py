@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Массовая загрузка заказов, строк заказов и корректировок остатков через COPY.
+
+Файлы CSV (с заголовком) или JSONL читаются потоково порциями по --chunk-size
+строк. Каждая порция загружается одной транзакцией: бинарный COPY во временную
+таблицу, проверка ссылок на клиентов, заказы и товары одним запросом на
+порцию, перенос в рабочие таблицы и сохранение позиции в файле. Повторный
+запуск с теми же файлами продолжает загрузку с последней сохранённой порции.
+
+Поля файлов:
+    --orders   id, client_id             -> Orders
+    --lines    order_id, good_id, amount -> Ordered_goods (повтор пары суммируется)
+    --stock    good_id, delta            -> корректировка остатка Goods (+приход, -списание)
+
+Файлы загружаются в порядке orders, lines, stock, чтобы строки ссылались на
+уже загруженные заказы. Отклонённые строки (нет клиента, заказа или товара,
+остаток ушёл бы в минус, ошибка формата) пропускаются и дописываются в
+--rejects; с --strict первая же порция с отклонёнными строками не загружается
+и загрузка останавливается.
+
+Код возврата 1, если были отклонённые строки или загрузка остановлена.
+
+Запуск из директории Task3 (переменные DB_* те же, что у приложения):
+    python -m commands.bulk_load --orders orders.csv --lines lines.jsonl --rejects rejects.csv
+"""
+import argparse
+import asyncio
+import csv
+import sys
+
+from app.infrastructure.database.bulk_loader import BulkLoader, BulkLoadError, TARGETS
+from app.infrastructure.database.connection import db_connection
+
+
+def print_progress(progress) -> None:
+    print(
+        f"{progress.target}: строка {progress.line}, {progress.percent:5.1f}%, "
+        f"загружено {progress.loaded}, отклонено {progress.rejected}, "
+        f"{progress.rows_per_second:.0f} строк/с",
+        flush=True
+    )
+
+
+async def main(args) -> int:
+    sources = [(name, getattr(args, name)) for name in ("orders", "lines", "stock") if getattr(args, name)]
+    if not sources:
+        print("Не указан ни один файл: --orders, --lines или --stock", file=sys.stderr)
+        return 2
+
+    loader = BulkLoader(chunk_size=args.chunk_size, strict=args.strict)
+    rejects_file = open(args.rejects, "a", newline="", encoding="utf-8") if args.rejects else None
+    rejects_writer = csv.writer(rejects_file) if rejects_file else None
+
+    await db_connection.create_pool(min_size=1, max_size=1)
+    try:
+        rejected = 0
+        for name, path in sources:
+            def on_chunk(progress, rejects, path=path):
+                if rejects_writer is not None:
+                    rejects_writer.writerows((progress.target, path, line, reason) for line, reason in rejects)
+                    rejects_file.flush()
+                if not args.quiet:
+                    print_progress(progress)
+
+            progress = await loader.load(
+                TARGETS[name], path,
+                format_=args.format,
+                restart=args.restart,
+                on_chunk=on_chunk
+            )
+            if progress.resumed and progress.chunks == 0:
+                print(f"{name}: {path} уже загружен ({progress.loaded} строк, отклонено {progress.rejected})")
+            else:
+                print(f"{name}: {path} загружен: {progress.loaded} строк, отклонено {progress.rejected}")
+            rejected += progress.rejected
+    except (BulkLoadError, OSError, ValueError) as e:
+        print(f"ОШИБКА: {e}", file=sys.stderr)
+        return 1
+    finally:
+        await db_connection.close_pool()
+        if rejects_file is not None:
+            rejects_file.close()
+
+    return 1 if rejected else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", help="файл заказов")
+    parser.add_argument("--lines", help="файл строк заказов")
+    parser.add_argument("--stock", help="файл корректировок остатков")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="формат файлов, по умолчанию - по расширению")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="строк в порции (транзакции)")
+    parser.add_argument("--rejects", help="CSV для отклонённых строк: сущность, файл, строка, причина")
+    parser.add_argument("--strict", action="store_true", help="остановиться на первой порции с отклонёнными строками")
+    parser.add_argument("--restart", action="store_true", help="загрузить файлы заново, игнорируя сохранённую позицию")
+    parser.add_argument("--quiet", action="store_true", help="не выводить прогресс по порциям")
+    sys.exit(asyncio.run(main(parser.parse_args())))
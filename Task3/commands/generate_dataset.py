@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Синтетический набор данных для проверки схемы и запросов на объёме.
+
+Команды:
+    generate     заменить Catalogue, Goods, Clients, Orders и Ordered_goods
+                 набором по параметрам (все прежние данные этих таблиц и
+                 зависящих от них удаляются)
+    fingerprint  вывести сводку (fingerprint) текущих данных этих таблиц
+
+Набор воспроизводим: одинаковые параметры и --seed дают одинаковые данные и
+одинаковый fingerprint (на одной версии PostgreSQL). Fingerprint выводится
+после генерации; перед сравнением планов или прогонов бенчмарков между
+стендами и релизами его стоит сверить командой fingerprint - он меняется
+после любых изменений данных, в том числе остатков нагрузочными тестами.
+
+Популярность товаров подчиняется закону Ципфа (--zipf), каталог - дерево
+ltree глубиной --catalogue-depth, доля --clients-without-orders клиентов
+без заказов. --indexes notebook добавляет индексы, рекомендованные в
+Task2/T2_scripts.ipynb, --indexes none убирает их (для сравнения планов).
+
+Запуск из директории Task3 (переменные DB_* те же, что у приложения):
+    python -m commands.generate_dataset generate --orders 1000000 --clients 100000 --goods 10000 --seed 42
+    python -m commands.generate_dataset generate --orders 5000000 --indexes notebook
+    python -m commands.generate_dataset fingerprint
+"""
+import argparse
+import asyncio
+import sys
+
+from app.infrastructure.database.connection import db_connection
+from app.infrastructure.database.synthetic_dataset import (
+    INDEX_MODES,
+    DatasetSpec,
+    SyntheticDataset,
+    dataset_fingerprint
+)
+
+
+def print_progress(progress) -> None:
+    print(
+        f"заказов {progress.orders}, {progress.percent:5.1f}%, строк заказов {progress.lines}, "
+        f"{progress.rows_per_second:.0f} строк/с",
+        flush=True
+    )
+
+
+async def generate(args) -> int:
+    spec = DatasetSpec(
+        seed=args.seed,
+        orders=args.orders,
+        clients=args.clients,
+        goods=args.goods,
+        clients_without_orders=args.clients_without_orders,
+        max_lines=args.max_lines,
+        zipf_exponent=args.zipf,
+        catalogue_roots=args.catalogue_roots,
+        catalogue_depth=args.catalogue_depth,
+        catalogue_fanout=args.catalogue_fanout,
+        max_stock=args.max_stock
+    )
+    generator = SyntheticDataset(spec, chunk_size=args.chunk_size, index_mode=args.indexes)
+    summary = await generator.generate(on_chunk=None if args.quiet else print_progress)
+    print(
+        f"Каталог: {summary.catalogue_nodes} узлов, глубина {summary.catalogue_depth}, "
+        f"листьев {summary.catalogue_leaves}"
+    )
+    print(f"Товаров: {summary.goods}; 1% самых популярных - {summary.top_goods_share:.1%} строк заказов")
+    print(f"Клиентов: {summary.clients}, без заказов {summary.clients_without_orders}")
+    print(f"Заказов: {summary.orders}, строк заказов {summary.lines}")
+    print(f"Индексы: {', '.join(summary.indexes) or 'нет'}")
+    print(
+        f"Загрузка {summary.load_seconds:.1f} с, индексы и внешние ключи {summary.index_seconds:.1f} с, "
+        f"VACUUM ANALYZE {summary.vacuum_seconds:.1f} с"
+    )
+    print(f"seed {spec.seed}, fingerprint {summary.fingerprint}")
+    return 0
+
+
+async def fingerprint(args) -> int:
+    print(await dataset_fingerprint())
+    return 0
+
+
+COMMANDS = {"generate": generate, "fingerprint": fingerprint}
+
+
+async def main(args) -> int:
+    await db_connection.create_pool(min_size=1, max_size=1)
+    try:
+        return await COMMANDS[args.command](args)
+    except ValueError as e:
+        print(f"ОШИБКА: {e}", file=sys.stderr)
+        return 1
+    finally:
+        await db_connection.close_pool()
+
+
+if __name__ == "__main__":
+    defaults = DatasetSpec()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=COMMANDS)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--orders", type=int, default=defaults.orders, help="заказов")
+    parser.add_argument("--clients", type=int, default=defaults.clients, help="клиентов")
+    parser.add_argument("--goods", type=int, default=defaults.goods, help="товаров")
+    parser.add_argument("--clients-without-orders", type=float, default=defaults.clients_without_orders,
+                        help="доля клиентов без заказов")
+    parser.add_argument("--max-lines", type=int, default=defaults.max_lines, help="максимум строк в заказе")
+    parser.add_argument("--zipf", type=float, default=defaults.zipf_exponent,
+                        help="показатель Ципфа популярности товаров (0 - равномерно)")
+    parser.add_argument("--catalogue-roots", type=int, default=defaults.catalogue_roots, help="корней каталога")
+    parser.add_argument("--catalogue-depth", type=int, default=defaults.catalogue_depth, help="уровней каталога")
+    parser.add_argument("--catalogue-fanout", type=int, default=defaults.catalogue_fanout,
+                        help="максимум детей у узла каталога")
+    parser.add_argument("--max-stock", type=int, default=defaults.max_stock, help="максимальный остаток товара")
+    parser.add_argument("--indexes", choices=INDEX_MODES, default="keep",
+                        help="keep - индексы схемы, notebook - плюс рекомендованные, none - без рекомендованных")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="заказов в порции COPY")
+    parser.add_argument("--quiet", action="store_true", help="не выводить прогресс по порциям")
+    sys.exit(asyncio.run(main(parser.parse_args())))
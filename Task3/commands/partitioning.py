@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Хеш-секционирование Orders и Ordered_goods.
+
+Команды:
+    status    секции таблиц: модуль, строки и размер по секциям, перекос
+    migrate   перенести таблицы в --modulus хеш-секций (0 - в обычную таблицу);
+              смена модуля у уже секционированной таблицы - тот же перенос
+    abort     отменить прерванный перенос (удалить <table>_new и триггер)
+    explain   проверить отсечение секций в планах запросов OrderRepositoryImpl
+
+Orders секционируется по id, Ordered_goods - по order_id, так что заказ и
+его строки находятся по одному значению ключа. Перенос идёт онлайн: новая
+таблица заполняется порциями, изменения исходной повторяются в ней
+триггером, а переключение занимает одну короткую транзакцию. Таблица,
+у которой модуль уже равен --modulus, пропускается.
+
+Код возврата 1 при ошибке переноса или если запрос читает больше одной
+секции (explain).
+
+Запуск из директории Task3 (переменные DB_* те же, что у приложения):
+    python -m commands.partitioning status
+    python -m commands.partitioning migrate --modulus 16
+    python -m commands.partitioning explain
+"""
+import argparse
+import asyncio
+import sys
+
+from app.infrastructure.database.connection import db_connection
+from app.infrastructure.database.partitioning import (
+    MIGRATION_ORDER,
+    PartitionMigrator,
+    PartitioningError,
+    check_pruning,
+    table_layout
+)
+
+
+def format_size(size_bytes: int) -> str:
+    return f"{size_bytes / 1024 / 1024:.1f} МБ"
+
+
+def print_progress(progress) -> None:
+    print(
+        f"{progress.table}: скопировано {progress.copied}, {progress.percent:5.1f}%, "
+        f"{progress.rows_per_second:.0f} строк/с",
+        flush=True
+    )
+
+
+async def status(args) -> int:
+    for table in args.tables:
+        layout = await table_layout(table, exact=args.exact)
+        if layout.partitioned:
+            kind = f"{layout.partition_key}, {len(layout.partitions)} секций, модуль {layout.modulus}"
+        else:
+            kind = "не секционирована"
+        print(f"{table}: {kind}; строк {layout.rows}, {format_size(layout.size_bytes)}")
+        if layout.skew is not None:
+            print(f"  перекос (самая большая секция / средняя): {layout.skew:.2f}")
+        if layout.migration_pending:
+            print(f"  есть незавершённый перенос ({table}_new): повторите migrate или выполните abort")
+        if args.verbose:
+            for partition in layout.partitions:
+                print(f"  {partition.name}: остаток {partition.remainder}/{partition.modulus}, "
+                      f"строк {partition.rows}, {format_size(partition.size_bytes)}")
+    return 0
+
+
+async def migrate(args) -> int:
+    migrator = PartitionMigrator(
+        batch_size=args.batch_size,
+        lock_timeout=args.lock_timeout,
+        swap_attempts=args.swap_attempts,
+        verify=args.verify
+    )
+    for table in args.tables:
+        layout = await table_layout(table)
+        if layout.modulus == args.modulus and not layout.migration_pending:
+            print(f"{table}: модуль уже {args.modulus}, пропущена")
+            continue
+        progress = await migrator.migrate(
+            table, args.modulus,
+            on_batch=None if args.quiet else print_progress
+        )
+        print(
+            f"{table}: перенесена в модуль {args.modulus}, скопировано {progress.copied} строк "
+            f"({progress.rows_per_second:.0f} строк/с), переключение {progress.swap_seconds * 1000:.0f} мс "
+            f"с попытки {progress.swap_attempts}"
+        )
+    return 0
+
+
+async def abort(args) -> int:
+    migrator = PartitionMigrator()
+    # Обратный порядок: строки ссылаются на новую Orders
+    for table in reversed(args.tables):
+        if await migrator.abort(table):
+            print(f"{table}: незавершённый перенос отменён")
+        else:
+            print(f"{table}: переноса нет")
+    return 0
+
+
+async def explain(args) -> int:
+    if not any([(await table_layout(table)).partitioned for table in args.tables]):
+        print("Таблицы не секционированы: проверять нечего")
+        return 0
+    results = await check_pruning()
+    failed = 0
+    for result in results:
+        scanned = ", ".join(
+            f"{table} {len(names)} из {result.partitions[table]}" for table, names in result.scanned.items()
+        ) or "секции не читались"
+        mark = "OK" if result.pruned else "НЕТ ОТСЕЧЕНИЯ"
+        print(f"{result.statement} [{result.plan_cache_mode}]: {scanned} - {mark}")
+        failed += not result.pruned
+    return 1 if failed else 0
+
+
+COMMANDS = {"status": status, "migrate": migrate, "abort": abort, "explain": explain}
+
+
+async def main(args) -> int:
+    await db_connection.create_pool(min_size=1, max_size=1)
+    try:
+        return await COMMANDS[args.command](args)
+    except PartitioningError as e:
+        print(f"ОШИБКА: {e}", file=sys.stderr)
+        return 1
+    finally:
+        await db_connection.close_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=COMMANDS)
+    parser.add_argument("--tables", nargs="+", choices=MIGRATION_ORDER, default=list(MIGRATION_ORDER),
+                        help="таблицы (переносятся в порядке orders, ordered_goods)")
+    parser.add_argument("--modulus", type=int, help="число хеш-секций для migrate, 0 - обычная таблица")
+    parser.add_argument("--batch-size", type=int, default=5000, help="строк в порции копирования")
+    parser.add_argument("--lock-timeout", type=float, default=2.0, help="ожидание блокировки при переключении, с")
+    parser.add_argument("--swap-attempts", type=int, default=10, help="попыток переключения")
+    parser.add_argument("--verify", action=argparse.BooleanOptionalAction, default=True,
+                        help="сверять число строк при переключении")
+    parser.add_argument("--exact", action="store_true", help="status: точное число строк через count(*)")
+    parser.add_argument("--verbose", action="store_true", help="status: строки по каждой секции")
+    parser.add_argument("--quiet", action="store_true", help="не выводить прогресс по порциям")
+    args = parser.parse_args()
+    args.tables = [table for table in MIGRATION_ORDER if table in args.tables]
+    if args.command == "migrate" and args.modulus is None:
+        parser.error("для migrate нужен --modulus")
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Сверка итогов клиентов (Client_totals) с пересчётом по заказам.
+
+Итоги пересчитываются с нуля тем же агрегатом, что и task_2_1_query,
+и сравниваются с сохранёнными. Расхождения выводятся построчно; без
+--dry-run таблица итогов перестраивается по пересчёту. На время
+перестройки таблица итогов блокируется, поэтому запись строк заказов
+приостанавливается до конца транзакции.
+
+Код возврата 1, если найдены расхождения (для запуска по расписанию).
+
+Запуск из директории Task3 (переменные DB_* те же, что у приложения):
+    python -m commands.reconcile_client_totals --dry-run
+    python -m commands.reconcile_client_totals
+"""
+import argparse
+import asyncio
+import sys
+
+from app.infrastructure.database.connection import db_connection
+from app.infrastructure.repositories.client_repository_impl import ClientRepositoryImpl
+
+
+async def main(args) -> int:
+    await db_connection.create_pool(min_size=1, max_size=1)
+    try:
+        drift = await ClientRepositoryImpl().reconcile_client_totals(apply=not args.dry_run)
+    finally:
+        await db_connection.close_pool()
+
+    for row in drift:
+        print(f"Клиент {row.client_id}: количество {row.stored_amount} -> {row.actual_amount}, "
+              f"стоимость {row.stored_cost:.2f} -> {row.actual_cost:.2f}")
+    if not drift:
+        print("Расхождений нет")
+    elif args.dry_run:
+        print(f"Расхождений: {len(drift)} (таблица не изменена, --dry-run)")
+    else:
+        print(f"Расхождений: {len(drift)}, итоги перестроены")
+    return 1 if drift else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="только отчёт, без перестройки таблицы")
+    sys.exit(asyncio.run(main(parser.parse_args())))
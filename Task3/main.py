@@ -4,7 +4,29 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.application.controllers.order_controller import router as order_router
+from app.application.controllers.client_controller import router as client_router
+from app.application.controllers.report_controller import router as report_router
+from app.application.controllers.catalogue_controller import router as catalogue_router
+from app.application.controllers.metrics_controller import router as metrics_router
+from app.application.controllers.health_controller import router as health_router
+from app.application.controllers.export_controller import router as export_router
+from app.application.middleware.admission_middleware import AdmissionMiddleware
+from app.application.middleware.metrics_middleware import MetricsMiddleware
+from app.application.middleware.tracing_middleware import SqlTracingMiddleware
+from app.infrastructure.database.admission import admission_controller
 from app.infrastructure.database.connection import db_connection
+from app.infrastructure.database.order_export import order_exporter
+from app.infrastructure.repositories.coalescing_order_repository import add_good_coalescer
+from app.infrastructure.repositories.write_behind import add_good_write_behind
+from app.infrastructure.database.notifications import notification_listener
+from app.infrastructure.cache.goods_cache import goods_cache
+from app.infrastructure.cache.id_filter import good_id_filter, order_id_filter
+from app.infrastructure.cache.idempotency_cache import idempotency_cache
+from app.infrastructure.cache.order_cache import order_cache
+from app.infrastructure.cache.top_goods_report import top_goods_report
+from app.infrastructure.cache.catalogue_cache import catalogue_cache
+from app.infrastructure.monitoring import metrics
+from app.infrastructure.monitoring.health import health_checker
 
 
 @asynccontextmanager
@@ -12,13 +34,29 @@ async def lifespan(app: FastAPI):
     """Управление жизненным циклом приложения"""
     # Инициализация при запуске
     await db_connection.create_pool()
+    await db_connection.create_export_pool()
     print("Database connection pool created")
+    await notification_listener.start()
+    await catalogue_cache.start()
+    await idempotency_cache.start()
+    await top_goods_report.start()
+    await health_checker.start()
+    await add_good_write_behind.start()
     
     yield
     
     # Очистка при завершении
+    await health_checker.stop()
+    await add_good_write_behind.stop()
+    await add_good_coalescer.drain()
+    await top_goods_report.stop()
+    await idempotency_cache.stop()
+    await notification_listener.stop()
+    await order_id_filter.stop()
+    await good_id_filter.stop()
     await db_connection.close_pool()
     print("Database connection pool closed")
+    metrics.mark_process_dead()
 
 
 # Создание экземпляра FastAPI
@@ -29,8 +67,22 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Ограничение одновременных запросов (ADMISSION_MAX_CONCURRENCY); добавлено
+# первым, чтобы метрики и трассировка видели и отклонённые запросы
+app.add_middleware(AdmissionMiddleware)
+# Метрики длительности запросов
+app.add_middleware(MetricsMiddleware)
+# Трассировка запросов к БД и Server-Timing (SQL_TRACE_ENABLED=true)
+app.add_middleware(SqlTracingMiddleware)
+
 # Подключение роутеров
 app.include_router(order_router)
+app.include_router(client_router)
+app.include_router(report_router)
+app.include_router(catalogue_router)
+app.include_router(metrics_router)
+app.include_router(health_router)
+app.include_router(export_router)
 
 
 @app.get("/")
@@ -46,23 +98,40 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Проверка состояния приложения"""
-    try:
-        # Проверяем подключение к БД
-        await db_connection.fetch_val("SELECT 1")
-        return {
-            "status": "healthy",
-            "database": "connected"
-        }
-    except Exception as e:
+    """Проверка состояния приложения
+    
+    Состояние БД берётся из последней фоновой проверки, запрос к БД
+    не выполняется. Для балансировщика - /health/live и /health/ready.
+    """
+    readiness = health_checker.readiness()
+    database = readiness["database"]
+    if not database["ok"]:
         return {
             "status": "unhealthy",
             "database": "disconnected",
-            "error": str(e)
+            "error": database["error"],
+            "checked_at": database["checked_at"]
         }
+    return {
+        "status": "healthy",
+        "database": "connected",
+        "checked_at": database["checked_at"],
+        "pool": readiness["pool"],
+        "goods_cache": goods_cache.stats(),
+        "id_filters": {"orders": order_id_filter.stats(), "goods": good_id_filter.stats()},
+        "idempotency_cache": idempotency_cache.stats(),
+        "order_cache": order_cache.stats(),
+        "top_goods_report": top_goods_report.stats(),
+        "catalogue_cache": catalogue_cache.stats(),
+        "write_behind": add_good_write_behind.stats(),
+        "export": order_exporter.stats(),
+        "sql_trace": db_connection.tracer.stats(),
+        "admission": admission_controller.stats()
+    }
 
 
 if __name__ == "__main__":
+    # Запуск для разработки с перезагрузкой; в production - serve.py
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
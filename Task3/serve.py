@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Запуск приложения в production: несколько воркеров uvicorn на общем сокете.
+
+Мастер-процесс заранее импортирует приложение (preload), открывает сокет
+и порождает воркеры через fork, поэтому воркеры стартуют без повторного
+импорта и делят один порт. Общий бюджет соединений с PostgreSQL
+(DB_CONNECTION_BUDGET) делится между воркерами: каждому достаётся пул
+(бюджет / воркеры - служебные соединения - пул выгрузок), так что
+добавление воркеров не выводит за max_connections сервера.
+
+SIGTERM и SIGINT пересылаются воркерам: uvicorn перестаёт принимать
+соединения, дожидается запросов в обработке и выполняет завершение
+lifespan (сброс накопленных пакетов, закрытие пула). Воркеры, не
+успевшие за --graceful-timeout, завершаются принудительно. Упавший
+воркер перезапускается.
+
+Запуск из директории Task3:
+    python serve.py --workers 4 --db-connection-budget 80
+"""
+import argparse
+import os
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+# Служебные соединения воркера вне пула: слушатель LISTEN/NOTIFY и проверка готовности
+EXTRA_CONNECTIONS_PER_WORKER = 2
+
+# Воркер, завершившийся быстрее, перезапускается с паузой (защита от цикла падений)
+MIN_WORKER_LIFETIME = 5.0
+
+
+def pool_sizes(budget: int, workers: int, min_size: int, export_pool_size: int = 0):
+    """Размеры пула одного воркера при общем бюджете соединений"""
+    reserved = EXTRA_CONNECTIONS_PER_WORKER + export_pool_size
+    max_size = budget // workers - reserved
+    if max_size < 1:
+        raise ValueError(
+            f"Бюджета в {budget} соединений не хватает на {workers} воркеров: "
+            f"нужно не меньше {workers * (reserved + 1)}"
+        )
+    return min(min_size, max_size), max_size
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock: socket.socket, args) -> None:
+    import uvicorn
+
+    # Обработчики мастера воркеру не нужны: сигналы обрабатывает uvicorn
+    signal.alarm(0)
+    for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGALRM):
+        signal.signal(signum, signal.SIG_DFL)
+
+    config = uvicorn.Config(
+        app,
+        lifespan="on",
+        log_level=args.log_level,
+        access_log=args.access_log,
+        backlog=args.backlog,
+        timeout_graceful_shutdown=args.graceful_timeout
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def main(args) -> int:
+    if args.workers < 1:
+        print("--workers должен быть не меньше 1", file=sys.stderr)
+        return 2
+
+    # Метрики воркеров агрегируются через каталог; переменная читается при
+    # импорте модуля метрик, поэтому задаётся до preload
+    if args.workers > 1 and not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="order-api-metrics-")
+
+    # Preload: приложение импортируется один раз до fork
+    from main import app
+    from app.infrastructure.database.connection import db_connection
+    from app.infrastructure.monitoring import metrics
+
+    try:
+        min_size, max_size = pool_sizes(
+            args.db_connection_budget, args.workers, db_connection.pool_min_size, db_connection.export_pool_max_size
+        )
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    db_connection.pool_min_size = min_size
+    db_connection.pool_max_size = max_size
+
+    sock = bind_socket(args.host, args.port, args.backlog)
+    print(
+        f"Master {os.getpid()}: {args.workers} workers on {args.host}:{args.port}, "
+        f"pool {min_size}-{max_size} per worker, connection budget {args.db_connection_budget}",
+        flush=True
+    )
+
+    workers = {}  # pid -> время запуска
+    stopping = False
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(app, sock, args)
+            except BaseException as e:
+                print(f"Worker {os.getpid()} failed: {e}", file=sys.stderr, flush=True)
+                code = 1
+            finally:
+                os._exit(code)
+        workers[pid] = time.monotonic()
+
+    def kill_all(signum) -> None:
+        for pid in list(workers):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def on_stop(signum, frame) -> None:
+        nonlocal stopping
+        if stopping:
+            return
+        stopping = True
+        print(f"Master {os.getpid()}: stopping workers", flush=True)
+        kill_all(signal.SIGTERM)
+        # Запас сверх тайм-аута uvicorn на завершение lifespan
+        signal.alarm(int(args.graceful_timeout) + 10)
+
+    def on_alarm(signum, frame) -> None:
+        print(f"Master {os.getpid()}: graceful timeout exceeded, killing workers", flush=True)
+        kill_all(signal.SIGKILL)
+
+    signal.signal(signal.SIGTERM, on_stop)
+    signal.signal(signal.SIGINT, on_stop)
+    signal.signal(signal.SIGALRM, on_alarm)
+
+    for _ in range(args.workers):
+        spawn()
+
+    exit_code = 0
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = workers.pop(pid, None)
+        if started is None:
+            continue
+        # Упавший воркер не успел удалить свои live-метрики сам
+        metrics.mark_process_dead(pid)
+        code = os.waitstatus_to_exitcode(status)
+        if stopping:
+            # Новые версии uvicorn после корректной остановки повторно
+            # поднимают полученный сигнал, и воркер завершается по нему
+            if code not in (0, -signal.SIGTERM, -signal.SIGINT):
+                exit_code = 1
+            continue
+        print(f"Master {os.getpid()}: worker {pid} exited with code {code}, restarting", flush=True)
+        if time.monotonic() - started < MIN_WORKER_LIFETIME:
+            time.sleep(1)
+        if not stopping:
+            spawn()
+
+    signal.alarm(0)
+    sock.close()
+    return exit_code
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+                        help="число воркеров, по умолчанию - число CPU")
+    parser.add_argument("--db-connection-budget", type=int, default=int(os.getenv("DB_CONNECTION_BUDGET", "80")),
+                        help="соединений с PostgreSQL на все воркеры вместе")
+    parser.add_argument("--graceful-timeout", type=float,
+                        default=float(os.getenv("GRACEFUL_TIMEOUT_SECONDS", "30")),
+                        help="сколько ждать завершения запросов при остановке, с")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"))
+    parser.add_argument("--access-log", action=argparse.BooleanOptionalAction, default=True)
+    sys.exit(main(parser.parse_args()))
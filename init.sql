@@ -186,3 +186,834 @@ INSERT INTO Ordered_goods (order_id, good_id, amount) VALUES
 (67, 8, 1), (67, 12, 1),
 (68, 9, 1), (68, 15, 1),
 (69, 10, 1), (69, 13, 1);
+
+-- Шардирование остатка "горячих" товаров.
+-- У товара с stock_shards > 0 остаток хранится не в Goods.amount (там 0),
+-- а в stock_shards строках Goods_stock_shards. Списание блокирует только одну
+-- из них, поэтому конкурентные заказы одного товара не выстраиваются в очередь
+-- на блокировку одной строки. Режим переключается функцией set_stock_shards.
+-- Порядок блокировок везде один: сначала строка Goods, затем шарды. Одиночное
+-- списание берёт FOR KEY SHARE (как проверка внешнего ключа Ordered_goods),
+-- пакетное и изменение остатка - FOR NO KEY UPDATE, которая с ней совместима:
+-- иначе пакет, заблокировавший Goods, и одиночное списание, ждущее Goods для
+-- проверки внешнего ключа с уже взятым шардом, взаимно блокируются.
+-- Для существующей БД достаточно выполнить этот раздел и функции ниже.
+ALTER TABLE Goods ADD COLUMN IF NOT EXISTS stock_shards SMALLINT NOT NULL DEFAULT 0 CHECK (stock_shards >= 0);
+
+CREATE TABLE IF NOT EXISTS Goods_stock_shards (
+    good_id INTEGER  NOT NULL REFERENCES Goods(id) ON DELETE CASCADE,
+    shard   SMALLINT NOT NULL,
+    amount  INTEGER  NOT NULL CHECK (amount >= 0),
+    PRIMARY KEY (good_id, shard)
+);
+
+-- Товары с полным остатком независимо от способа его хранения
+CREATE OR REPLACE VIEW Goods_stock AS
+SELECT g.id,
+       g.name,
+       CASE WHEN g.stock_shards > 0
+            THEN (SELECT COALESCE(SUM(s.amount), 0) FROM Goods_stock_shards s WHERE s.good_id = g.id)::INTEGER
+            ELSE g.amount
+       END AS amount,
+       g.price,
+       g.catalogue_id,
+       g.stock_shards
+FROM Goods g;
+
+-- Включение (p_shards > 0), перераспределение или выключение (p_shards = 0)
+-- шардирования остатка товара. Остаток переносится без потерь: из Goods.amount
+-- поровну по шардам и обратно. Возвращает FALSE, если товар не найден.
+CREATE OR REPLACE FUNCTION set_stock_shards(p_good_id INTEGER, p_shards INTEGER)
+RETURNS BOOLEAN AS $$
+DECLARE
+    v_shards SMALLINT;
+    v_total  INTEGER;
+BEGIN
+    IF p_shards < 0 OR p_shards > 1024 THEN
+        RAISE EXCEPTION 'stock shards must be between 0 and 1024, got %', p_shards
+            USING ERRCODE = 'check_violation';
+    END IF;
+
+    SELECT stock_shards, COALESCE(amount, 0) INTO v_shards, v_total
+    FROM Goods WHERE id = p_good_id
+    FOR NO KEY UPDATE;
+    IF NOT FOUND THEN
+        RETURN FALSE;
+    END IF;
+
+    IF v_shards > 0 THEN
+        SELECT COALESCE(SUM(amount), 0) INTO v_total
+        FROM (SELECT amount FROM Goods_stock_shards WHERE good_id = p_good_id ORDER BY shard FOR UPDATE) locked;
+        DELETE FROM Goods_stock_shards WHERE good_id = p_good_id;
+    END IF;
+
+    IF p_shards > 0 THEN
+        INSERT INTO Goods_stock_shards (good_id, shard, amount)
+        SELECT p_good_id, n, v_total / p_shards + CASE WHEN n < v_total % p_shards THEN 1 ELSE 0 END
+        FROM generate_series(0, p_shards - 1) AS n;
+        UPDATE Goods SET amount = 0, stock_shards = p_shards WHERE id = p_good_id;
+    ELSE
+        UPDATE Goods SET amount = v_total, stock_shards = 0 WHERE id = p_good_id;
+    END IF;
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Установка полного остатка товара с учётом шардирования.
+-- Отрицательный остаток отклоняется ограничением CHECK (amount >= 0).
+CREATE OR REPLACE FUNCTION set_good_stock(p_good_id INTEGER, p_amount INTEGER)
+RETURNS BOOLEAN AS $$
+DECLARE
+    v_shards SMALLINT;
+BEGIN
+    SELECT stock_shards INTO v_shards FROM Goods WHERE id = p_good_id FOR NO KEY UPDATE;
+    IF NOT FOUND THEN
+        RETURN FALSE;
+    END IF;
+
+    IF v_shards = 0 THEN
+        UPDATE Goods SET amount = p_amount WHERE id = p_good_id;
+    ELSE
+        PERFORM 1 FROM Goods_stock_shards WHERE good_id = p_good_id ORDER BY shard FOR UPDATE;
+        UPDATE Goods_stock_shards
+        SET amount = p_amount / v_shards + CASE WHEN shard < p_amount % v_shards THEN 1 ELSE 0 END
+        WHERE good_id = p_good_id;
+    END IF;
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Списание с шардов товара. Сначала без ожидания блокировок берётся один шард
+-- с достаточным остатком, начиная со случайного. Если такого нет или все они
+-- заняты, блокируются все шарды товара (в порядке shard) и количество
+-- списывается с нескольких шардов. Возвращает полный остаток после списания
+-- (без блокировки остальных шардов, поэтому справочный) или NULL, если
+-- остатка недостаточно.
+CREATE OR REPLACE FUNCTION take_sharded_stock(p_good_id INTEGER, p_amount INTEGER, p_shards SMALLINT)
+RETURNS INTEGER AS $$
+DECLARE
+    v_start SMALLINT := floor(random() * p_shards);
+    v_shard SMALLINT;
+    v_total INTEGER;
+    v_left  INTEGER := p_amount;
+    v_take  INTEGER;
+    r       RECORD;
+BEGIN
+    SELECT shard INTO v_shard
+    FROM Goods_stock_shards
+    WHERE good_id = p_good_id AND amount >= p_amount
+    ORDER BY (shard - v_start + p_shards) % p_shards
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED;
+
+    IF FOUND THEN
+        UPDATE Goods_stock_shards SET amount = amount - p_amount
+        WHERE good_id = p_good_id AND shard = v_shard;
+    ELSE
+        SELECT SUM(amount) INTO v_total
+        FROM (SELECT amount FROM Goods_stock_shards WHERE good_id = p_good_id ORDER BY shard FOR UPDATE) locked;
+        IF COALESCE(v_total, 0) < p_amount THEN
+            RETURN NULL;
+        END IF;
+
+        FOR r IN
+            SELECT shard, amount FROM Goods_stock_shards
+            WHERE good_id = p_good_id AND amount > 0
+            ORDER BY amount DESC, shard
+        LOOP
+            v_take := LEAST(r.amount, v_left);
+            UPDATE Goods_stock_shards SET amount = amount - v_take
+            WHERE good_id = p_good_id AND shard = r.shard;
+            v_left := v_left - v_take;
+            EXIT WHEN v_left = 0;
+        END LOOP;
+    END IF;
+
+    RETURN (SELECT COALESCE(SUM(amount), 0) FROM Goods_stock_shards WHERE good_id = p_good_id);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Пакетное списание остатков (строки товаров уже заблокированы вызывающим)
+CREATE OR REPLACE FUNCTION decrement_goods_stock(p_ids INTEGER[], p_deltas INTEGER[])
+RETURNS VOID AS $$
+BEGIN
+    UPDATE Goods g SET amount = g.amount - d.delta
+    FROM unnest(p_ids, p_deltas) AS d(id, delta)
+    WHERE g.id = d.id AND g.stock_shards = 0;
+
+    PERFORM take_sharded_stock(d.id, d.delta, g.stock_shards)
+    FROM unnest(p_ids, p_deltas) AS d(id, delta)
+    JOIN Goods g ON g.id = d.id
+    WHERE g.stock_shards > 0
+    ORDER BY d.id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Атомарное добавление товара в заказ.
+-- Проверка заказа, условное списание остатка и upsert в Ordered_goods выполняются
+-- одним вызовом в рамках одного оператора, поэтому остаток не уходит в минус
+-- при конкурентных запросах, а приложению достаточно одного обращения к БД.
+-- Строка Goods шардированного товара не блокируется на запись: списание идёт
+-- с шарда, а до него берётся FOR KEY SHARE, чтобы порядок блокировок
+-- (Goods, затем шарды) совпадал с пакетным списанием.
+-- status: ok | order_not_found | good_not_found | insufficient_stock
+CREATE OR REPLACE FUNCTION add_ordered_good(p_order_id BIGINT, p_good_id INTEGER, p_amount INTEGER)
+RETURNS TABLE (status TEXT, stock_left INTEGER, ordered_amount INTEGER) AS $$
+DECLARE
+    v_shards         SMALLINT;
+    v_current_shards SMALLINT;
+BEGIN
+    PERFORM 1 FROM Orders WHERE id = p_order_id;
+    IF NOT FOUND THEN
+        RETURN QUERY SELECT 'order_not_found'::TEXT, NULL::INTEGER, NULL::INTEGER;
+        RETURN;
+    END IF;
+
+    -- Повтор нужен, если режим хранения остатка сменился во время списания
+    LOOP
+        SELECT g.stock_shards INTO v_shards FROM Goods g WHERE g.id = p_good_id;
+        IF NOT FOUND THEN
+            RETURN QUERY SELECT 'good_not_found'::TEXT, NULL::INTEGER, NULL::INTEGER;
+            RETURN;
+        END IF;
+
+        IF v_shards = 0 THEN
+            -- Условие amount >= p_amount перепроверяется после ожидания блокировки строки
+            UPDATE Goods g SET amount = g.amount - p_amount
+            WHERE g.id = p_good_id AND g.stock_shards = 0 AND g.amount >= p_amount
+            RETURNING g.amount INTO stock_left;
+        ELSE
+            PERFORM 1 FROM Goods g WHERE g.id = p_good_id FOR KEY SHARE;
+            stock_left := take_sharded_stock(p_good_id, p_amount, v_shards);
+        END IF;
+        EXIT WHEN stock_left IS NOT NULL;
+
+        SELECT gs.amount, gs.stock_shards INTO stock_left, v_current_shards FROM Goods_stock gs WHERE gs.id = p_good_id;
+        IF NOT FOUND THEN
+            RETURN QUERY SELECT 'good_not_found'::TEXT, NULL::INTEGER, NULL::INTEGER;
+            RETURN;
+        END IF;
+        IF (v_current_shards = 0) = (v_shards = 0) THEN
+            RETURN QUERY SELECT 'insufficient_stock'::TEXT, COALESCE(stock_left, 0), NULL::INTEGER;
+            RETURN;
+        END IF;
+        stock_left := NULL;
+    END LOOP;
+
+    INSERT INTO Ordered_goods AS og (order_id, good_id, amount)
+    VALUES (p_order_id, p_good_id, p_amount)
+    ON CONFLICT (order_id, good_id) DO UPDATE SET amount = og.amount + EXCLUDED.amount
+    RETURNING og.amount INTO ordered_amount;
+
+    RETURN QUERY SELECT 'ok'::TEXT, stock_left, ordered_amount;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Уведомление кэшей приложения об изменении справочных данных товара.
+-- Изменение только остатка (amount) уведомление не вызывает: остаток
+-- всегда проверяется в БД, а кэшируются наименование, цена и категория.
+CREATE OR REPLACE FUNCTION notify_goods_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        -- '*' - сбросить кэш целиком
+        PERFORM pg_notify('goods_changed', '*');
+    ELSE
+        PERFORM pg_notify('goods_changed', OLD.id::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER goods_catalogue_changed
+AFTER UPDATE OF id, name, price, catalogue_id ON Goods
+FOR EACH ROW
+WHEN (OLD.id IS DISTINCT FROM NEW.id
+      OR OLD.name IS DISTINCT FROM NEW.name
+      OR OLD.price IS DISTINCT FROM NEW.price
+      OR OLD.catalogue_id IS DISTINCT FROM NEW.catalogue_id)
+EXECUTE FUNCTION notify_goods_changed();
+
+CREATE TRIGGER goods_deleted
+AFTER DELETE ON Goods
+FOR EACH ROW
+EXECUTE FUNCTION notify_goods_changed();
+
+CREATE TRIGGER goods_truncated
+AFTER TRUNCATE ON Goods
+FOR EACH STATEMENT
+EXECUTE FUNCTION notify_goods_changed();
+
+-- Ключи идемпотентности добавления товара в заказ (заголовок Idempotency-Key).
+-- Результат первого запроса сохраняется вместе с параметрами запроса и
+-- возвращается на повторы с тем же ключом до истечения expires_at.
+CREATE TABLE IF NOT EXISTS Idempotency_keys (
+    key            VARCHAR(255) PRIMARY KEY,
+    order_id       BIGINT      NOT NULL,
+    good_id        INTEGER     NOT NULL,
+    amount         INTEGER     NOT NULL,
+    status         TEXT,
+    stock_left     INTEGER,
+    ordered_amount INTEGER,
+    expires_at     TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idempotency_keys_expires_at_idx ON Idempotency_keys (expires_at);
+
+-- Добавление товара в заказ не более одного раза на ключ.
+-- Ключ захватывается вставкой в той же транзакции, что и списание: конкурентный
+-- запрос с тем же ключом ждёт её завершения на уникальном индексе и получает
+-- сохранённый результат, не обращаясь к Goods и Ordered_goods. Истёкший ключ
+-- захватывается заново. request_matches = FALSE, если ключ уже использован
+-- с другими параметрами запроса.
+CREATE OR REPLACE FUNCTION add_ordered_good_once(
+    p_key VARCHAR, p_order_id BIGINT, p_good_id INTEGER, p_amount INTEGER, p_ttl INTERVAL
+)
+RETURNS TABLE (
+    replayed BOOLEAN, request_matches BOOLEAN, status TEXT,
+    stock_left INTEGER, ordered_amount INTEGER, expires_at TIMESTAMPTZ
+) AS $$
+DECLARE
+    k Idempotency_keys%ROWTYPE;
+BEGIN
+    INSERT INTO Idempotency_keys AS ik (key, order_id, good_id, amount, expires_at)
+    VALUES (p_key, p_order_id, p_good_id, p_amount, now() + p_ttl)
+    ON CONFLICT (key) DO UPDATE
+        SET order_id = EXCLUDED.order_id, good_id = EXCLUDED.good_id, amount = EXCLUDED.amount,
+            status = NULL, stock_left = NULL, ordered_amount = NULL, expires_at = EXCLUDED.expires_at
+        WHERE ik.expires_at <= now()
+    RETURNING ik.* INTO k;
+
+    IF k.key IS NULL THEN
+        SELECT * INTO k FROM Idempotency_keys ik WHERE ik.key = p_key;
+        RETURN QUERY SELECT TRUE,
+                            k.order_id = p_order_id AND k.good_id = p_good_id AND k.amount = p_amount,
+                            k.status, k.stock_left, k.ordered_amount, k.expires_at;
+        RETURN;
+    END IF;
+
+    SELECT a.status, a.stock_left, a.ordered_amount INTO k.status, k.stock_left, k.ordered_amount
+    FROM add_ordered_good(p_order_id, p_good_id, p_amount) a;
+
+    UPDATE Idempotency_keys ik
+    SET status = k.status, stock_left = k.stock_left, ordered_amount = k.ordered_amount
+    WHERE ik.key = p_key;
+
+    RETURN QUERY SELECT FALSE, TRUE, k.status, k.stock_left, k.ordered_amount, k.expires_at;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Версия заказа для ETag в GET /orders/{id}. Увеличивается при каждом изменении
+-- строк заказа и при смене клиента; кэши приложения уведомляются через канал
+-- orders_changed.
+ALTER TABLE Orders ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION bump_order_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        -- '*' - сбросить кэш целиком
+        PERFORM pg_notify('orders_changed', '*');
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE Orders SET version = version + 1 WHERE id = NEW.order_id;
+        PERFORM pg_notify('orders_changed', NEW.order_id::text);
+    END IF;
+    IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND OLD.order_id <> NEW.order_id) THEN
+        UPDATE Orders SET version = version + 1 WHERE id = OLD.order_id;
+        PERFORM pg_notify('orders_changed', OLD.order_id::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION notify_order_deleted()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('orders_changed', OLD.id::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER ordered_goods_changed
+AFTER INSERT OR UPDATE OR DELETE ON Ordered_goods
+FOR EACH ROW
+EXECUTE FUNCTION bump_order_version();
+
+CREATE TRIGGER ordered_goods_truncated
+AFTER TRUNCATE ON Ordered_goods
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_order_version();
+
+CREATE TRIGGER orders_deleted
+AFTER DELETE ON Orders
+FOR EACH ROW
+EXECUTE FUNCTION notify_order_deleted();
+
+-- Смена клиента меняет ответ GET /orders/{id}, хотя строки заказа те же
+CREATE OR REPLACE FUNCTION bump_order_client_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.version := OLD.version + 1;
+    PERFORM pg_notify('orders_changed', NEW.id::text);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER orders_client_changed
+BEFORE UPDATE OF client_id ON Orders
+FOR EACH ROW
+WHEN (OLD.client_id IS DISTINCT FROM NEW.client_id)
+EXECUTE FUNCTION bump_order_client_version();
+
+-- Итоги по клиентам: суммарное количество и стоимость заказанных товаров
+-- (то же, что агрегат task_2_1_query по Clients, Orders, Ordered_goods и Goods).
+-- Поддерживаются триггерами в той же транзакции, что и изменение строк заказов,
+-- поэтому чтение итогов клиента - поиск по первичному ключу.
+-- Стоимость считается по текущей цене товара, как в исходном запросе.
+CREATE TABLE IF NOT EXISTS Client_totals (
+    client_id    INTEGER        PRIMARY KEY REFERENCES Clients(id) ON DELETE CASCADE,
+    total_amount BIGINT         NOT NULL DEFAULT 0,
+    total_cost   NUMERIC(16, 2) NOT NULL DEFAULT 0
+);
+
+-- Поиск строк заказов по товару при изменении цены и удалении товара
+CREATE INDEX IF NOT EXISTS ordered_goods_good_id_idx ON Ordered_goods (good_id);
+
+-- Добавить к итогам изменения строк заказов (amount со знаком)
+CREATE OR REPLACE FUNCTION add_client_totals_delta(p_order_ids BIGINT[], p_good_ids INTEGER[], p_amounts INTEGER[])
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO Client_totals AS ct (client_id, total_amount, total_cost)
+    SELECT o.client_id, SUM(d.amount), SUM(d.amount * COALESCE(g.price, 0))
+    FROM unnest(p_order_ids, p_good_ids, p_amounts) AS d(order_id, good_id, amount)
+    JOIN Orders o ON o.id = d.order_id
+    LEFT JOIN Goods g ON g.id = d.good_id
+    GROUP BY o.client_id
+    -- Единый порядок блокировок строк итогов для конкурентных транзакций
+    ORDER BY o.client_id
+    ON CONFLICT (client_id) DO UPDATE
+        SET total_amount = ct.total_amount + EXCLUDED.total_amount,
+            total_cost   = ct.total_cost + EXCLUDED.total_cost;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Триггеры уровня оператора: пакетное изменение даёт одно обновление на клиента
+CREATE OR REPLACE FUNCTION ordered_goods_client_totals()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM add_client_totals_delta(array_agg(order_id), array_agg(good_id), array_agg(amount))
+        FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM add_client_totals_delta(array_agg(order_id), array_agg(good_id), array_agg(-amount))
+        FROM old_rows;
+    ELSE
+        PERFORM add_client_totals_delta(array_agg(order_id), array_agg(good_id), array_agg(amount))
+        FROM (
+            SELECT order_id, good_id, amount FROM new_rows
+            UNION ALL
+            SELECT order_id, good_id, -amount FROM old_rows
+        ) d;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER ordered_goods_client_totals_insert
+AFTER INSERT ON Ordered_goods
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION ordered_goods_client_totals();
+
+CREATE TRIGGER ordered_goods_client_totals_update
+AFTER UPDATE ON Ordered_goods
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION ordered_goods_client_totals();
+
+CREATE TRIGGER ordered_goods_client_totals_delete
+AFTER DELETE ON Ordered_goods
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION ordered_goods_client_totals();
+
+-- Удаление заказа вычитается до каскадного удаления его строк: после него
+-- строки уже не связать с клиентом
+CREATE OR REPLACE FUNCTION orders_client_totals()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        -- При каскадном удалении клиента его итоги удаляются вместе с ним
+        IF NOT EXISTS (SELECT 1 FROM Clients WHERE id = OLD.client_id) THEN
+            RETURN OLD;
+        END IF;
+        UPDATE Client_totals ct
+        SET total_amount = ct.total_amount - s.amount,
+            total_cost   = ct.total_cost - s.cost
+        FROM (
+            SELECT SUM(og.amount) AS amount, SUM(og.amount * COALESCE(g.price, 0)) AS cost
+            FROM Ordered_goods og LEFT JOIN Goods g ON g.id = og.good_id
+            WHERE og.order_id = OLD.id
+        ) s
+        WHERE ct.client_id = OLD.client_id AND s.amount IS NOT NULL;
+        RETURN OLD;
+    END IF;
+    -- Перенос заказа к другому клиенту
+    UPDATE Client_totals ct
+    SET total_amount = ct.total_amount + s.amount * CASE WHEN ct.client_id = NEW.client_id THEN 1 ELSE -1 END,
+        total_cost   = ct.total_cost + s.cost * CASE WHEN ct.client_id = NEW.client_id THEN 1 ELSE -1 END
+    FROM (
+        SELECT COALESCE(SUM(og.amount), 0) AS amount, COALESCE(SUM(og.amount * COALESCE(g.price, 0)), 0) AS cost
+        FROM Ordered_goods og LEFT JOIN Goods g ON g.id = og.good_id
+        WHERE og.order_id = NEW.id
+    ) s
+    WHERE ct.client_id IN (OLD.client_id, NEW.client_id);
+    INSERT INTO Client_totals (client_id, total_amount, total_cost)
+    SELECT NEW.client_id, COALESCE(SUM(og.amount), 0), COALESCE(SUM(og.amount * COALESCE(g.price, 0)), 0)
+    FROM Ordered_goods og LEFT JOIN Goods g ON g.id = og.good_id
+    WHERE og.order_id = NEW.id
+    ON CONFLICT (client_id) DO NOTHING;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER orders_client_totals_delete
+BEFORE DELETE ON Orders
+FOR EACH ROW
+EXECUTE FUNCTION orders_client_totals();
+
+CREATE TRIGGER orders_client_totals_moved
+AFTER UPDATE OF client_id ON Orders
+FOR EACH ROW
+WHEN (OLD.client_id IS DISTINCT FROM NEW.client_id)
+EXECUTE FUNCTION orders_client_totals();
+
+-- Изменение цены пересчитывает стоимость у клиентов, заказавших товар.
+-- Удаление товара обрабатывается как цена 0 до каскадного удаления строк
+-- заказов, которые затем вычитают только количество.
+CREATE OR REPLACE FUNCTION goods_client_totals()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_price_delta NUMERIC := CASE WHEN TG_OP = 'DELETE' THEN 0 ELSE COALESCE(NEW.price, 0) END
+                             - COALESCE(OLD.price, 0);
+BEGIN
+    UPDATE Client_totals ct
+    SET total_cost = ct.total_cost + s.amount * v_price_delta
+    FROM (
+        SELECT o.client_id, SUM(og.amount) AS amount
+        FROM Ordered_goods og
+        JOIN Orders o ON o.id = og.order_id
+        WHERE og.good_id = OLD.id
+        GROUP BY o.client_id
+    ) s
+    WHERE ct.client_id = s.client_id;
+    IF TG_OP = 'DELETE' THEN
+        RETURN OLD;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER goods_client_totals_repriced
+AFTER UPDATE OF price ON Goods
+FOR EACH ROW
+WHEN (OLD.price IS DISTINCT FROM NEW.price)
+EXECUTE FUNCTION goods_client_totals();
+
+CREATE TRIGGER goods_client_totals_delete
+BEFORE DELETE ON Goods
+FOR EACH ROW
+EXECUTE FUNCTION goods_client_totals();
+
+-- Пересчёт итогов с нуля. Возвращает клиентов, у которых сохранённые итоги
+-- расходятся с фактическими; при p_apply = TRUE таблица перестраивается.
+-- Блокировка таблицы на время пересчёта приостанавливает запись строк заказов.
+CREATE OR REPLACE FUNCTION rebuild_client_totals(p_apply BOOLEAN DEFAULT TRUE)
+RETURNS TABLE (
+    client_id BIGINT, stored_amount BIGINT, actual_amount BIGINT,
+    stored_cost NUMERIC, actual_cost NUMERIC
+) AS $$
+#variable_conflict use_column
+BEGIN
+    IF p_apply THEN
+        LOCK TABLE Client_totals IN EXCLUSIVE MODE;
+    END IF;
+
+    CREATE TEMP TABLE client_totals_actual ON COMMIT DROP AS
+    SELECT c.id AS client_id,
+           COALESCE(SUM(og.amount), 0)::BIGINT AS total_amount,
+           COALESCE(SUM(og.amount * COALESCE(g.price, 0)), 0)::NUMERIC(16, 2) AS total_cost
+    FROM Clients c
+    LEFT JOIN Orders o ON o.client_id = c.id
+    LEFT JOIN Ordered_goods og ON og.order_id = o.id
+    LEFT JOIN Goods g ON g.id = og.good_id
+    GROUP BY c.id;
+
+    RETURN QUERY
+    SELECT a.client_id::BIGINT, COALESCE(t.total_amount, 0), a.total_amount,
+           COALESCE(t.total_cost, 0)::NUMERIC, a.total_cost::NUMERIC
+    FROM client_totals_actual a
+    LEFT JOIN Client_totals t ON t.client_id = a.client_id
+    WHERE COALESCE(t.total_amount, 0) <> a.total_amount
+       OR COALESCE(t.total_cost, 0) <> a.total_cost
+    ORDER BY a.client_id;
+
+    IF p_apply THEN
+        DELETE FROM Client_totals;
+        INSERT INTO Client_totals (client_id, total_amount, total_cost)
+        SELECT a.client_id, a.total_amount, a.total_cost FROM client_totals_actual a;
+    END IF;
+    DROP TABLE client_totals_actual;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Начальное заполнение итогов по уже загруженным заказам
+SELECT count(*) AS client_totals_drift FROM rebuild_client_totals();
+
+-- Топ-5 товаров по количеству проданных штук (MATERIALIZED VIEW из Task2).
+-- Столбец good_id и уникальный индекс по нему нужны для
+-- REFRESH MATERIALIZED VIEW CONCURRENTLY, который не блокирует чтение.
+-- Категория 1-го уровня - первая метка path, поэтому соединение с корнем
+-- каталога идёт по id без разбора пути на каждом уровне.
+CREATE MATERIALIZED VIEW top5_monthly_purchased_goods AS
+SELECT
+    g.id AS good_id,
+    g.name AS Наименование_товара,
+    root_cat.name AS Категория_1_го_уровня,
+    SUM(og.amount) AS Общее_количество_проданных_штук
+FROM Goods g
+JOIN Ordered_goods og ON g.id = og.good_id
+JOIN Catalogue c ON g.catalogue_id = c.id
+JOIN Catalogue root_cat ON root_cat.id = (split_part(c.path::text, '.', 1))::integer
+GROUP BY g.id, g.name, root_cat.name
+ORDER BY Общее_количество_проданных_штук DESC
+LIMIT 5;
+
+CREATE UNIQUE INDEX top5_monthly_purchased_goods_good_id_idx
+ON top5_monthly_purchased_goods (good_id);
+
+-- Время последнего обновления отчётов (MATERIALIZED VIEW)
+CREATE TABLE Report_refreshes (
+    name         TEXT PRIMARY KEY,
+    refreshed_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp(),
+    duration_ms  DOUBLE PRECISION NOT NULL DEFAULT 0
+);
+
+INSERT INTO Report_refreshes (name) VALUES ('top5_monthly_purchased_goods');
+
+-- Обновление топ-5, если оно назрело: прошло p_max_age секунд или
+-- отчёт помечен устаревшим (p_dirty) и прошло не меньше p_min_age секунд.
+-- Рекомендательная блокировка допускает только одно обновление одновременно;
+-- остальные воркеры сразу получают NULL. После обновления отправляется
+-- уведомление top_goods_refreshed, по которому воркеры перечитывают отчёт.
+-- Возвращает время нового обновления или NULL, если обновления не было.
+CREATE OR REPLACE FUNCTION refresh_top5_monthly_purchased_goods(
+    p_max_age DOUBLE PRECISION,
+    p_dirty BOOLEAN,
+    p_min_age DOUBLE PRECISION
+)
+RETURNS TIMESTAMPTZ AS $$
+DECLARE
+    v_age DOUBLE PRECISION;
+    v_started TIMESTAMPTZ;
+    v_refreshed_at TIMESTAMPTZ;
+BEGIN
+    IF NOT pg_try_advisory_xact_lock(hashtext('top5_monthly_purchased_goods')) THEN
+        RETURN NULL;
+    END IF;
+
+    SELECT EXTRACT(EPOCH FROM clock_timestamp() - refreshed_at) INTO v_age
+    FROM Report_refreshes
+    WHERE name = 'top5_monthly_purchased_goods';
+    IF v_age IS NOT NULL AND v_age < p_max_age AND NOT (p_dirty AND v_age >= p_min_age) THEN
+        RETURN NULL;
+    END IF;
+
+    v_started := clock_timestamp();
+    REFRESH MATERIALIZED VIEW CONCURRENTLY top5_monthly_purchased_goods;
+    v_refreshed_at := clock_timestamp();
+
+    INSERT INTO Report_refreshes (name, refreshed_at, duration_ms)
+    VALUES ('top5_monthly_purchased_goods', v_refreshed_at,
+            EXTRACT(EPOCH FROM v_refreshed_at - v_started) * 1000)
+    ON CONFLICT (name) DO UPDATE
+    SET refreshed_at = EXCLUDED.refreshed_at, duration_ms = EXCLUDED.duration_ms;
+
+    PERFORM pg_notify('top_goods_refreshed', v_refreshed_at::text);
+    RETURN v_refreshed_at;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Уведомление процессных деревьев каталога об изменении Catalogue.
+-- Каталог мал и меняется редко, поэтому воркеры перечитывают его целиком.
+CREATE OR REPLACE FUNCTION notify_catalogue_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('catalogue_changed', '*');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER catalogue_changed
+AFTER INSERT OR UPDATE OR DELETE ON Catalogue
+FOR EACH STATEMENT
+EXECUTE FUNCTION notify_catalogue_changed();
+
+CREATE TRIGGER catalogue_truncated
+AFTER TRUNCATE ON Catalogue
+FOR EACH STATEMENT
+EXECUTE FUNCTION notify_catalogue_changed();
+
+-- Выборка товаров поддерева каталога (catalogue_id = ANY(...))
+CREATE INDEX IF NOT EXISTS goods_catalogue_id_idx ON Goods (catalogue_id);
+
+-- Отложенное добавление товара в заказ (POST /orders/add-good с заголовком
+-- Prefer: respond-async). Запрос получает тикет и применяется позже пакетом;
+-- результат записывается здесь в той же транзакции, что и списание, поэтому
+-- строка с тикетом означает, что он применён ровно один раз, и его статус
+-- виден с любого воркера. Строки удаляются после expires_at.
+CREATE TABLE IF NOT EXISTS Add_good_tickets (
+    id             UUID        PRIMARY KEY,
+    order_id       BIGINT      NOT NULL,
+    good_id        INTEGER     NOT NULL,
+    amount         INTEGER     NOT NULL,
+    status         TEXT,
+    stock_left     INTEGER,
+    ordered_amount INTEGER,
+    accepted_at    TIMESTAMPTZ NOT NULL,
+    completed_at   TIMESTAMPTZ NOT NULL DEFAULT now(),
+    expires_at     TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS add_good_tickets_expires_at_idx ON Add_good_tickets (expires_at);
+
+-- Массовая загрузка (commands/bulk_load.py). Позиция в исходном файле
+-- сохраняется в одной транзакции с загруженной порцией строк, поэтому
+-- прерванная загрузка продолжается с места остановки без повторов.
+CREATE TABLE IF NOT EXISTS Bulk_load_checkpoints (
+    job         TEXT        PRIMARY KEY,
+    source_size BIGINT      NOT NULL,
+    byte_offset BIGINT      NOT NULL,
+    line        BIGINT      NOT NULL,
+    loaded      BIGINT      NOT NULL,
+    rejected    BIGINT      NOT NULL,
+    finished    BOOLEAN     NOT NULL DEFAULT FALSE,
+    updated_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Пакетная корректировка остатков (приход, возврат, списание) с учётом
+-- шардирования. Товары блокируются в порядке ID (FOR NO KEY UPDATE, как
+-- при пакетном списании, совместимо с FOR KEY SHARE одиночного), затем их
+-- шарды в порядке (good_id, shard). Корректировка, после которой
+-- остаток стал бы отрицательным, не применяется; такие товары возвращаются.
+CREATE OR REPLACE FUNCTION adjust_goods_stock(p_ids INTEGER[], p_deltas INTEGER[])
+RETURNS TABLE (rejected_id INTEGER) AS $$
+BEGIN
+    PERFORM 1 FROM Goods g WHERE g.id = ANY(p_ids) ORDER BY g.id FOR NO KEY UPDATE;
+    PERFORM 1 FROM Goods_stock_shards s WHERE s.good_id = ANY(p_ids) ORDER BY s.good_id, s.shard FOR UPDATE;
+
+    RETURN QUERY
+    SELECT d.id
+    FROM unnest(p_ids, p_deltas) AS d(id, delta)
+    JOIN Goods_stock gs ON gs.id = d.id
+    WHERE COALESCE(gs.amount, 0) + d.delta < 0;
+
+    UPDATE Goods g SET amount = COALESCE(g.amount, 0) + d.delta
+    FROM unnest(p_ids, p_deltas) AS d(id, delta)
+    WHERE g.id = d.id AND g.stock_shards = 0 AND COALESCE(g.amount, 0) + d.delta >= 0;
+
+    PERFORM set_good_stock(gs.id, gs.amount + d.delta)
+    FROM unnest(p_ids, p_deltas) AS d(id, delta)
+    JOIN Goods_stock gs ON gs.id = d.id
+    WHERE gs.stock_shards > 0 AND gs.amount + d.delta >= 0
+    ORDER BY gs.id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Выгрузка заказов клиента по порядку ID (GET /export/orders?client_id=)
+CREATE INDEX IF NOT EXISTS orders_client_id_idx ON Orders (client_id, id);
+
+-- Фильтр несуществующих ID заказов и товаров в воркерах. Добавленные и
+-- удалённые ID публикуются диапазонами подряд идущих значений: '+1-500,731-731'
+-- или '-...'; '*' - загрузить ID заново. Триггеры уровня оператора, поэтому
+-- массовая вставка даёт одно уведомление на 200 диапазонов, а не на строку.
+CREATE OR REPLACE FUNCTION notify_ids_changed()
+RETURNS TRIGGER AS $$
+DECLARE
+    chunk TEXT;
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        PERFORM pg_notify(TG_ARGV[0], '*');
+        RETURN NULL;
+    END IF;
+    FOR chunk IN
+        SELECT string_agg(lo || '-' || hi, ',' ORDER BY lo)
+        FROM (
+            SELECT min(id) AS lo, max(id) AS hi, (row_number() OVER (ORDER BY min(id)) - 1) / 200 AS part
+            FROM (SELECT id, id - row_number() OVER (ORDER BY id) AS grp FROM changed_ids) ids
+            GROUP BY grp
+        ) ranges
+        GROUP BY part
+    LOOP
+        PERFORM pg_notify(TG_ARGV[0], CASE TG_OP WHEN 'INSERT' THEN '+' ELSE '-' END || chunk);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Смена ID строки: триггеры с таблицами переходов не принимают список столбцов
+CREATE OR REPLACE FUNCTION notify_id_updated()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify(TG_ARGV[0], '+' || NEW.id || '-' || NEW.id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER orders_ids_inserted
+AFTER INSERT ON Orders
+REFERENCING NEW TABLE AS changed_ids
+FOR EACH STATEMENT
+EXECUTE FUNCTION notify_ids_changed('order_ids_changed');
+
+CREATE TRIGGER orders_ids_deleted
+AFTER DELETE ON Orders
+REFERENCING OLD TABLE AS changed_ids
+FOR EACH STATEMENT
+EXECUTE FUNCTION notify_ids_changed('order_ids_changed');
+
+CREATE TRIGGER orders_ids_truncated
+AFTER TRUNCATE ON Orders
+FOR EACH STATEMENT
+EXECUTE FUNCTION notify_ids_changed('order_ids_changed');
+
+CREATE TRIGGER orders_id_updated
+AFTER UPDATE OF id ON Orders
+FOR EACH ROW
+WHEN (OLD.id IS DISTINCT FROM NEW.id)
+EXECUTE FUNCTION notify_id_updated('order_ids_changed');
+
+CREATE TRIGGER goods_ids_inserted
+AFTER INSERT ON Goods
+REFERENCING NEW TABLE AS changed_ids
+FOR EACH STATEMENT
+EXECUTE FUNCTION notify_ids_changed('good_ids_changed');
+
+CREATE TRIGGER goods_ids_deleted
+AFTER DELETE ON Goods
+REFERENCING OLD TABLE AS changed_ids
+FOR EACH STATEMENT
+EXECUTE FUNCTION notify_ids_changed('good_ids_changed');
+
+CREATE TRIGGER goods_ids_truncated
+AFTER TRUNCATE ON Goods
+FOR EACH STATEMENT
+EXECUTE FUNCTION notify_ids_changed('good_ids_changed');
+
+CREATE TRIGGER goods_id_updated
+AFTER UPDATE OF id ON Goods
+FOR EACH ROW
+WHEN (OLD.id IS DISTINCT FROM NEW.id)
+EXECUTE FUNCTION notify_id_updated('good_ids_changed');